@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Distance methods of pgoapi.location: one distance at a time, as the 40 m
+"in range" checks do, and a batch of 1000 forts, for geopy's vincenty
+and the geod, haversine and equirectangular methods.
+
+    python benchmarks/bench_distance_methods.py
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.location import (DISTANCE_METHODS, distance_in_meters,  # noqa
+                             distances_in_meters)
+
+ORIGIN = (34.0205, -118.2856, 0)
+
+
+def main():
+    rnd = random.Random(42)
+    points = [(ORIGIN[0] + rnd.uniform(-0.01, 0.01), ORIGIN[1] + rnd.uniform(-0.01, 0.01)) for _ in range(1000)]
+    lats, lngs = [p[0] for p in points], [p[1] for p in points]
+
+    single = min(timeit.repeat(lambda: [distance_in_meters(ORIGIN, p) for p in points], number=1, repeat=3))
+    print("{0:<16} single {1:>7.2f} us".format('vincenty', single * 1e3))
+    for method in DISTANCE_METHODS:
+        single = min(timeit.repeat(lambda: [distance_in_meters(ORIGIN, p, method) for p in points], number=1, repeat=3))
+        batch = min(timeit.repeat(lambda: distances_in_meters(ORIGIN, lats, lngs, method), number=10, repeat=3)) / 10
+        print("{0:<16} single {1:>7.2f} us   1000 in a batch {2:>7.3f} ms".format(method, single * 1e3, batch * 1e3))
+
+
+if __name__ == '__main__':
+    main()
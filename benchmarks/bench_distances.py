@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+filtered_forts over 1k-100k forts: the previous per-fort vincenty calls
+(twice per fort when STAY_WITHIN_PROXIMITY is set) vs the batch distance API
+with the pyproj Geod and the haversine backends.
+
+    python benchmarks/bench_distances.py
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+from time import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.location import (DISTANCE_GEOD, DISTANCE_HAVERSINE,  # noqa
+                             distance_in_meters, filtered_forts)
+
+ORIGIN = (34.0205, -118.2856, 0)
+
+
+def legacy_filtered_forts(starting_location, origin, forts, proximity, visited_forts={}):
+    def is_active_pokestop(fort):
+        is_active_fort = fort.get('type', None) == 1 and ("enabled" in fort or 'lure_info' in fort) and fort.get(
+            'cooldown_complete_timestamp_ms', -1) < time() * 1000
+        return is_active_fort and fort['id'] not in visited_forts and distance_in_meters(starting_location, (
+            fort['latitude'], fort['longitude'])) < proximity
+    forts = [(f, distance_in_meters(origin, (f['latitude'], f['longitude']))) for f in forts]
+    return sorted([f for f in forts if is_active_pokestop(f[0])], key=lambda x: x[1])
+
+
+def random_forts(count, seed=42):
+    rnd = random.Random(seed)
+    return [{'id': str(i), 'type': 1, 'enabled': True,
+             'latitude': ORIGIN[0] + rnd.uniform(-0.05, 0.05), 'longitude': ORIGIN[1] + rnd.uniform(-0.05, 0.05)}
+            for i in range(count)]
+
+
+def main():
+    for count in (1000, 10000, 100000):
+        forts = random_forts(count)
+        number = max(1, 10000 // count)
+        legacy = timeit.timeit(lambda: legacy_filtered_forts(ORIGIN, ORIGIN, forts, 4000), number=1)
+        geod = timeit.timeit(lambda: filtered_forts(ORIGIN, ORIGIN, forts, 4000, method=DISTANCE_GEOD), number=number) / number
+        haversine = timeit.timeit(lambda: filtered_forts(ORIGIN, ORIGIN, forts, 4000, method=DISTANCE_HAVERSINE), number=number) / number
+        print("{0:>7} forts   vincenty {1:>9.1f} ms   geod {2:>8.1f} ms   haversine {3:>8.1f} ms".format(
+            count, legacy * 1e3, geod * 1e3, haversine * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Map refresh while the player stays inside the same cells: a full
+GET_MAP_OBJECTS response (since_timestamp_ms of 0 for every cell) vs the
+delta the server sends for the per-cell timestamps of the MapCellCache, here
+one cell with a new pokemon. Reports the payload size and the cost of
+parsing it and merging it into the cache.
+
+    python benchmarks/bench_map_cache.py
+"""
+from __future__ import print_function
+
+import timeit
+
+import fixtures
+from pgoapi.map_cache import MapCellCache
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import \
+    GetMapObjectsResponse
+
+
+def delta_response(full):
+    delta = GetMapObjectsResponse()
+    delta.status = 1
+    for i, full_cell in enumerate(full.map_cells):
+        cell = delta.map_cells.add()
+        cell.s2_cell_id = full_cell.s2_cell_id
+        cell.current_timestamp_ms = full_cell.current_timestamp_ms + 10000
+        if i == 0:
+            cell.catchable_pokemons.add().CopyFrom(full_cell.catchable_pokemons[0])
+            cell.catchable_pokemons[0].encounter_id += 1
+    return delta
+
+
+def refresh(cache, payload, cell_ids):
+    response = GetMapObjectsResponse()
+    response.ParseFromString(payload)
+    cache.update(response, now_ms=1469600000000)
+    return cache.map_cells(cell_ids)
+
+
+def main():
+    number = 50
+    full = fixtures.map_objects_response()
+    cell_ids = [cell.s2_cell_id for cell in full.map_cells]
+    full_payload = full.SerializeToString()
+    delta_payload = delta_response(full).SerializeToString()
+
+    cache = MapCellCache()
+    refresh(cache, full_payload, cell_ids)
+    assert len(refresh(cache, delta_payload, cell_ids)[0]['catchable_pokemons']) == len(full.map_cells[0].catchable_pokemons) + 1
+
+    full_time = timeit.timeit(lambda: refresh(MapCellCache(), full_payload, cell_ids), number=number) / number
+    delta_time = timeit.timeit(lambda: refresh(cache, delta_payload, cell_ids), number=number) / number
+    print("{0:<8} {1:>8} bytes   parse + merge {2:>8.2f} ms".format("full", len(full_payload), full_time * 1e3))
+    print("{0:<8} {1:>8} bytes   parse + merge {2:>8.2f} ms".format("delta", len(delta_payload), delta_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
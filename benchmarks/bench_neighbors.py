@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+"""
+get_neighbors along a walk of 5 m steps: the covering computed from scratch
+for every step vs the memoized covering.
+
+    python benchmarks/bench_neighbors.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.location import _coverings, get_increments, get_neighbors  # noqa
+
+
+def main():
+    walk = get_increments((34.0205, -118.2856, 0), (34.0300, -118.2700), step_size=5)
+
+    def neighbors(key_level):
+        for step in walk:
+            get_neighbors(step, key_level=key_level)
+
+    uncached = timeit.timeit(lambda: neighbors(None), number=1) / len(walk)
+    _coverings.clear()
+    cached = timeit.timeit(lambda: neighbors(18), number=1) / len(walk)
+    print("{0} steps, {1} coverings computed".format(len(walk), len(_coverings)))
+    print("uncached {0:>8.1f} us/step   memoized {1:>8.1f} us/step".format(uncached * 1e6, cached * 1e6))
+
+
+if __name__ == '__main__':
+    main()
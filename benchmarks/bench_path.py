@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Interpolating a walk of 1-50 km in 5 m steps the way walk_to used to
+(get_increments per route step with a new Geod, vincenty for every
+increment) vs streaming it from interpolate_path.
+
+    python benchmarks/bench_path.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+import pyproj
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.location import distance_in_meters, interpolate_path  # noqa
+
+ORIGIN = (34.0205, -118.2856, 0)
+STEP_SIZE = 5
+
+
+def legacy_get_increments(start, end, step_size):
+    g = pyproj.Geod(ellps='WGS84')
+    (startlat, startlong, _) = start
+    (endlat, endlong) = end
+    (az12, az21, dist) = g.inv(startlong, startlat, endlong, endlat)
+    lonlats = g.npts(startlong, startlat, endlong, endlat, 1 + int(dist / step_size))
+    lonlats.append((endlong, endlat))
+    return [(l[1], l[0], 0) for l in lonlats]
+
+
+def legacy_walk(start, waypoints):
+    position, walked = start, 0
+    for waypoint in waypoints:
+        for point in legacy_get_increments(position, waypoint, STEP_SIZE):
+            walked += distance_in_meters(position, point)
+            position = point
+    return walked
+
+
+def walk(start, waypoints):
+    return sum(distance for _, distance in interpolate_path(start, waypoints, STEP_SIZE))
+
+
+def main():
+    for km in (1, 10, 50):
+        # a zig-zag of 10 route steps
+        waypoints = [(ORIGIN[0] + km * 0.0009 * (i + 1), ORIGIN[1] + (0.0005 if i % 2 else 0)) for i in range(10)]
+        legacy = min(timeit.repeat(lambda: legacy_walk(ORIGIN, waypoints), number=1, repeat=3))
+        streamed = min(timeit.repeat(lambda: walk(ORIGIN, waypoints), number=1, repeat=3))
+        print("{0:>3} km   get_increments + vincenty {1:>8.1f} ms   interpolate_path {2:>6.1f} ms".format(km, legacy * 1e3, streamed * 1e3))
+
+
+if __name__ == '__main__':
+    main()
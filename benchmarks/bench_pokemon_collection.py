@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Memory and time of holding a 250 pokemon bag as Pokemon objects vs a
+PokemonCollection, built from the same pokemon_data dicts, for a number of
+accounts at once.
+
+    python benchmarks/bench_pokemon_collection.py
+"""
+from __future__ import print_function
+
+import timeit
+import tracemalloc
+
+import fixtures
+from pgoapi.inventory import Inventory
+from pgoapi.pokemon import Pokemon, PokemonCollection
+from pgoapi.protobuf_to_dict import protobuf_to_dict
+
+ACCOUNTS = 100
+PLAYER_LEVEL = 22
+
+
+def bag():
+    items = protobuf_to_dict(fixtures.inventory_response(pokemon_count=250))['inventory_delta']['inventory_items']
+    return list(Inventory([0, 0, 0, False], items).pokemon.values())
+
+
+def as_objects(pokemon_data):
+    return [Pokemon(p, PLAYER_LEVEL, "FANCY") for p in pokemon_data]
+
+
+def as_collection(pokemon_data):
+    pokemons = PokemonCollection(pokemon_data, PLAYER_LEVEL, "FANCY")
+    # what cleanup_pokemon reads
+    pokemons.column('score')
+    return pokemons
+
+
+def allocated(build, bags):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(pokemon_data) for pokemon_data in bags]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    # pokemon_data dicts are shared, only what's built on top of them is measured
+    bags = [bag() for _ in range(ACCOUNTS)]
+    for name, build in (('Pokemon objects', as_objects), ('PokemonCollection', as_collection)):
+        size = allocated(build, bags)
+        seconds = min(timeit.repeat(lambda: build(bags[0]), number=20, repeat=3)) / 20
+        print("{0:<18} {1:>8.1f} KB per 250 pokemon bag   {2:>7.2f} ms to build".format(name, size / 1024.0 / ACCOUNTS, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
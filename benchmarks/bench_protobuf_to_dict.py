@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Benchmark of protobuf_to_dict on GET_INVENTORY and GET_MAP_OBJECTS responses:
+the previous per-call field adaptor walk vs the compiled, cached conversion
+plans. Both outputs are checked to be identical. The lazy views are measured
+reading a single top level key, which is what most callers do.
+
+    python benchmarks/bench_protobuf_to_dict.py [data_dumps/<username>.json]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+import tracemalloc
+
+import fixtures
+from google.protobuf.descriptor import FieldDescriptor
+from pgoapi.protobuf_to_dict import (EXTENSION_CONTAINER, TYPE_CALLABLE_MAP,
+                                     LazyMessageDict, protobuf_to_dict,
+                                     repeated)
+
+
+def legacy_protobuf_to_dict(pb, type_callable_map=TYPE_CALLABLE_MAP, use_enum_labels=False):
+    result_dict = {}
+    extensions = {}
+    for field, value in pb.ListFields():
+        if field.message_type and field.message_type.has_options and field.message_type.GetOptions().map_entry:
+            result_dict[field.name] = dict(value)
+            continue
+        if field.type == FieldDescriptor.TYPE_MESSAGE:
+            type_callable = lambda pb: legacy_protobuf_to_dict(pb, type_callable_map, use_enum_labels)  # noqa
+        else:
+            type_callable = type_callable_map[field.type]
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            type_callable = repeated(type_callable)
+        if field.is_extension:
+            extensions[str(field.number)] = type_callable(value)
+            continue
+        result_dict[field.name] = type_callable(value)
+    if extensions:
+        result_dict[EXTENSION_CONTAINER] = extensions
+    return result_dict
+
+
+def bench(label, message, number):
+    assert legacy_protobuf_to_dict(message) == protobuf_to_dict(message), "output differs for %s" % label
+    before = timeit.timeit(lambda: legacy_protobuf_to_dict(message), number=number) / number
+    after = timeit.timeit(lambda: protobuf_to_dict(message), number=number) / number
+    print("{0:<28} before {1:>8.2f} ms   after {2:>8.2f} ms   speedup {3:.2f}x".format(
+        label, before * 1e3, after * 1e3, before / after))
+
+
+def peak_memory(convert):
+    tracemalloc.start()
+    convert()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_lazy(label, message, number):
+    key = sorted(LazyMessageDict(message))[-1]
+    assert LazyMessageDict(message) == protobuf_to_dict(message), "lazy view differs for %s" % label
+    full = timeit.timeit(lambda: protobuf_to_dict(message)[key], number=number) / number
+    lazy = timeit.timeit(lambda: LazyMessageDict(message)[key], number=number) / number
+    print("{0:<28} dict   {1:>8.1f} us   lazy  {2:>8.1f} us   peak {3:>7.1f} kB -> {4:.1f} kB".format(
+        label + " [" + key + "]", full * 1e6, lazy * 1e6,
+        peak_memory(lambda: protobuf_to_dict(message)) / 1024.0, peak_memory(lambda: LazyMessageDict(message)[key]) / 1024.0))
+
+
+def main():
+    if len(sys.argv) > 1:
+        messages = fixtures.load_recorded(sys.argv[1])
+    else:
+        messages = {
+            'GET_INVENTORY': fixtures.inventory_response(),
+            'GET_MAP_OBJECTS': fixtures.map_objects_response(),
+        }
+    for name, message in sorted(messages.items()):
+        bench(name, message, 50)
+    for name, message in sorted(messages.items()):
+        bench_lazy(name, message, 50)
+
+
+if __name__ == '__main__':
+    main()
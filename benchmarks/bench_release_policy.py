@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Time to pick the pokemon to release from a 250 pokemon bag, one Pokemon
+object at a time with the rules ReleasePolicy replaced (the reference
+in tests/test_pokemon.py) vs the whole bag at once with ReleasePolicy,
+for every release method.
+
+    python benchmarks/bench_release_policy.py
+"""
+from __future__ import print_function
+
+import timeit
+
+import fixtures
+from pgoapi.inventory import Inventory
+from pgoapi.pgoapi import PGoApi
+from pgoapi.pokemon import PokemonCollection
+from pgoapi.protobuf_to_dict import protobuf_to_dict
+from tests.test_pokemon import per_object_release
+
+PLAYER_LEVEL = 22
+METHODS = {
+    "CLASSIC": {"KEEP_CP_OVER": 500, "KEEP_IV_OVER": 80},
+    "ADVANCED": {"BEST_IV": {"MIN_AMOUNT": 2, "MAX_AMOUNT": 5}, "BEST_CP": {"MIN_AMOUNT": 1, "MAX_AMOUNT": 3}},
+    "DUPLICATES": {"RELEASE_DUPLICATES_SCALAR": 0.9, "RELEASE_DUPLICATES_MAX_SCORE": 0.7},
+}
+
+
+def main():
+    items = protobuf_to_dict(fixtures.inventory_response(pokemon_count=250))['inventory_delta']['inventory_items']
+    bag = list(Inventory([0, 0, 0, False], items).pokemon.values())
+    for method, conf in sorted(METHODS.items()):
+        api = PGoApi({"POKEMON_CLEANUP": {"RELEASE_METHOD": method, "RELEASE_METHOD_" + method: conf, "SCORE_METHOD": "FANCY"}})
+
+        def vectorized():
+            return api.release_policy.release_list(PokemonCollection(bag, PLAYER_LEVEL, api.SCORE_METHOD, api.SCORE_SETTINGS))
+
+        released = len(vectorized())
+        for name, select in (('per object', lambda: per_object_release(api, bag)), ('ReleasePolicy', vectorized)):
+            seconds = min(timeit.repeat(select, number=20, repeat=3)) / 20
+            print("{0:<11} {1:<14} {2:>7.2f} ms   {3} of {4} released".format(method, name, seconds * 1000, released, len(bag)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of sub-request building: resolving the *Message/*Response
+classes by name on every call (the old RpcApi.get_class path) vs the
+precompiled ProtoRegistry lookup.
+
+    python benchmarks/bench_request_building.py
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+from importlib import import_module
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.proto_registry import registry  # noqa
+from pgoapi.protos.POGOProtos.Networking.Envelopes_pb2 import RequestEnvelope  # noqa
+from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType  # noqa
+from pgoapi.rpc_api import RpcApi  # noqa
+from pgoapi.utilities import to_camel_case  # noqa
+
+HEARTBEAT = [
+    RequestType.Value('GET_PLAYER'),
+    RequestType.Value('GET_HATCHED_EGGS'),
+    RequestType.Value('GET_INVENTORY'),
+    RequestType.Value('CHECK_AWARDED_BADGES'),
+    {RequestType.Value('DOWNLOAD_SETTINGS'): {'hash': "05daf51635c82611d1aac95c0b051d3ec088a930"}},
+]
+CATCH = [{RequestType.Value('CATCH_POKEMON'): {
+    'normalized_reticle_size': 1.950, 'pokeball': 1, 'spin_modifier': 0.850, 'hit_pokemon': True,
+    'normalized_hit_position': 1, 'encounter_id': 1234567890123, 'spawn_point_id': '89c2f9a7a2b'}}]
+
+
+def get_class(cls):
+    module_, class_ = cls.rsplit('.', 1)
+    return getattr(import_module(module_), class_)
+
+
+def resolve_by_name(request_types):
+    for request_type in request_types:
+        name = to_camel_case(RequestType.Name(request_type).lower())
+        get_class('POGOProtos.Networking.Requests.Messages_pb2.' + name + 'Message')
+        get_class('POGOProtos.Networking.Responses_pb2.' + name + 'Response')
+
+
+def resolve_by_registry(request_types):
+    for request_type in request_types:
+        registry.get_message_class(request_type)
+        registry.get_response_class(request_type)
+
+
+def report(label, seconds, number):
+    print("{0:<40} {1:>8.2f} us/op".format(label, seconds / number * 1e6))
+
+
+def main():
+    number = 20000
+    request_types = [r if isinstance(r, int) else list(r.keys())[0] for r in HEARTBEAT + CATCH]
+    registry.warm_up()
+
+    report("class lookup by name (before)", timeit.timeit(lambda: resolve_by_name(request_types), number=number), number)
+    report("class lookup via registry (after)", timeit.timeit(lambda: resolve_by_registry(request_types), number=number), number)
+
+    rpc = RpcApi(None)
+    report("build heartbeat sub-requests", timeit.timeit(lambda: rpc._build_sub_requests(RequestEnvelope(), HEARTBEAT), number=number), number)
+    report("build catch sub-request", timeit.timeit(lambda: rpc._build_sub_requests(RequestEnvelope(), CATCH), number=number), number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Per-RPC CPU cost of parsing a server response in each RpcApi response mode,
+reading what the bot reads afterwards: the FORT_SEARCH result and rewards,
+the CATCH_POKEMON status and the forts of every GET_MAP_OBJECTS map cell.
+Parsing the wire format costs the same in every mode, so the difference to
+"dict" is the conversion work saved.
+
+    python benchmarks/bench_response_modes.py
+"""
+from __future__ import print_function
+
+import timeit
+
+import fixtures
+from pgoapi.protos.POGOProtos.Networking.Envelopes_pb2 import ResponseEnvelope
+from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import (
+    CatchPokemonResponse, FortSearchResponse)
+from pgoapi.rpc_api import RpcApi
+
+MODES = (RpcApi.RESPONSE_MODE_DICT, RpcApi.RESPONSE_MODE_LAZY, RpcApi.RESPONSE_MODE_PROTO)
+
+
+class HttpResponse(object):
+    status_code = 200
+
+    def __init__(self, *subresponses):
+        envelope = ResponseEnvelope()
+        envelope.status_code = 1
+        envelope.request_id = 8145806132888207460
+        for subresponse in subresponses:
+            envelope.returns.append(subresponse.SerializeToString())
+        self.content = envelope.SerializeToString()
+
+
+def fort_search():
+    response = FortSearchResponse()
+    response.result = 1
+    response.experience_awarded = 50
+    for item_id in (1, 1, 2, 701):
+        item = response.items_awarded.add()
+        item.item_id = item_id
+        item.item_count = 1
+    return HttpResponse(response), [RequestType.Value('FORT_SEARCH')]
+
+
+def catch_pokemon():
+    response = CatchPokemonResponse()
+    response.status = 1
+    response.captured_pokemon_id = 10000000000000000000
+    response.capture_award.xp.extend([100, 10])
+    response.capture_award.candy.append(3)
+    response.capture_award.stardust.append(100)
+    return HttpResponse(response), [RequestType.Value('CATCH_POKEMON')]
+
+
+def get_map_objects():
+    return HttpResponse(fixtures.map_objects_response()), [RequestType.Value('GET_MAP_OBJECTS')]
+
+
+def read(mode, name, response):
+    response = response['responses'][name]
+    if mode == RpcApi.RESPONSE_MODE_PROTO:
+        if name == 'GET_MAP_OBJECTS':
+            return [fort.id for cell in response.map_cells for fort in cell.forts]
+        if name == 'FORT_SEARCH':
+            return response.result, [item.item_id for item in response.items_awarded]
+        return response.status
+    if name == 'GET_MAP_OBJECTS':
+        return [fort['id'] for cell in response['map_cells'] for fort in cell.get('forts', [])]
+    if name == 'FORT_SEARCH':
+        return response['result'], [item['item_id'] for item in response['items_awarded']]
+    return response['status']
+
+
+def main():
+    number = 300
+    for name, build in (('FORT_SEARCH', fort_search), ('CATCH_POKEMON', catch_pokemon), ('GET_MAP_OBJECTS', get_map_objects)):
+        http_response, subrequests = build()
+        timings = []
+        results = []
+        for mode in MODES:
+            rpc = RpcApi(None, response_mode=mode)
+
+            def parse_and_read():
+                return read(mode, name, rpc._parse_main_response(http_response, subrequests))
+            results.append(parse_and_read())
+            timings.append(min(timeit.repeat(parse_and_read, number=number, repeat=5)) / number)
+        assert results.count(results[0]) == len(results), "response modes disagree for %s" % name
+        print("{0:<16} ".format(name) + "   ".join(
+            "{0} {1:>8.1f} us".format(mode, seconds * 1e6) for mode, seconds in zip(MODES, timings)) +
+            "   saved per RPC {0:>8.1f} us".format((timings[0] - timings[2]) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"""
+plan_route over 20-500 forts spread over ~4 km: planning time and the length
+of the planned walk vs visiting the forts nearest first, the order
+spin_near_fort used to walk them in.
+
+    python benchmarks/bench_route_planner.py
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.location import distances_in_meters, plan_route, route_distance  # noqa
+
+ORIGIN = (34.0205, -118.2856, 0)
+
+
+def random_stops(count, seed=42):
+    rnd = random.Random(seed)
+    return [(ORIGIN[0] + rnd.uniform(-0.02, 0.02), ORIGIN[1] + rnd.uniform(-0.02, 0.02)) for _ in range(count)]
+
+
+def main():
+    for count in (20, 50, 100, 200, 500):
+        stops = random_stops(count)
+        distances = distances_in_meters(ORIGIN, [s[0] for s in stops], [s[1] for s in stops])
+        by_distance = [stops[i] for i in distances.argsort()]
+        order = plan_route(ORIGIN, stops)
+        planned = min(timeit.repeat(lambda: plan_route(ORIGIN, stops), number=1, repeat=3))
+        print("{0:>4} forts   plan_route {1:>7.1f} ms   walk {2:>6.0f} m   nearest first {3:>7.0f} m".format(
+            count, planned * 1e3, route_distance(ORIGIN, [stops[i] for i in order]), route_distance(ORIGIN, by_distance)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Spinnable forts within 1 km of the player out of 1k-100k known forts:
+filtered_forts over every fort vs a SpatialIndex radius query, and the
+nearest fort via SpatialIndex.nearest.
+
+    python benchmarks/bench_spatial_index.py
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.location import filtered_forts, is_spinnable_pokestop  # noqa
+from pgoapi.spatial_index import SpatialIndex  # noqa
+
+ORIGIN = (34.0205, -118.2856, 0)
+RADIUS = 1000
+
+
+def random_forts(count, seed=42):
+    rnd = random.Random(seed)
+    # roughly constant density, so the query area holds the same number of forts
+    spread = 0.05 * (count / 1000.0) ** 0.5
+    return [{'id': str(i), 'type': 1, 'enabled': True,
+             'latitude': ORIGIN[0] + rnd.uniform(-spread, spread), 'longitude': ORIGIN[1] + rnd.uniform(-spread, spread)}
+            for i in range(count)]
+
+
+def main():
+    for count in (1000, 10000, 100000):
+        forts = random_forts(count)
+        index = SpatialIndex()
+        for fort in forts:
+            index.insert(fort['id'], fort['latitude'], fort['longitude'], fort)
+
+        def linear():
+            return [f for f in filtered_forts(ORIGIN, ORIGIN, forts, 0) if f[1] <= RADIUS]
+
+        def indexed():
+            return index.radius(ORIGIN[0], ORIGIN[1], RADIUS, predicate=lambda fort: is_spinnable_pokestop(fort, {}))
+
+        assert [f['id'] for f, _ in linear()] == [f['id'] for f, _ in indexed()]
+        number = max(1, 10000 // count)
+        scan = min(timeit.repeat(linear, number=number, repeat=3)) / number
+        query = min(timeit.repeat(indexed, number=20, repeat=3)) / 20
+        nearest = min(timeit.repeat(lambda: index.nearest(ORIGIN[0], ORIGIN[1]), number=20, repeat=3)) / 20
+        print("{0:>7} forts ({1:>3} in range)   filtered_forts {2:>8.2f} ms   radius {3:>6.2f} ms   nearest {4:>6.2f} ms".format(
+            count, len(indexed()), scan * 1e3, query * 1e3, nearest * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Simulated player standing among 200 spawn points for 3 hours: map requests
+every 5 seconds vs requests scheduled by the SpawnModel (at least 5 and at
+most 60 seconds apart), counting the requests, the spawns seen and how long
+after appearing they were first seen.
+
+    python benchmarks/bench_spawn_model.py
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.spawn_model import HOUR_MS, SpawnModel  # noqa
+
+ORIGIN = (34.0205, -118.2856)
+START_MS = 1469599200000
+HOURS = 3
+
+
+def spawn_points(count=200, seed=42):
+    rnd = random.Random(seed)
+    return [('sp%i' % i, ORIGIN[0] + rnd.uniform(-0.008, 0.008), ORIGIN[1] + rnd.uniform(-0.008, 0.008),
+             rnd.randrange(HOUR_MS), rnd.choice((15, 15, 15, 30)) * 60 * 1000) for i in range(count)]
+
+
+def simulate(points, next_request):
+    seen = {}
+    requests = 0
+    now = START_MS
+    while now < START_MS + HOURS * HOUR_MS:
+        requests += 1
+        visible = []
+        for spawn_point_id, lat, lng, appear_of_hour, duration in points:
+            appeared = now - (now - appear_of_hour) % HOUR_MS
+            if now - appeared < duration:
+                visible.append((spawn_point_id, lat, lng, appeared + duration))
+                seen.setdefault((spawn_point_id, appeared), now - appeared)
+        now = next_request(now, visible)
+    # every spawn point spawns once in each simulated hour
+    total = len(points) * HOURS
+    delays = [delay for (_, appeared), delay in seen.items() if appeared >= START_MS]
+    return requests, len(delays), total, sum(delays) / 1000.0 / max(1, len(delays))
+
+
+def main():
+    points = spawn_points()
+    model = SpawnModel()
+
+    def fixed(now, visible):
+        return now + 5000
+
+    def scheduled(now, visible):
+        for spawn_point_id, lat, lng, despawn in visible:
+            model.observe_pokemon(spawn_point_id, lat, lng, despawn, now)
+        return model.next_refresh(now, ORIGIN, 1500, 5000, 60000)
+
+    for name, strategy in (('every 5 s', fixed), ('spawn model', scheduled)):
+        requests, seen, total, delay = simulate(points, strategy)
+        print("{0:<12} {1:>5} requests   {2}/{3} spawns seen   {4:>5.1f} s after appearing on average".format(name, requests, seen, total, delay))
+
+
+if __name__ == '__main__':
+    main()
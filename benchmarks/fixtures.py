@@ -0,0 +1,143 @@
+"""
+Synthetic but realistically sized server responses for the benchmarks.
+
+Recorded responses can be used instead: the heartbeat writes every
+GET_INVENTORY response to data_dumps/<username>.json, and load_recorded()
+turns those dicts back into protobuf messages.
+"""
+from __future__ import absolute_import
+
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from pgoapi.protobuf_to_dict import dict_to_protobuf  # noqa
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import (  # noqa
+    GetInventoryResponse, GetMapObjectsResponse)
+
+RESPONSE_CLASSES = {
+    'GET_INVENTORY': GetInventoryResponse,
+    'GET_MAP_OBJECTS': GetMapObjectsResponse,
+}
+
+
+def inventory_response(pokemon_count=250, seed=42):
+    rnd = random.Random(seed)
+    response = GetInventoryResponse()
+    response.success = True
+    delta = response.inventory_delta
+    delta.new_timestamp_ms = 1469600000000
+
+    for item_id in (1, 2, 3, 4, 101, 102, 103, 104, 201, 202, 301, 401, 501, 701, 901, 902):
+        entry = delta.inventory_items.add()
+        entry.modified_timestamp_ms = 1469600000000
+        entry.inventory_item_data.item.item_id = item_id
+        entry.inventory_item_data.item.count = rnd.randint(1, 100)
+
+    for i in range(pokemon_count):
+        entry = delta.inventory_items.add()
+        entry.modified_timestamp_ms = 1469600000000 + i
+        pokemon = entry.inventory_item_data.pokemon_data
+        pokemon.id = 10000000000000000000 + i
+        pokemon.pokemon_id = rnd.randint(1, 151)
+        pokemon.cp = rnd.randint(10, 2000)
+        pokemon.stamina = pokemon.stamina_max = rnd.randint(10, 200)
+        pokemon.move_1 = rnd.randint(200, 250)
+        pokemon.move_2 = rnd.randint(13, 130)
+        pokemon.height_m = rnd.random()
+        pokemon.weight_kg = rnd.random() * 50
+        pokemon.individual_attack = rnd.randint(0, 15)
+        pokemon.individual_defense = rnd.randint(0, 15)
+        pokemon.individual_stamina = rnd.randint(0, 15)
+        pokemon.cp_multiplier = rnd.uniform(0.094, 0.79)
+        pokemon.pokeball = 1
+        pokemon.captured_cell_id = 9970561120513919632
+        pokemon.creation_time_ms = 1469596340021 + i
+
+    for family_id in range(1, 151, 3):
+        entry = delta.inventory_items.add()
+        entry.inventory_item_data.pokemon_family.family_id = family_id
+        entry.inventory_item_data.pokemon_family.candy = rnd.randint(0, 300)
+
+    for pokemon_id in range(1, 152):
+        entry = delta.inventory_items.add()
+        entry.inventory_item_data.pokedex_entry.pokemon_id = pokemon_id
+        entry.inventory_item_data.pokedex_entry.times_encountered = rnd.randint(1, 50)
+        entry.inventory_item_data.pokedex_entry.times_captured = rnd.randint(0, 50)
+
+    entry = delta.inventory_items.add()
+    stats = entry.inventory_item_data.player_stats
+    stats.level = 22
+    stats.experience = 250000
+    stats.km_walked = 123.4
+
+    return response
+
+
+def map_objects_response(cells=21, forts_per_cell=6, pokemon_per_cell=3, seed=42, lat=34.0205, lng=-118.2856):
+    rnd = random.Random(seed)
+    response = GetMapObjectsResponse()
+    response.status = 1
+    for c in range(cells):
+        cell = response.map_cells.add()
+        cell.s2_cell_id = 9279742050779955200 + c * 0x10000000
+        cell.current_timestamp_ms = 1469600000000
+        for f in range(forts_per_cell):
+            fort = cell.forts.add()
+            fort.id = '%032x.%i' % (rnd.getrandbits(128), 16)
+            fort.last_modified_timestamp_ms = 1469600000000
+            fort.latitude = lat + rnd.uniform(-0.01, 0.01)
+            fort.longitude = lng + rnd.uniform(-0.01, 0.01)
+            fort.enabled = True
+            fort.type = 1 if f % 4 else 0
+            if f % 5 == 0:
+                fort.lure_info.fort_id = fort.id
+                fort.lure_info.encounter_id = rnd.getrandbits(63)
+                fort.lure_info.active_pokemon_id = rnd.randint(1, 151)
+        for s in range(pokemon_per_cell * 3):
+            spawn_point = cell.spawn_points.add()
+            spawn_point.latitude = lat + rnd.uniform(-0.01, 0.01)
+            spawn_point.longitude = lng + rnd.uniform(-0.01, 0.01)
+        for p in range(pokemon_per_cell):
+            encounter_id = rnd.getrandbits(63)
+            spawn_point_id = '%011x' % rnd.getrandbits(44)
+            latitude = lat + rnd.uniform(-0.01, 0.01)
+            longitude = lng + rnd.uniform(-0.01, 0.01)
+            pokemon_id = rnd.randint(1, 151)
+
+            catchable = cell.catchable_pokemons.add()
+            catchable.encounter_id = encounter_id
+            catchable.spawn_point_id = spawn_point_id
+            catchable.pokemon_id = pokemon_id
+            catchable.expiration_timestamp_ms = 1469600900000
+            catchable.latitude = latitude
+            catchable.longitude = longitude
+
+            wild = cell.wild_pokemons.add()
+            wild.encounter_id = encounter_id
+            wild.spawn_point_id = spawn_point_id
+            wild.latitude = latitude
+            wild.longitude = longitude
+            wild.last_modified_timestamp_ms = 1469600000000
+            wild.time_till_hidden_ms = 600000
+            wild.pokemon_data.pokemon_id = pokemon_id
+
+            nearby = cell.nearby_pokemons.add()
+            nearby.pokemon_id = pokemon_id
+            nearby.encounter_id = encounter_id
+            nearby.distance_in_meters = rnd.uniform(0, 200)
+    return response
+
+
+def load_recorded(path):
+    """Turn the responses recorded in a data_dumps/<username>.json file back into protobuf messages."""
+    with open(path) as f:
+        recorded = json.load(f)
+    messages = {}
+    for name, response_class in RESPONSE_CLASSES.items():
+        if isinstance(recorded.get(name), dict):
+            messages[name] = dict_to_protobuf(response_class, recorded[name], strict=False)
+    return messages
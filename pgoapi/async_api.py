@@ -0,0 +1,256 @@
+"""
+asyncio counterpart of PGoApi/RpcApi (Python 3.5+, needs aiohttp).
+
+Requests are built and responses parsed by the same RpcApi code, only the HTTP
+round trip is awaited, so a single event loop can drive many accounts at once
+without gevent monkey patching:
+
+    api = AsyncPGoApi(config)
+    api.set_position(lat, lng, 0.0)
+    if await api.login('ptc', username, password):
+        response = await api.get_player().get_inventory().call()
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import logging
+
+from pgoapi.auth_google import AuthGoogle
+from pgoapi.auth_ptc import AuthPtc
+from pgoapi.capture import ResponseCapture
+from pgoapi.exceptions import (AuthException, NotLoggedInException,
+                               ServerBusyOrOfflineException)
+from pgoapi.pgoapi import LOGIN_LOG, PGoApi, cdef, cgray, cmagenta, cred
+from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
+from pgoapi.rate_limiter import RateLimiter
+from pgoapi.rpc_api import RpcApi
+from pgoapi.transport import Transport
+from pgoapi.utilities import f2i
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncHttpResponse(object):
+    # the parts of a requests response that RpcApi._parse_main_response reads
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+
+class AsyncTransport(object):
+    """
+    aiohttp counterpart of Transport: one keep-alive ClientSession whose
+    connections are reused by every RPC posted through it, together with the
+    global request budget (rate_limit) of every api using it.
+    """
+
+    def __init__(self, pool_maxsize=Transport.DEFAULT_POOL_MAXSIZE, max_retries=0, rate_limit=None):
+        if aiohttp is None:
+            raise ImportError("AsyncTransport requires aiohttp, please install it (pip install aiohttp)")
+        self.log = logging.getLogger(__name__)
+        self._pool_maxsize = pool_maxsize
+        self._max_retries = max_retries
+        self.rate_limit = rate_limit
+        # created on first use, a ClientSession belongs to the running event loop
+        self._session = None
+
+    @classmethod
+    def from_config(cls, config):
+        network = config.get("NETWORK", {})
+        return cls(pool_maxsize=network.get("POOL_MAXSIZE", Transport.DEFAULT_POOL_MAXSIZE),
+                   max_retries=network.get("MAX_RETRIES", 0),
+                   rate_limit=RateLimiter.shared_from_config(config))
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self._pool_maxsize)
+            self._session = aiohttp.ClientSession(connector=connector, headers={'User-Agent': 'Niantic App'})
+        return self._session
+
+    async def post(self, endpoint, data):
+        attempt = 0
+        while True:
+            try:
+                async with self._get_session().post(endpoint, data=data) as response:
+                    return AsyncHttpResponse(response.status, await response.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self._max_retries:
+                    raise ServerBusyOrOfflineException
+                attempt += 1
+                self.log.debug('Connection failed, retry %s of %s', attempt, self._max_retries)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class AsyncRpcApi(RpcApi):
+
+    async def request(self, endpoint, subrequests, player_position):
+
+        if not self._auth_provider or self._auth_provider.is_login() is False:
+            raise NotLoggedInException()
+
+        request_proto = self._build_main_request(subrequests, player_position)
+        self.log.debug('Execution of RPC')
+        response = await self._transport.post(endpoint, request_proto.SerializeToString())
+
+        return self._parse_main_response(response, subrequests)
+
+
+class AsyncRequest(object):
+    """
+    Sub-requests of a single RPC, chained the same way as on PGoApi. Every
+    chain owns its list, so concurrent tasks never mix up their requests.
+    """
+
+    def __init__(self, api):
+        self._api = api
+        self._req_method_list = []
+
+    def __getattr__(self, func):
+        name = func.upper()
+        if name not in RequestType.keys():
+            raise AttributeError(func)
+
+        def function(**kwargs):
+            if kwargs:
+                self._req_method_list.append({RequestType.Value(name): kwargs})
+            else:
+                self._req_method_list.append(RequestType.Value(name))
+            return self
+        return function
+
+    def list_curr_methods(self):
+        for i in self._req_method_list:
+            print("{} ({})".format(RequestType.Name(i if isinstance(i, int) else list(i.keys())[0]), i))
+
+    def call(self, response_mode=None):
+        return self._api._call(self._req_method_list, response_mode)
+
+
+class AsyncPGoApi(object):
+    API_ENTRY = PGoApi.API_ENTRY
+
+    def __init__(self, config, transport=None):
+
+        self.log = logging.getLogger(__name__)
+
+        self._auth_provider = None
+        self._api_endpoint = None
+        self.config = config
+        # one AsyncTransport can be shared by every account running on the loop
+        self._transport = transport or AsyncTransport.from_config(config)
+        self._capture = ResponseCapture.from_config(config)
+        self._response_mode = config.get("NETWORK", {}).get("RESPONSE_MODE", RpcApi.RESPONSE_MODE_DICT)
+        self._position_lat = 0
+        self._position_lng = 0
+        self._position_alt = 0
+        self._posf = (0, 0, 0)
+        # the RATE_LIMIT budget of the account, the waits are awaited on the loop
+        self.rate_limiter = RateLimiter.from_config(config, shared=getattr(self._transport, 'rate_limit', None))
+        # one RPC at a time per account, created lazily so it binds to the running loop
+        self._lock = None
+
+    def get_position(self):
+        return (self._position_lat, self._position_lng, self._position_alt)
+
+    def set_position(self, lat, lng, alt):
+        self.log.debug('Set Position - Lat: %s Long: %s Alt: %s', lat, lng, alt)
+        self._posf = (lat, lng, alt)
+        self._position_lat = f2i(lat)
+        self._position_lng = f2i(lng)
+        self._position_alt = f2i(alt)
+
+    def create_request(self):
+        return AsyncRequest(self)
+
+    def __getattr__(self, func):
+        if func.upper() in RequestType.keys():
+            return getattr(AsyncRequest(self), func)
+        raise AttributeError(func)
+
+    async def _call(self, req_method_list, response_mode=None):
+        if not req_method_list:
+            return False
+
+        if self._auth_provider is None or not self._auth_provider.is_login():
+            self.log.info(
+                LOGIN_LOG +
+                cred + 'Not logged in' + cdef)
+            return False
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            request = AsyncRpcApi(self._auth_provider, self._transport, self._capture, response_mode or self._response_mode)
+            response = None
+            try:
+                response = await request.request(self._api_endpoint or self.API_ENTRY, req_method_list, self.get_position())
+            except ServerBusyOrOfflineException as e:
+                self.log.info(
+                    LOGIN_LOG +
+                    cred + 'Server seems to be busy or offline - try again! (%s)' + cdef, e)
+            self.rate_limiter.report(response)
+            return response
+
+    async def login(self, provider, username, password):
+        if not isinstance(username, str) or not isinstance(password, str):
+            raise AuthException("Username/password not correctly specified")
+
+        if provider == 'ptc':
+            self._auth_provider = AuthPtc()
+        elif provider == 'google':
+            self._auth_provider = AuthGoogle()
+        else:
+            raise AuthException("Invalid authentication provider - only ptc/google available.")
+
+        self.log.debug('Auth provider: %s', provider)
+
+        # the auth providers are blocking, keep them off the event loop
+        loop = asyncio.get_event_loop()
+        if not await loop.run_in_executor(None, self._auth_provider.login, username, password):
+            self.log.info(
+                LOGIN_LOG +
+                cred + 'Login process failed!' + cdef)
+            return False
+
+        self.log.info(
+            LOGIN_LOG +
+            cmagenta + 'Starting RPC login sequence ' + cgray + '(app simulation)' + cdef)
+        response = await self.get_player().get_hatched_eggs().get_inventory().check_awarded_badges() \
+            .download_settings(hash="05daf51635c82611d1aac95c0b051d3ec088a930").call()
+
+        if not response:
+            self.log.info(
+                LOGIN_LOG +
+                cred + 'Login failed!' + cdef)
+            return False
+
+        if 'api_url' in response:
+            self._api_endpoint = ('https://{}/rpc'.format(response['api_url']))
+            self.log.debug('Setting API endpoint to: %s', self._api_endpoint)
+        else:
+            self.log.error(
+                LOGIN_LOG +
+                cred + 'Login failed - unexpected server response!' + cdef)
+            return False
+
+        if 'auth_ticket' in response:
+            self._auth_provider.set_ticket(response['auth_ticket'].values())
+
+        self.log.info(
+            LOGIN_LOG +
+            cmagenta + 'Login process completed' + cdef)
+        return True
+
+    async def close(self):
+        await self._transport.close()
@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+
+import logging
+import random
+import threading
+from time import time
+
+from google.protobuf import text_format
+
+
+class ResponseCapture(object):
+    """
+    Opt-in debug capture of decoded RPC responses.
+
+    Responses are decoded in-process with the compiled POGOProtos descriptors
+    (no protoc subprocess) and appended to a capture file. Only a fraction
+    of the responses, given by sample_rate, is written.
+    """
+
+    def __init__(self, path, sample_rate=1.0):
+        self.log = logging.getLogger(__name__)
+        self.path = path
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        capture_config = config.get("DEBUG_CAPTURE", {})
+        if not capture_config.get("ENABLE", False):
+            return None
+        path = capture_config.get("FILE", "data_dumps/capture_%s.log" % config.get("username", "default"))
+        return cls(path, capture_config.get("SAMPLE_RATE", 0.1))
+
+    def sample(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def write(self, response_proto, subresponses):
+        envelope = type(response_proto)()
+        envelope.CopyFrom(response_proto)
+        # the raw sub-responses are decoded one by one below
+        envelope.ClearField('returns')
+        lines = ["==== %.3f" % time(), text_format.MessageToString(envelope)]
+        for name, subresponse in subresponses:
+            lines.append("---- %s" % name)
+            if subresponse is None:
+                lines.append("(no protobuf definition)")
+            else:
+                lines.append(text_format.MessageToString(subresponse))
+        try:
+            with self._lock:
+                with open(self.path, "a") as f:
+                    f.write("\n".join(lines) + "\n")
+        except IOError as e:
+            self.log.warning('Could not write response capture to %s: %s', self.path, e)
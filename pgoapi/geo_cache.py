@@ -0,0 +1,126 @@
+from __future__ import absolute_import
+
+import json
+import logging
+import sqlite3
+import threading
+from time import time
+
+from pgoapi.exceptions import GeoCacheMiss
+
+# origins, destinations and waypoints are rounded to this many decimals (~1 m) for the cache keys
+COORDINATE_DECIMALS = 5
+
+
+def geocode_key(query):
+    # case and whitespace don't change what the geocoder finds
+    return " ".join(query.lower().split())
+
+
+def route_key(origin, destination, waypoints=(), optimize_waypoints=False, mode="walking"):
+    def point(p):
+        if isinstance(p, (tuple, list)):
+            return [round(float(p[0]), COORDINATE_DECIMALS), round(float(p[1]), COORDINATE_DECIMALS)]
+        # "via:lat,lng" waypoints or place names
+        return geocode_key(p)
+    return json.dumps([mode, point(origin), point(destination), [point(w) for w in waypoints], bool(optimize_waypoints)],
+                      separators=(',', ':'))
+
+
+class GeoCache(object):
+    """
+    Persistent SQLite cache of geocoding results and Google Directions
+    responses, so restarts don't geocode the location again and repeated
+    walks don't spend API quota.
+
+    Entries older than ttl seconds are fetched again, the stale entry is
+    still used if that fails. In offline mode nothing is fetched at all and
+    a miss raises GeoCacheMiss.
+    """
+
+    GEOCODE = 'geocode'
+    ROUTE = 'route'
+
+    def __init__(self, path, ttl=30 * 24 * 3600, offline=False):
+        self.log = logging.getLogger(__name__)
+        self.path = path
+        self.ttl = ttl
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._db = None
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("GEO_CACHE", {})
+        if not cache_config.get("ENABLE", True):
+            return None
+        return cls(cache_config.get("FILE", "geo_cache.db"), cache_config.get("TTL", 30 * 24 * 3600), cache_config.get("OFFLINE", False))
+
+    def _connection(self):
+        if self._db is None:
+            # several accounts and worker processes may share the file
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS geo_cache ("
+                             "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, stored_at REAL NOT NULL, "
+                             "PRIMARY KEY (kind, key))")
+            self._db.commit()
+        return self._db
+
+    def lookup(self, kind, key):
+        # (value, stored_at) of the entry, expired or not, or None
+        with self._lock:
+            row = self._connection().execute("SELECT value, stored_at FROM geo_cache WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def store(self, kind, key, value):
+        with self._lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO geo_cache (kind, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                       (kind, key, json.dumps(value), time()))
+            db.commit()
+
+    def get(self, kind, key, fetch):
+        """ the cached value of key, or the JSON serialisable result of fetch() which is then cached """
+        entry = self.lookup(kind, key)
+        if entry is not None and (self.offline or time() - entry[1] < self.ttl):
+            return entry[0]
+        if self.offline:
+            raise GeoCacheMiss("No cached %s for %s in offline mode" % (kind, key))
+        try:
+            value = fetch()
+        except Exception as e:
+            if entry is None:
+                raise
+            self.log.warning('Could not refresh %s for %s, using the cached one: %s', kind, key, e)
+            return entry[0]
+        if value is not None:
+            self.store(kind, key, value)
+        return value
+
+    def geocode(self, query, geocoder):
+        """ (latitude, longitude, altitude, address) of query """
+        def fetch():
+            loc = geocoder.geocode(query)
+            if loc is None:
+                return None
+            return [loc.latitude, loc.longitude, loc.altitude, loc.address]
+        result = self.get(self.GEOCODE, geocode_key(query), fetch)
+        return tuple(result) if result is not None else None
+
+    def directions(self, origin, destination, fetch, waypoints=(), optimize_waypoints=False, mode="walking"):
+        return self.get(self.ROUTE, route_key(origin, destination, waypoints, optimize_waypoints, mode), fetch)
+
+    def prune(self):
+        with self._lock:
+            db = self._connection()
+            removed = db.execute("DELETE FROM geo_cache WHERE stored_at < ?", (time() - self.ttl,)).rowcount
+            db.commit()
+        return removed
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
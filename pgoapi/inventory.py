@@ -1,7 +1,8 @@
 from __future__ import absolute_import
 import json
-from collections import defaultdict
+from pgoapi.game_master import GAME_MASTER
 from pgoapi.protos.POGOProtos.Inventory import Item_pb2 as Inventory_Enum
+from pgoapi.utilities import json_default
 
 cdarkgray = '\033[1;30m'
 cblack = '\033[0;30m'
@@ -21,9 +22,36 @@ cgray = '\033[0;37m'
 cwhite = '\033[1;37m'
 cdefault = '\033[0;39m'
 
+# the field identifying an entry of each kind of inventory item, kinds without one exist once
+_ENTRY_ID_FIELDS = {
+    'pokemon_data': 'id',
+    'item': 'item_id',
+    'pokedex_entry': 'pokemon_id',
+    'pokemon_family': 'family_id',
+}
+
+
+def family_of(pokemon_id):
+    pokemon_data = GAME_MASTER.get(pokemon_id)
+    return int(pokemon_data.FamilyId) if pokemon_data else None
+
+
+def inventory_item_key(inventory_item_data):
+    for kind, data in inventory_item_data.items():
+        id_field = _ENTRY_ID_FIELDS.get(kind)
+        return (kind, data.get(id_field, 0)) if id_field else (kind,)
+    return None
+
+
 class Inventory:
-    def __init__(self, percentages, inventory_items):
-        self.inventory_items = inventory_items
+    """
+    Inventory state of the player, kept up to date with the inventory_delta
+    of every GET_INVENTORY response. Asking the server with
+    last_timestamp_ms=last_timestamp only returns what changed since, and
+    apply_delta merges those changes into the state instead of rebuilding it.
+    """
+
+    def __init__(self, percentages, inventory_items=()):
         self.ultra_balls = 0
         self.great_balls = 0
         self.poke_balls = 0
@@ -39,63 +67,146 @@ class Inventory:
         self.ultraball_percent = (percentages[2] / 100)
         self.use_masterball = (percentages[3])
 
-        self.pokemon_candy = defaultdict()
-        self.eggs_available = []
-        self.incubators_available = []
-        self.incubators_busy = []
+        # new_timestamp_ms of the last delta, 0 until the first full inventory arrived
+        self.last_timestamp = 0
+        # every inventory item by inventory_item_key
+        self._entries = {}
+        # item_id -> count
+        self.items = {}
+        # id -> pokemon_data, also grouped by pokemon_id and by family_id
+        self.pokemon = {}
+        self.pokemon_by_species = {}
+        self.pokemon_by_family = {}
+        self.eggs = {}
+        self.pokemon_candy = {}
+        self.egg_incubators = []
+        self.player_stats = {}
+        self.update(inventory_items)
+
+    @property
+    def inventory_items(self):
+        return list(self._entries.values())
+
+    def apply_delta(self, inventory_delta):
+        """ merges the inventory_delta of a GET_INVENTORY response, a full inventory or the changes since last_timestamp """
+        self.update(inventory_delta.get('inventory_items', []))
+        self.last_timestamp = max(self.last_timestamp, inventory_delta.get('new_timestamp_ms', 0))
+        return self
+
+    def update(self, inventory_items):
+        for inventory_item in inventory_items:
+            # released, evolved and hatched pokemon are only listed by their id
+            deleted = inventory_item.get('deleted_item_key', 0)
+            if deleted:
+                # deleted_item_key is int64, pokemon ids are fixed64
+                self._remove(('pokemon_data', deleted & 0xFFFFFFFFFFFFFFFF))
+                continue
+            inventory_item_data = inventory_item.get('inventory_item_data', {})
+            key = inventory_item_key(inventory_item_data)
+            if key is not None:
+                self._remove(key)
+                self._entries[key] = inventory_item
+                self._add(key, inventory_item_data[key[0]])
         self.setup_inventory()
 
+    def remove_pokemon(self, pokemon_id):
+        # a released or transferred pokemon, before the next delta lists it as deleted
+        self.update([{'deleted_item_key': pokemon_id}])
+
+    def _add(self, key, data):
+        kind = key[0]
+        if kind == 'item':
+            self.items[key[1]] = data.get('count', 0)
+        elif kind == 'pokemon_data':
+            if data.get('is_egg', False):
+                self.eggs[key[1]] = data
+            else:
+                self.pokemon[key[1]] = data
+                pokemon_id = data.get('pokemon_id', 0)
+                self.pokemon_by_species.setdefault(pokemon_id, {})[key[1]] = data
+                self.pokemon_by_family.setdefault(family_of(pokemon_id), {})[key[1]] = data
+        elif kind == 'pokemon_family':
+            self.pokemon_candy[key[1]] = data.get('candy', -1)
+        elif kind == 'egg_incubators':
+            self.egg_incubators = list(data.get('egg_incubator', []))
+        elif kind == 'player_stats':
+            self.player_stats = data
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        kind = key[0]
+        if kind == 'item':
+            self.items.pop(key[1], None)
+        elif kind == 'pokemon_data':
+            self.eggs.pop(key[1], None)
+            data = self.pokemon.pop(key[1], None)
+            if data is not None:
+                pokemon_id = data.get('pokemon_id', 0)
+                self._ungroup(self.pokemon_by_species, pokemon_id, key[1])
+                self._ungroup(self.pokemon_by_family, family_of(pokemon_id), key[1])
+        elif kind == 'pokemon_family':
+            self.pokemon_candy.pop(key[1], None)
+        elif kind == 'egg_incubators':
+            self.egg_incubators = []
+        elif kind == 'player_stats':
+            self.player_stats = {}
+
+    @staticmethod
+    def _ungroup(groups, group, pokemon_id):
+        members = groups.get(group, {})
+        members.pop(pokemon_id, None)
+        if not members:
+            groups.pop(group, None)
+
     def setup_inventory(self):
-        for inventory_item in self.inventory_items:
-            item = inventory_item['inventory_item_data'].get('item', {})
-            item_id = item.get('item_id', -1)
-            item_count = item.get('count', 0)
-            if item_id == Inventory_Enum.ITEM_POTION:
-                self.potion = item_count
-            elif item_id == Inventory_Enum.ITEM_SUPER_POTION:
-                self.super_potion = item_count
-            elif item_id == Inventory_Enum.ITEM_MAX_POTION:
-                self.max_potion = item_count
-            elif item_id == Inventory_Enum.ITEM_HYPER_POTION:
-                self.hyper_potion = item_count
-            elif item_id == Inventory_Enum.ITEM_POKE_BALL:
-                self.poke_balls = item_count
-            elif item_id == Inventory_Enum.ITEM_GREAT_BALL:
-                self.great_balls = item_count
-            elif item_id == Inventory_Enum.ITEM_MASTER_BALL:
-                self.master_balls = item_count
-            elif item_id == Inventory_Enum.ITEM_ULTRA_BALL:
-                self.ultra_balls = item_count
-            elif item_id == Inventory_Enum.ITEM_LUCKY_EGG:
-                self.lucky_eggs = item_count
-            elif item_id == Inventory_Enum.ITEM_RAZZ_BERRY:
-                self.razz_berries = item_count
-            pokemon_family = inventory_item['inventory_item_data'].get('pokemon_family', {})
-            self.pokemon_candy[pokemon_family.get('family_id', -1)] = pokemon_family.get('candy', -1)
-            pokemon_data = inventory_item['inventory_item_data'].get('pokemon_data', {})
-            if pokemon_data.get('is_egg', False) and not pokemon_data.get('egg_incubator_id', False):
-                self.eggs_available.append(pokemon_data)
-            egg_incubators = inventory_item['inventory_item_data'].get('egg_incubators', {}).get('egg_incubator', [])
-            for incubator in egg_incubators:
-                if "pokemon_id" in incubator:
-                    self.incubators_busy.append(incubator)
-                else:
-                    self.incubators_available.append(incubator)
+        self.potion = self.items.get(Inventory_Enum.ITEM_POTION, 0)
+        self.super_potion = self.items.get(Inventory_Enum.ITEM_SUPER_POTION, 0)
+        self.max_potion = self.items.get(Inventory_Enum.ITEM_MAX_POTION, 0)
+        self.hyper_potion = self.items.get(Inventory_Enum.ITEM_HYPER_POTION, 0)
+        self.poke_balls = self.items.get(Inventory_Enum.ITEM_POKE_BALL, 0)
+        self.great_balls = self.items.get(Inventory_Enum.ITEM_GREAT_BALL, 0)
+        self.master_balls = self.items.get(Inventory_Enum.ITEM_MASTER_BALL, 0)
+        self.ultra_balls = self.items.get(Inventory_Enum.ITEM_ULTRA_BALL, 0)
+        self.lucky_eggs = self.items.get(Inventory_Enum.ITEM_LUCKY_EGG, 0)
+        self.razz_berries = self.items.get(Inventory_Enum.ITEM_RAZZ_BERRY, 0)
+
+    @property
+    def eggs_available(self):
+        return [egg for egg in self.eggs.values() if not egg.get('egg_incubator_id', False)]
+
+    @property
+    def incubators_available(self):
+        return [incubator for incubator in self.egg_incubators if "pokemon_id" not in incubator]
+
+    @property
+    def incubators_busy(self):
+        return [incubator for incubator in self.egg_incubators if "pokemon_id" in incubator]
+
+    def as_response(self):
+        """ the whole inventory in the shape of a GET_INVENTORY response """
+        return {'success': True, 'inventory_delta': {'new_timestamp_ms': self.last_timestamp, 'inventory_items': self.inventory_items}}
 
     def can_attempt_catch(self):
         return self.poke_balls + self.great_balls + self.ultra_balls + self.master_balls > 0
 
+    def _take(self, item_id):
+        # counted down in items, the counters are recomputed from it on every update
+        self.items[item_id] = self.items.get(item_id, 0) - 1
+        self.setup_inventory()
+        return item_id
+
     def take_pokeball(self):
-        self.poke_balls -= 1
+        self._take(Inventory_Enum.ITEM_POKE_BALL)
 
     def take_greatball(self):
-        self.great_balls -= 1
+        self._take(Inventory_Enum.ITEM_GREAT_BALL)
 
     def take_masterball(self):
-        self.master_balls -= 1
+        self._take(Inventory_Enum.ITEM_MASTER_BALL)
 
     def take_ultraball(self):
-        self.ultra_balls -= 1
+        self._take(Inventory_Enum.ITEM_ULTRA_BALL)
 
     def best_ball(self):
         if self.use_masterball and self.master_balls:
@@ -127,39 +238,22 @@ class Inventory:
             return -1
 
     def take_ball(self, ball_id):
-        if ball_id == Inventory_Enum.ITEM_POKE_BALL:
-            self.poke_balls -= 1
-        elif ball_id == Inventory_Enum.ITEM_GREAT_BALL:
-            self.great_balls -= 1
-        elif ball_id == Inventory_Enum.ITEM_ULTRA_BALL:
-            self.ultra_balls -= 1
-        elif ball_id == Inventory_Enum.ITEM_MASTER_BALL:
-            self.master_balls -= 1
+        if ball_id in (Inventory_Enum.ITEM_POKE_BALL, Inventory_Enum.ITEM_GREAT_BALL,
+                       Inventory_Enum.ITEM_ULTRA_BALL, Inventory_Enum.ITEM_MASTER_BALL):
+            self._take(ball_id)
 
     def has_lucky_egg(self):
-        for inventory_item in self.inventory_items:
-            item = inventory_item['inventory_item_data'].get('item', {})
-            item_id = item.get('item_id', -1)
-            if item_id == Inventory_Enum.ITEM_LUCKY_EGG:
-                return True
-        return False
+        return self.lucky_eggs > 0
 
     def take_lucky_egg(self):
-        self.lucky_eggs -= 1
-        return Inventory_Enum.ITEM_LUCKY_EGG
+        return self._take(Inventory_Enum.ITEM_LUCKY_EGG)
 
     def has_berry(self):
         # Only Razz berries are in the game at the moment
-        for inventory_item in self.inventory_items:
-            item = inventory_item['inventory_item_data'].get('item', {})
-            item_id = item.get('item_id', -1)
-            if item_id == Inventory_Enum.ITEM_RAZZ_BERRY:
-                return True
-        return False
+        return self.razz_berries > 0
 
     def take_berry(self):
-        self.razz_berries -= 1
-        return Inventory_Enum.ITEM_RAZZ_BERRY
+        return self._take(Inventory_Enum.ITEM_RAZZ_BERRY)
 
     def __str__(self):
         return (cwhite + "{0}" + ccyan + " x " + cdarkcyan + "Poke Balls"  + cmagenta + " / " + \
@@ -195,4 +289,7 @@ class Inventory:
         return self.__str__()
 
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__)
+        state = dict((k, v) for k, v in self.__dict__.items() if not k.startswith('_'))
+        state.update(inventory_items=self.inventory_items, eggs_available=self.eggs_available,
+                     incubators_available=self.incubators_available, incubators_busy=self.incubators_busy)
+        return json.dumps(state, default=json_default)
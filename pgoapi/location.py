@@ -1,35 +1,72 @@
+import logging
+import math
 from time import time
 
+import numpy as np
 import pyproj
 import s2sphere
 import six
+from cachetools import LRUCache
 from geopy.distance import VincentyDistance, vincenty
 from geopy.geocoders import GoogleV3
 from gmaps.directions import Directions
 
+from pgoapi.exceptions import GeoCacheMiss
+from pgoapi.protobuf_to_dict import protobuf_to_dict
+
 if six.PY3:
     from past.builtins import map
 
 g = pyproj.Geod(ellps='WGS84')
+
+# distance methods, with the largest error against vincenty measured on 20k random pairs up to 80 degrees latitude:
+#
+#                        10 m       100 m      1 km       10 km      100 km
+#   geod                 <0.1 mm    <0.1 mm    <0.1 mm    <0.1 mm    <0.1 mm   geodesic on the WGS84 ellipsoid
+#   haversine            0.56%      0.56%      0.56%      0.56%      0.56%     great circle on a sphere
+#   equirectangular      <0.1 mm    <0.1 mm    <0.1 mm    4 cm       38 m      flat, with the WGS84 radii of curvature
+#                                                                               at the mean latitude
+#
+# equirectangular is the fastest and exact enough for anything the player can walk to between two map
+# requests, geod is the one to use for long totals. See tests/test_location.py and benchmarks/bench_distance_methods.py.
+DISTANCE_GEOD = 'geod'
+DISTANCE_HAVERSINE = 'haversine'
+DISTANCE_EQUIRECTANGULAR = 'equirectangular'
+DISTANCE_METHODS = (DISTANCE_GEOD, DISTANCE_HAVERSINE, DISTANCE_EQUIRECTANGULAR)
+EARTH_RADIUS_METERS = 6371008.8
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
 geolocator = GoogleV3()
+log = logging.getLogger(__name__)
 
 
-def get_location(search):
+def get_location(search, geo_cache=None):
+    if geo_cache is not None:
+        return geo_cache.geocode(search, geolocator)[:3]
     loc = geolocator.geocode(search)
     return (loc.latitude, loc.longitude, loc.altitude)
 
 
 # http://python-gmaps.readthedocs.io/en/latest/gmaps.html#module-gmaps.directions
-def get_route(start, end, use_google=False, gmaps_api_key="", walk_to_all_forts=False, waypoints=[], step_size=200):
+def get_route(start, end, use_google=False, gmaps_api_key="", walk_to_all_forts=False, waypoints=[], step_size=200, geo_cache=None):
     origin = (start[0], start[1])
     destination = (end[0], end[1])
     if use_google:
-        directions_service = Directions(api_key=gmaps_api_key)
-        if walk_to_all_forts and waypoints:
-            d = directions_service.directions(origin, destination, mode="walking", units="metric",
-                                              optimize_waypoints=True, waypoints=waypoints)
-        else:
-            d = directions_service.directions(origin, destination, mode="walking", units="metric")
+        waypoints = list(waypoints) if walk_to_all_forts else []
+
+        def fetch():
+            directions_service = Directions(api_key=gmaps_api_key)
+            if waypoints:
+                return directions_service.directions(origin, destination, mode="walking", units="metric",
+                                                     optimize_waypoints=True, waypoints=waypoints)
+            return directions_service.directions(origin, destination, mode="walking", units="metric")
+
+        try:
+            d = geo_cache.directions(origin, destination, fetch, waypoints, bool(waypoints)) if geo_cache is not None else fetch()
+        except GeoCacheMiss as e:
+            # offline and never walked this way before
+            log.warning('%s, walking in a straight line', e)
+            return get_route(start, end, step_size=step_size)
         steps = d[0]['legs'][0]['steps']
         final_steps = [
             {
@@ -44,28 +81,16 @@ def get_route(start, end, use_google=False, gmaps_api_key="", walk_to_all_forts=
             'steps': final_steps
         }
     else:
-        total_distance = distance_in_meters(start, destination)
-        step_increments = get_increments(start, destination, step_size)
-        final_steps = []
-        previous_step = step_increments[0]
-        for step in step_increments[1:]:
-            final_steps.append({
-                'lat': step[0],
-                'long': step[1],
-                'distance': distance_in_meters(previous_step, step)
-            })
-            previous_step = step
-
+        # a straight line, the walk itself is interpolated by interpolate_path
+        _, _, total_distance = g.inv(start[1], start[0], destination[1], destination[0])
         return {
             'total_distance': total_distance,
-            'steps': final_steps
+            'steps': [{'lat': destination[0], 'long': destination[1], 'distance': total_distance}]
         }
 
 
 # step_size corresponds to how many meters between each step we want
 def get_increments(start, end, step_size=200):
-    # def get_increments(start,end,step_size=3):
-    g = pyproj.Geod(ellps='WGS84')
     (startlat, startlong, _) = start
     (endlat, endlong) = end
     (az12, az21, dist) = g.inv(startlong, startlat, endlong, endlat)
@@ -77,33 +102,232 @@ def get_increments(start, end, step_size=200):
     return [(l[1], l[0], 0) for l in lonlats]  # reorder to be lat,long instead of long,lat
 
 
-def distance_in_meters(p1, p2):
-    return vincenty(p1, p2).meters
+def interpolate_path(start, waypoints, step_size=200, chunk_size=256):
+    """
+    Generator over the points of the geodesic path from start through the
+    waypoints, at most step_size metres apart, as ((lat, lng, 0), distance)
+    with the distance walked since the previous point. start itself isn't
+    yielded, every waypoint is. Points are computed in chunks as they are
+    consumed, so a long walk is never materialised in advance.
+    """
+    lat, lng = start[0], start[1]
+    for waypoint in waypoints:
+        end_lat, end_lng = waypoint[0], waypoint[1]
+        azimuth, _, dist = g.inv(lng, lat, end_lng, end_lat)
+        segments = max(1, int(math.ceil(dist / step_size)))
+        segment = dist / segments
+        for first in range(1, segments, chunk_size):
+            steps = np.arange(first, min(first + chunk_size, segments))
+            lngs, lats, _ = g.fwd(np.full(steps.shape, lng), np.full(steps.shape, lat), np.full(steps.shape, azimuth), steps * segment)
+            for point_lat, point_lng in zip(lats.tolist(), lngs.tolist()):
+                yield (point_lat, point_lng, 0), segment
+        yield (end_lat, end_lng, 0), segment
+        lat, lng = end_lat, end_lng
+
+
+def distance_in_meters(p1, p2, method=None):
+    # vincenty unless another distance method is asked for
+    if method is None:
+        return vincenty(p1, p2).meters
+    return float(_distances(p1[0], p1[1], p2[0], p2[1], method))
+
+
+def distances_in_meters(origin, lats, lngs, method=DISTANCE_GEOD):
+    # distances from origin to every (lats[i], lngs[i]) in one call, as a numpy array
+    return _distances(origin[0], origin[1], np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64), method)
+
+
+def _distances(lat1, lng1, lat2, lng2, method):
+    # element-wise distances, the arguments broadcast like numpy arrays
+    if method == DISTANCE_EQUIRECTANGULAR:
+        return _equirectangular(lat1, lng1, lat2, lng2)
+    if method == DISTANCE_HAVERSINE:
+        return _haversine(lat1, lng1, lat2, lng2)
+    if method == DISTANCE_GEOD:
+        lat1, lng1, lat2, lng2 = np.broadcast_arrays(lat1, lng1, lat2, lng2)
+        if not lat1.size:
+            return np.zeros(lat1.shape)
+        _, _, dist = g.inv(lng1.ravel(), lat1.ravel(), lng2.ravel(), lat2.ravel())
+        return np.asarray(dist).reshape(lat1.shape)
+    raise ValueError("Unknown distance method: %s" % method)
 
 
-def filtered_forts(starting_location, origin, forts, proximity, visited_forts={}, reverse=False):
-    forts = filter(lambda f: is_active_pokestop(f[0], visited_forts=visited_forts, starting_location=starting_location,
-                                                proximity=proximity),
-                   map(lambda x: (x, distance_in_meters(origin, (x['latitude'], x['longitude']))), forts))
+def _haversine(lat1, lng1, lat2, lng2):
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(np.radians(np.subtract(lng2, lng1)) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _equirectangular(lat1, lng1, lat2, lng2):
+    # flat earth around the mean latitude, scaled by the meridional and prime vertical radii of curvature there
+    lat = np.radians(np.add(lat1, lat2) / 2)
+    w = 1 - WGS84_E2 * np.sin(lat) ** 2
+    prime_vertical = WGS84_A / np.sqrt(w)
+    meridional = prime_vertical * (1 - WGS84_E2) / w
+    dlng = (np.subtract(lng2, lng1) + 180) % 360 - 180
+    return np.hypot(np.radians(dlng) * prime_vertical * np.cos(lat), np.radians(np.subtract(lat2, lat1)) * meridional)
+
+
+def distances_to_objects(origin, objects, method=DISTANCE_GEOD):
+    # batch distances to map objects (forts, pokemon, ...) with latitude/longitude keys
+    return distances_in_meters(origin, [o['latitude'] for o in objects], [o['longitude'] for o in objects], method)
+
+
+def filtered_forts(starting_location, origin, forts, proximity, visited_forts={}, reverse=False, method=DISTANCE_GEOD):
+    now_ms = time() * 1000
+    forts = [fort for fort in forts if is_spinnable_pokestop(fort, visited_forts, now_ms)]
+    distances = distances_to_objects(origin, forts, method)
+    if proximity and proximity > 0:
+        within = distances_to_objects(starting_location, forts, method) < proximity
+        forts = [(fort, float(distance)) for fort, distance, keep in zip(forts, distances, within) if keep]
+    else:
+        forts = [(fort, float(distance)) for fort, distance in zip(forts, distances)]
 
     sorted_forts = sorted(forts, key=lambda x: x[1], reverse=reverse)
     return sorted_forts
 
 
+FORT_FIELDS = ('id', 'latitude', 'longitude', 'type', 'enabled', 'cooldown_complete_timestamp_ms')
+
+
+def fort_summary(fort):
+    # the fields of a Fort message the bot uses, unset ones left out like protobuf_to_dict does
+    summary = dict((name, getattr(fort, name)) for name in FORT_FIELDS if getattr(fort, name))
+    if fort.HasField('lure_info'):
+        summary['lure_info'] = protobuf_to_dict(fort.lure_info)
+    return summary
+
+
+def is_spinnable_pokestop(fort, visited_forts, now_ms=None):
+    if now_ms is None:
+        now_ms = time() * 1000
+    return fort.get('type', None) == 1 and ("enabled" in fort or 'lure_info' in fort) and fort.get(
+        'cooldown_complete_timestamp_ms', -1) < now_ms and fort['id'] not in visited_forts
+
+
 def is_active_pokestop(fort, visited_forts, starting_location, proximity):
-    is_active_fort = fort.get('type', None) == 1 and ("enabled" in fort or 'lure_info' in fort) and fort.get(
-        'cooldown_complete_timestamp_ms', -1) < time() * 1000
+    is_active_fort = is_spinnable_pokestop(fort, visited_forts)
     if proximity and proximity > 0:
-        return is_active_fort and fort['id'] not in visited_forts and distance_in_meters(starting_location, (
-            fort['latitude'], fort['longitude'])) < proximity
+        return is_active_fort and distance_in_meters(starting_location, (fort['latitude'], fort['longitude'])) < proximity
     else:
-        return is_active_fort and fort['id'] not in visited_forts
+        return is_active_fort
+
+
+def distance_matrix(lats, lngs, method=DISTANCE_EQUIRECTANGULAR):
+    # distances between every pair of (lats[i], lngs[i]), as a numpy array
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return _distances(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :], method)
+
+
+def plan_route(start, points, end=None, method=DISTANCE_EQUIRECTANGULAR, max_passes=50):
+    """
+    Order in which to visit points (lat, lng, ...) walking from start, and on
+    to end if given, so the total walking distance stays short: a nearest
+    neighbour route improved with 2-opt and Or-opt moves. Returns indexes
+    into points.
+    Works offline, a few hundred points take milliseconds.
+    """
+    count = len(points)
+    if count < 2:
+        return list(range(count))
+    nodes = [start] + list(points) + [end if end is not None else start]
+    dist = distance_matrix([n[0] for n in nodes], [n[1] for n in nodes], method)
+    if end is None:
+        # an open route ends at a virtual stop that is no distance from anywhere
+        dist[-1, :] = 0
+        dist[:, -1] = 0
+
+    route = [0]
+    unvisited = np.ones(len(nodes), dtype=bool)
+    unvisited[0] = unvisited[-1] = False
+    for _ in range(count):
+        nearest = int(np.argmin(np.where(unvisited, dist[route[-1]], np.inf)))
+        unvisited[nearest] = False
+        route.append(nearest)
+    route.append(len(nodes) - 1)
+    route = np.array(route)
+
+    for _ in range(max_passes):
+        improved = _two_opt(route, dist, count)
+        route, moved = _or_opt(route, dist, count)
+        if not (improved or moved):
+            break
+    return [int(n) - 1 for n in route[1:count + 1]]
+
+
+def _two_opt(route, dist, count):
+    # reverse route[i:j + 1] when reconnecting a-c and b-d is shorter than a-b and c-d
+    improved = False
+    for i in range(1, count):
+        a, b = route[i - 1], route[i]
+        c, d = route[i + 1:count + 1], route[i + 2:count + 2]
+        delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+        j = int(delta.argmin())
+        if delta[j] < -1e-6:
+            route[i:i + j + 2] = route[i:i + j + 2][::-1].copy()
+            improved = True
+    return improved
+
+
+def _or_opt(route, dist, count):
+    # move runs of up to 3 stops, possibly reversed, to wherever they lengthen the route the least
+    moved = False
+    for length in (1, 2, 3):
+        i = 1
+        while i + length <= count + 1:
+            first, last = route[i], route[i + length - 1]
+            saved = dist[route[i - 1], first] + dist[last, route[i + length]] - dist[route[i - 1], route[i + length]]
+            rest = np.concatenate((route[:i], route[i + length:]))
+            a, b = rest[:-1], rest[1:]
+            forward = dist[a, first] + dist[last, b]
+            backward = dist[a, last] + dist[first, b]
+            delta = np.minimum(forward, backward) - dist[a, b] - saved
+            delta[i - 1] = 0  # where it came from
+            k = int(delta.argmin())
+            if delta[k] < -1e-6:
+                segment = route[i:i + length] if forward[k] <= backward[k] else route[i:i + length][::-1]
+                route = np.concatenate((rest[:k + 1], segment, rest[k + 1:]))
+                moved = True
+            else:
+                i += 1
+    return route, moved
+
+
+def route_distance(start, points, end=None, method=DISTANCE_GEOD):
+    # walking distance from start over points (in order), and on to end if given
+    nodes = [start] + list(points) + ([end] if end is not None else [])
+    if len(nodes) < 2:
+        return 0.0
+    lats = np.array([n[0] for n in nodes], dtype=np.float64)
+    lngs = np.array([n[1] for n in nodes], dtype=np.float64)
+    return float(np.sum(_distances(lats[:-1], lngs[:-1], lats[1:], lngs[1:], method)))
+
+
+# coverings are computed for the center of the level NEIGHBOR_KEY_LEVEL cell the player is in (~35m),
+# so walking around inside that cell reuses the cached covering. Compared with the covering of the exact
+# position this differs in less than one of ~24 cells on average, always at the edge of the spread.
+NEIGHBOR_KEY_LEVEL = 18
+_coverings = LRUCache(maxsize=1024)
+
+
+def get_neighbors(loc, level=15, spread=700, key_level=NEIGHBOR_KEY_LEVEL):
+    if key_level is None:
+        return list(_get_covering(loc[0], loc[1], level, spread))
+    center_cell = s2sphere.CellId.from_lat_lng(s2sphere.LatLng.from_degrees(loc[0], loc[1])).parent(key_level)
+    key = (center_cell.id(), level, spread)
+    cells = _coverings.get(key)
+    if cells is None:
+        center = center_cell.to_lat_lng()
+        cells = _coverings[key] = _get_covering(center.lat().degrees, center.lng().degrees, level, spread)
+    return list(cells)
 
 
 # from pokemongodev slack @erhan
-def get_neighbors(loc, level=15, spread=700):
+def _get_covering(lat, lng, level, spread):
     distance = VincentyDistance(meters=spread)
-    center = (loc[0], loc[1], 0)
+    center = (lat, lng, 0)
     p1 = distance.destination(point=center, bearing=45)
     p2 = distance.destination(point=center, bearing=225)
     p1 = s2sphere.LatLng.from_degrees(p1[0], p1[1])
@@ -113,4 +337,30 @@ def get_neighbors(loc, level=15, spread=700):
     region.min_level = level
     region.max_level = level
     cells = region.get_covering(rect)
-    return sorted([c.id() for c in cells])
+    return tuple(sorted([c.id() for c in cells]))
+
+
+class NeighborTracker(object):
+    """
+    Follows the covering of a moving player and tells which cells were added
+    and removed since the previous position, so per-cell state only has to be
+    touched for the cells at the edge.
+    """
+
+    def __init__(self, level=15, spread=700, key_level=NEIGHBOR_KEY_LEVEL):
+        self.level = level
+        self.spread = spread
+        self.key_level = key_level
+        self.cells = []
+        self._cell_set = frozenset()
+
+    def update(self, loc):
+        cells = get_neighbors(loc, self.level, self.spread, self.key_level)
+        if cells == self.cells:
+            return cells, [], []
+        cell_set = frozenset(cells)
+        added = [c for c in cells if c not in self._cell_set]
+        removed = sorted(self._cell_set - cell_set)
+        self.cells = cells
+        self._cell_set = cell_set
+        return cells, added, removed
@@ -0,0 +1,147 @@
+from __future__ import absolute_import
+
+import logging
+from time import time
+
+from cachetools import LRUCache
+
+from pgoapi.protobuf_to_dict import LazyMessageDict
+from pgoapi.spawn_model import DEFAULT_DURATION_MS
+
+MAP_OBJECTS_SUCCESS = 1
+
+
+class CachedCell(object):
+    """
+    Merged state of one S2 cell: every object the server has sent for it,
+    keyed so that a delta replaces the previous version of an object.
+    Pokemon without a known lifetime are dropped DEFAULT_DURATION_MS after
+    the last response that contained them.
+    """
+
+    __slots__ = ('s2_cell_id', 'current_timestamp_ms', 'forts', 'spawn_points', 'decimated_spawn_points',
+                 'wild_pokemons', 'catchable_pokemons', 'nearby_pokemons', 'pokemon_seen_ms')
+
+    def __init__(self, s2_cell_id):
+        self.s2_cell_id = s2_cell_id
+        self.current_timestamp_ms = 0
+        self.forts = {}
+        self.spawn_points = {}
+        self.decimated_spawn_points = {}
+        self.wild_pokemons = {}
+        self.catchable_pokemons = {}
+        self.nearby_pokemons = []
+        self.pokemon_seen_ms = {}
+
+    def merge(self, cell):
+        for fort in cell.forts:
+            self.forts[fort.id] = fort
+        for fort_id in cell.deleted_objects:
+            self.forts.pop(fort_id, None)
+        for spawn_point in cell.spawn_points:
+            self.spawn_points[(spawn_point.latitude, spawn_point.longitude)] = spawn_point
+        for spawn_point in cell.decimated_spawn_points:
+            self.decimated_spawn_points[(spawn_point.latitude, spawn_point.longitude)] = spawn_point
+        for pokemon in cell.wild_pokemons:
+            self.wild_pokemons[pokemon.encounter_id] = pokemon
+            self.pokemon_seen_ms[pokemon.encounter_id] = cell.current_timestamp_ms
+        for pokemon in cell.catchable_pokemons:
+            self.catchable_pokemons[pokemon.encounter_id] = pokemon
+            self.pokemon_seen_ms[pokemon.encounter_id] = cell.current_timestamp_ms
+        # distances are relative to where the player stood, only the latest list is meaningful
+        self.nearby_pokemons = list(cell.nearby_pokemons)
+        self.current_timestamp_ms = max(self.current_timestamp_ms, cell.current_timestamp_ms)
+
+    def prune(self, now_ms):
+        for encounter_id, pokemon in list(self.catchable_pokemons.items()):
+            expiration_ms = pokemon.expiration_timestamp_ms
+            if expiration_ms <= 0:
+                expiration_ms = self.pokemon_seen_ms.get(encounter_id, 0) + DEFAULT_DURATION_MS
+            if expiration_ms < now_ms:
+                del self.catchable_pokemons[encounter_id]
+        for encounter_id, pokemon in list(self.wild_pokemons.items()):
+            # time_till_hidden_ms is only meaningful while positive
+            if pokemon.time_till_hidden_ms > 0:
+                expiration_ms = pokemon.last_modified_timestamp_ms + pokemon.time_till_hidden_ms
+            else:
+                expiration_ms = self.pokemon_seen_ms.get(encounter_id, 0) + DEFAULT_DURATION_MS
+            if expiration_ms < now_ms:
+                del self.wild_pokemons[encounter_id]
+        for encounter_id in list(self.pokemon_seen_ms):
+            if encounter_id not in self.catchable_pokemons and encounter_id not in self.wild_pokemons:
+                del self.pokemon_seen_ms[encounter_id]
+
+    def to_dict(self):
+        # same shape as protobuf_to_dict(MapCell): empty fields are left out
+        cell = {'s2_cell_id': self.s2_cell_id, 'current_timestamp_ms': self.current_timestamp_ms}
+        for name in ('forts', 'spawn_points', 'decimated_spawn_points', 'wild_pokemons', 'catchable_pokemons'):
+            objects = getattr(self, name)
+            if objects:
+                cell[name] = [LazyMessageDict(o) for o in objects.values()]
+        if self.nearby_pokemons:
+            cell['nearby_pokemons'] = [LazyMessageDict(o) for o in self.nearby_pokemons]
+        return cell
+
+
+class MapCellCache(object):
+    """
+    Client side state of the map cells around the player, keyed by S2 cell id.
+
+    Every cell remembers the current_timestamp_ms of the last response it was
+    in, which is sent back as its since_timestamp_ms so the server only returns
+    what changed. Deltas are merged into the cached cells and expired pokemon
+    are pruned. Cells the player walked away from are discarded, and past
+    max_cells the least recently requested cells are evicted.
+    """
+
+    def __init__(self, max_cells=256):
+        self.log = logging.getLogger(__name__)
+        self._cells = LRUCache(maxsize=max_cells)
+
+    def since_timestamps(self, cell_ids):
+        timestamps = []
+        for cell_id in cell_ids:
+            cell = self._cells.get(cell_id)
+            timestamps.append(cell.current_timestamp_ms if cell is not None else 0)
+        return timestamps
+
+    def update(self, response, now_ms=None):
+        # response is a GetMapObjectsResponse, failed responses leave the cache untouched
+        if response.status != MAP_OBJECTS_SUCCESS:
+            self.log.debug('Map objects not merged, status %s', response.status)
+            return False
+        for map_cell in response.map_cells:
+            cell = self._cells.get(map_cell.s2_cell_id)
+            if cell is None:
+                cell = self._cells[map_cell.s2_cell_id] = CachedCell(map_cell.s2_cell_id)
+            cell.merge(map_cell)
+        self.prune(now_ms)
+        return True
+
+    def prune(self, now_ms=None):
+        if now_ms is None:
+            now_ms = time() * 1000
+        for cell in self._cells.values():
+            cell.prune(now_ms)
+
+    def discard(self, cell_ids):
+        for cell_id in cell_ids:
+            self._cells.pop(cell_id, None)
+
+    def get(self, cell_id):
+        return self._cells.get(cell_id)
+
+    def map_cells(self, cell_ids):
+        # dict views of the merged cells, in the shape of protobuf_to_dict(GetMapObjectsResponse)['map_cells']
+        cells = []
+        for cell_id in cell_ids:
+            cell = self._cells.get(cell_id)
+            if cell is not None:
+                cells.append(cell.to_dict())
+        return cells
+
+    def clear(self):
+        self._cells.clear()
+
+    def __len__(self):
+        return len(self._cells)
@@ -0,0 +1,193 @@
+from __future__ import absolute_import
+
+import logging
+import sqlite3
+import threading
+from time import time
+
+from pgoapi.spawn_model import DEFAULT_DURATION_MS
+
+MAP_OBJECTS_SUCCESS = 1
+
+# kinds of pokemon sightings
+WILD = 'wild'
+CATCHABLE = 'catchable'
+NEARBY = 'nearby'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    cell_id INTEGER NOT NULL, observed_ms INTEGER NOT NULL, current_timestamp_ms INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS forts (
+    cell_id INTEGER NOT NULL, observed_ms INTEGER NOT NULL, fort_id TEXT NOT NULL, latitude REAL, longitude REAL,
+    type INTEGER, enabled INTEGER, cooldown_complete_ms INTEGER, lure_expires_ms INTEGER, deleted INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS spawn_points (
+    cell_id INTEGER NOT NULL, observed_ms INTEGER NOT NULL, latitude REAL, longitude REAL, decimated INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS pokemon (
+    cell_id INTEGER NOT NULL, observed_ms INTEGER NOT NULL, kind TEXT NOT NULL, encounter_id INTEGER, pokemon_id INTEGER,
+    spawn_point_id TEXT, latitude REAL, longitude REAL, expires_ms INTEGER);
+CREATE INDEX IF NOT EXISTS cells_by_cell ON cells (cell_id, observed_ms);
+CREATE INDEX IF NOT EXISTS cells_by_time ON cells (observed_ms);
+CREATE INDEX IF NOT EXISTS forts_by_cell ON forts (cell_id, observed_ms);
+CREATE INDEX IF NOT EXISTS forts_by_time ON forts (observed_ms);
+CREATE INDEX IF NOT EXISTS spawn_points_by_cell ON spawn_points (cell_id, observed_ms);
+CREATE INDEX IF NOT EXISTS pokemon_by_cell ON pokemon (cell_id, observed_ms);
+CREATE INDEX IF NOT EXISTS pokemon_by_time ON pokemon (observed_ms);
+CREATE INDEX IF NOT EXISTS pokemon_by_spawn_point ON pokemon (spawn_point_id, observed_ms);
+"""
+
+
+def to_signed(value):
+    # S2 cell ids and encounter ids are unsigned 64 bit, sqlite integers are signed
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed(value):
+    return value + (1 << 64) if value is not None and value < 0 else value
+
+
+class MapStore(object):
+    """
+    Append-only SQLite log of every GET_MAP_OBJECTS response: which cells
+    were seen when, and the forts, spawn points and pokemon in them, indexed
+    by cell and time. Unlike PGoApi.map_objects, which only holds the last
+    response, it answers what a cell looked like at any past moment, which
+    pokemon a spawn point produced and how well an area was covered.
+    """
+
+    def __init__(self, path):
+        self.log = logging.getLogger(__name__)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+
+    @classmethod
+    def from_config(cls, config):
+        store_config = config.get("MAP_STORE", {})
+        if not store_config.get("ENABLE", False):
+            return None
+        return cls(store_config.get("FILE", "map_store.db"))
+
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def record(self, response, observed_ms=None):
+        """ appends a GetMapObjectsResponse, failed responses aren't recorded """
+        if response.status != MAP_OBJECTS_SUCCESS:
+            return False
+        if observed_ms is None:
+            observed_ms = int(time() * 1000)
+        cells, forts, spawn_points, pokemon = [], [], [], []
+        for cell in response.map_cells:
+            cell_id = to_signed(cell.s2_cell_id)
+            cells.append((cell_id, observed_ms, cell.current_timestamp_ms))
+            for fort in cell.forts:
+                forts.append((cell_id, observed_ms, fort.id, fort.latitude, fort.longitude, fort.type, int(fort.enabled),
+                              fort.cooldown_complete_timestamp_ms, fort.lure_info.lure_expires_timestamp_ms or None, 0))
+            for fort_id in cell.deleted_objects:
+                forts.append((cell_id, observed_ms, fort_id, None, None, None, None, None, None, 1))
+            for spawn_point in cell.spawn_points:
+                spawn_points.append((cell_id, observed_ms, spawn_point.latitude, spawn_point.longitude, 0))
+            for spawn_point in cell.decimated_spawn_points:
+                spawn_points.append((cell_id, observed_ms, spawn_point.latitude, spawn_point.longitude, 1))
+            for p in cell.wild_pokemons:
+                expires_ms = p.last_modified_timestamp_ms + p.time_till_hidden_ms if p.time_till_hidden_ms > 0 else None
+                pokemon.append((cell_id, observed_ms, WILD, to_signed(p.encounter_id), p.pokemon_data.pokemon_id,
+                                p.spawn_point_id, p.latitude, p.longitude, expires_ms))
+            for p in cell.catchable_pokemons:
+                pokemon.append((cell_id, observed_ms, CATCHABLE, to_signed(p.encounter_id), p.pokemon_id,
+                                p.spawn_point_id, p.latitude, p.longitude, p.expiration_timestamp_ms or None))
+            for p in cell.nearby_pokemons:
+                pokemon.append((cell_id, observed_ms, NEARBY, to_signed(p.encounter_id), p.pokemon_id, None, None, None, None))
+
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.executemany("INSERT INTO cells VALUES (?, ?, ?)", cells)
+                db.executemany("INSERT INTO forts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", forts)
+                db.executemany("INSERT INTO spawn_points VALUES (?, ?, ?, ?, ?)", spawn_points)
+                db.executemany("INSERT INTO pokemon VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", pokemon)
+        return True
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            rows = self._connection().execute(sql, args).fetchall()
+        result = []
+        for row in rows:
+            row = dict(row)
+            for key in ('cell_id', 'encounter_id'):
+                if key in row:
+                    row[key] = from_signed(row[key])
+            result.append(row)
+        return result
+
+    @staticmethod
+    def _cell_filter(cell_ids, column='cell_id'):
+        if cell_ids is None:
+            return "1", []
+        cell_ids = [to_signed(c) for c in cell_ids]
+        return "%s IN (%s)" % (column, ", ".join("?" * len(cell_ids))), cell_ids
+
+    def snapshot(self, at_ms, cell_ids=None):
+        """
+        What the map looked like at at_ms: the last known state of every fort
+        not deleted by then, the spawn points seen so far, the last sighting of
+        every wild and catchable pokemon that hadn't expired and the nearby
+        pokemon of the last observation of each cell.
+
+        Map responses are deltas, a pokemon is only listed again when it
+        changed, so it is alive until it expires. Pokemon without a known
+        expiration are assumed gone DEFAULT_DURATION_MS after their last sighting.
+        """
+        cells, args = self._cell_filter(cell_ids)
+        forts = self._query(
+            "SELECT f.* FROM forts f JOIN (SELECT fort_id, MAX(rowid) AS last FROM forts WHERE observed_ms <= ? AND %s GROUP BY fort_id) l "
+            "ON f.rowid = l.last WHERE f.deleted = 0 ORDER BY f.fort_id" % cells, [at_ms] + args)
+        spawn_points = self._query(
+            "SELECT cell_id, latitude, longitude, decimated, MIN(observed_ms) AS first_seen_ms FROM spawn_points "
+            "WHERE observed_ms <= ? AND %s GROUP BY cell_id, latitude, longitude, decimated" % cells, [at_ms] + args)
+        pokemon = self._query(
+            "SELECT p.* FROM pokemon p JOIN (SELECT MAX(rowid) AS last FROM pokemon WHERE observed_ms <= ? AND kind != ? AND %s "
+            "GROUP BY encounter_id, kind) l ON p.rowid = l.last WHERE COALESCE(p.expires_ms, p.observed_ms + ?) > ? "
+            "ORDER BY p.rowid" % cells, [at_ms, NEARBY] + args + [DEFAULT_DURATION_MS, at_ms])
+        # the nearby list is complete in every response, and relative to where the player stood
+        pokemon += self._query(
+            "SELECT p.* FROM pokemon p JOIN (SELECT cell_id, MAX(observed_ms) AS last FROM cells WHERE observed_ms <= ? AND %s GROUP BY cell_id) l "
+            "ON p.cell_id = l.cell_id AND p.observed_ms = l.last WHERE p.kind = ?" % cells, [at_ms] + args + [NEARBY])
+        return {'forts': forts, 'spawn_points': spawn_points, 'pokemon': pokemon}
+
+    def spawn_history(self, spawn_point_id=None, pokemon_id=None, since_ms=0, until_ms=None, kinds=(WILD, CATCHABLE)):
+        """ every sighting of a pokemon, oldest first, one row per encounter and kind """
+        where = ["observed_ms >= ?", "kind IN (%s)" % ", ".join("?" * len(kinds))]
+        args = [since_ms] + list(kinds)
+        if until_ms is not None:
+            where.append("observed_ms <= ?")
+            args.append(until_ms)
+        if spawn_point_id is not None:
+            where.append("spawn_point_id = ?")
+            args.append(spawn_point_id)
+        if pokemon_id is not None:
+            where.append("pokemon_id = ?")
+            args.append(pokemon_id)
+        return self._query(
+            "SELECT kind, encounter_id, pokemon_id, spawn_point_id, latitude, longitude, expires_ms, cell_id, "
+            "MIN(observed_ms) AS first_seen_ms, MAX(observed_ms) AS last_seen_ms FROM pokemon WHERE %s "
+            "GROUP BY encounter_id, kind ORDER BY first_seen_ms" % " AND ".join(where), args)
+
+    def coverage(self, since_ms=0, until_ms=None, cell_ids=None):
+        """ {cell_id: {'observations', 'first_seen_ms', 'last_seen_ms'}} of the cells requested in the period """
+        cells, args = self._cell_filter(cell_ids)
+        until_ms = until_ms if until_ms is not None else 1 << 62
+        rows = self._query(
+            "SELECT cell_id, COUNT(*) AS observations, MIN(observed_ms) AS first_seen_ms, MAX(observed_ms) AS last_seen_ms "
+            "FROM cells WHERE observed_ms >= ? AND observed_ms <= ? AND %s GROUP BY cell_id" % cells, [since_ms, until_ms] + args)
+        return dict((row.pop('cell_id'), row) for row in rows)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -35,25 +35,42 @@ from collections import defaultdict
 from itertools import chain
 from time import time
 
+import gevent
 import six
+from cachetools import TTLCache
+from gevent.lock import BoundedSemaphore
 from pgoapi.auth_google import AuthGoogle
 from pgoapi.auth_ptc import AuthPtc
+from pgoapi.capture import ResponseCapture
 from pgoapi.exceptions import AuthException, ServerBusyOrOfflineException
+from pgoapi.geo_cache import GeoCache
 from pgoapi.inventory import Inventory as Player_Inventory
-from pgoapi.location import (distance_in_meters, filtered_forts,
-                             get_increments, get_neighbors, get_route)
+from pgoapi.location import (DISTANCE_EQUIRECTANGULAR, DISTANCE_GEOD,
+                             DISTANCE_METHODS, NeighborTracker,
+                             distances_to_objects, fort_summary, get_route,
+                             interpolate_path, is_spinnable_pokestop,
+                             plan_route, route_distance)
+from pgoapi.map_cache import MapCellCache
+from pgoapi.map_store import MapStore
 from pgoapi.player import Player as Player
 from pgoapi.player_stats import PlayerStats as PlayerStats
 from pgoapi.poke_utils import (create_capture_probability, get_inventory_data,
                                get_item_name, get_pokemon_by_long_id)
 from pgoapi.pokedex import pokedex
-from pgoapi.pokemon import POKEMON_NAMES, Pokemon
+from pgoapi.pokemon import (POKEMON_NAMES, Pokemon, PokemonCollection,
+                            ReleasePolicy)
 from pgoapi.protos.POGOProtos import Enums_pb2
 from pgoapi.protos.POGOProtos.Inventory import Item_pb2 as Inventory
 from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import \
+    GetMapObjectsResponse
+from pgoapi.rate_limiter import RateLimiter
 from pgoapi.rpc_api import RpcApi
+from pgoapi.spatial_index import SpatialIndex
+from pgoapi.spawn_model import SpawnModel
+from pgoapi.transport import Transport
 
-from .utilities import f2i
+from .utilities import f2i, json_default
 
 cdgray = '\033[24;1;30m'
 cblack = '\033[24;0;30m'
@@ -88,17 +105,35 @@ elif six.PY2:
 
 logger = logging.getLogger(__name__)
 
+# the neighbouring cells requested by nearby_map_objects reach about this far
+NEARBY_FORT_RADIUS = 1000
+# forts further away are dropped from the fort index, they are sent again when the player comes back
+FORT_INDEX_RADIUS = 5 * NEARBY_FORT_RADIUS
+# catchable pokemon further away than this can't be encountered
+ENCOUNTER_RADIUS = 50
+# encounter statuses after which the encounter can't be retried: not found, closed, fled, not in range, already happened
+ENCOUNTER_FINAL_STATUSES = (2, 3, 4, 5, 6)
+
 
 class PGoApi:
     API_ENTRY = 'https://pgorelease.nianticlabs.com/plfe/rpc'
 
-    def __init__(self, config):
+    def __init__(self, config, transport=None):
 
         self.log = logging.getLogger(__name__)
 
         self._auth_provider = None
         self._api_endpoint = None
         self.config = config
+        # keep-alive connection pool reused by every RPC of this api (or shared between apis)
+        self._transport = transport or Transport.from_config(config)
+        # decoded response dumps for debugging, None unless DEBUG_CAPTURE is enabled
+        self._capture = ResponseCapture.from_config(config)
+        # paces the RPCs of this account, within the global budget of the transport
+        self.rate_limiter = RateLimiter.from_config(config, shared=getattr(self._transport, 'rate_limit', None))
+        self.geo_cache = GeoCache.from_config(config)
+        # "dict" converts every response up front, "lazy" only converts the fields that are read
+        self._response_mode = config.get("NETWORK", {}).get("RESPONSE_MODE", RpcApi.RESPONSE_MODE_DICT)
         self._position_lat = 0  # int cooords
         self._position_lng = 0
         self._position_alt = 0
@@ -124,13 +159,33 @@ class PGoApi:
 
         self._last_got_map_objects = 0
         self._map_objects_rate_limit = 5.0
+        # between requests the map objects come from the cache, until a spawn is expected nearby or we walked into new cells
+        self._map_objects_max_interval = config.get("BEHAVIOR", {}).get("MAP_REFRESH_MAX_INTERVAL", 60)
+        self._next_map_objects_ms = 0
+        self.neighbor_tracker = NeighborTracker()
+        # cells of the covering around the player that weren't part of a map request yet
+        self._unfetched_cells = set()
+        self.spawn_model = SpawnModel()
         self.map_objects = {}
-        #self.encountered_pokemons = TTLCache(maxsize=120, ttl=self._map_objects_rate_limit * 2)
+        self.map_objects_proto = None
+        self.map_cache = MapCellCache()
+        # append-only history of every map response, None unless MAP_STORE is enabled
+        self.map_store = MapStore.from_config(config)
+        # what is in reach or nearest is decided with a fast distance method, see pgoapi.location
+        self.distance_method = config.get("BEHAVIOR", {}).get("DISTANCE_METHOD", DISTANCE_EQUIRECTANGULAR)
+        if self.distance_method not in DISTANCE_METHODS:
+            self.log.warn("Unknown DISTANCE_METHOD %s, using %s", self.distance_method, DISTANCE_GEOD)
+            self.distance_method = DISTANCE_GEOD
+        # the forts seen within FORT_INDEX_RADIUS, hidden while on cooldown
+        self.fort_index = SpatialIndex(method=self.distance_method)
+        # cached map cells keep listing a pokemon until it despawns, which is within the hour
+        self.encountered_pokemons = TTLCache(maxsize=500, ttl=3600)
 
         self.start_time = time()
         self.exp_start = None
         self.exp_current = None
-        #self.sem = BoundedSemaphore(1)
+        self.exp_hour = 0.0
+        self.sem = BoundedSemaphore(1)
         self.persist_lock = False
         self.sleep_mult = self.config.get("SLEEP_MULT", 1.5)
         self.MIN_ITEMS = {}
@@ -149,8 +204,8 @@ class PGoApi:
 
         self.MIN_SIMILAR_POKEMON = config.get("POKEMON_CLEANUP", {}).get("MIN_SIMILAR_POKEMON", 1)  # Keep atleast one of everything.
         self.MAX_SIMILAR_POKEMON = config.get("POKEMON_CLEANUP", {}).get("MAX_SIMILAR_POKEMON", 999)  # Stop keeping them at some amount
-        self.keep_pokemon_ids = map(lambda x: getattr(Enums_pb2, x), config.get("POKEMON_CLEANUP", {}).get("KEEP_POKEMON_NAMES", []))
-        self.throw_pokemon_ids = map(lambda x: getattr(Enums_pb2, x), config.get("POKEMON_CLEANUP", {}).get("THROW_POKEMON_NAMES", []))
+        self.keep_pokemon_ids = [getattr(Enums_pb2, x) for x in config.get("POKEMON_CLEANUP", {}).get("KEEP_POKEMON_NAMES", [])]
+        self.throw_pokemon_ids = [getattr(Enums_pb2, x) for x in config.get("POKEMON_CLEANUP", {}).get("THROW_POKEMON_NAMES", [])]
 
         self.RELEASE_METHOD = config.get("POKEMON_CLEANUP", {}).get("RELEASE_METHOD", "CLASSIC")
         self.RELEASE_METHOD_CONF = config.get("POKEMON_CLEANUP", {}).get("RELEASE_METHOD_" + self.RELEASE_METHOD, {})
@@ -164,6 +219,9 @@ class PGoApi:
 
         self.SCORE_METHOD = config.get("POKEMON_CLEANUP", {}).get("SCORE_METHOD", "CP")
         self.SCORE_SETTINGS = config.get("POKEMON_CLEANUP", {}).get("SCORE_METHOD_" + self.SCORE_METHOD, {})
+        # the POKEMON_CLEANUP release rules, evaluated for the whole bag at once
+        self.release_policy = ReleasePolicy(self.RELEASE_METHOD, self.RELEASE_METHOD_CONF, self.MIN_SIMILAR_POKEMON, self.MAX_SIMILAR_POKEMON,
+                                            self.keep_pokemon_ids, self.throw_pokemon_ids, self.KEEP_CP_OVER, self.KEEP_IV_OVER)
 
         self.EGG_INCUBATION_ENABLED = config.get("EGG_INCUBATION", {}).get("ENABLE", True)
         self.USE_DISPOSABLE_INCUBATORS = config.get("EGG_INCUBATION", {}).get("USE_DISPOSABLE_INCUBATORS", False)
@@ -240,9 +298,8 @@ class PGoApi:
     def gsleep(self, t):
         gevent.sleep(t * self.sleep_mult)
 
-    def call(self):
+    def call(self, response_mode=None):
         self.cond_lock()
-        self.gsleep(self.config.get("EXTRA_WAIT", 0.3))
         try:
             if not self._req_method_list.get(id(gevent.getcurrent()), []):
                 return False
@@ -255,7 +312,7 @@ class PGoApi:
 
             player_position = self.get_position()
 
-            request = RpcApi(self._auth_provider)
+            request = RpcApi(self._auth_provider, self._transport, self._capture, response_mode or self._response_mode)
 
             if self._api_endpoint:
                 api_endpoint = self._api_endpoint
@@ -264,13 +321,17 @@ class PGoApi:
 
             self.log.debug('Execution of RPC')
             response = None
+            self.rate_limiter.acquire()
             try:
                 response = request.request(api_endpoint, self._req_method_list[id(gevent.getcurrent())], player_position)
-            except ServerBusyOrOfflineException:
+            except ServerBusyOrOfflineException as e:
                 self.log.info(
                     LOGIN_LOG +
                     cred + 'Server seems to be busy or offline - try again! (' +
                     cwhite + '%s' + cred + ')' + cdef, e)
+            self.rate_limiter.report(response)
+
+            self.log.debug('Transport: %s', self._transport)
 
             # cleanup after call execution
             self.log.debug('Cleanup of request!')
@@ -325,7 +386,6 @@ class PGoApi:
     # useful for sniping for example
     def send_update_pos(self):
         self.get_player()
-        self.gsleep(0.2)
         res = self.call()
         if not res or res.get("direction", -1) == 102:
             self.log.error("There were a problem responses for api call: %s. Can't snipe!", res)
@@ -355,11 +415,8 @@ class PGoApi:
             # catch first pokemon:
             origin = (self._posf[0], self._posf[1])
             pokemon_rarity_and_dist = [
-                (
-                    pokemon, pokedex.get_rarity_by_id(pokemon['pokemon_id']),
-                    distance_in_meters(origin, (pokemon['latitude'], pokemon['longitude']))
-                )
-                for pokemon in pokemons]
+                (pokemon, pokedex.get_rarity_by_id(pokemon['pokemon_id']), float(distance))
+                for pokemon, distance in zip(pokemons, distances_to_objects(origin, pokemons, self.distance_method))]
             pokemon_rarity_and_dist.sort(key=lambda x: x[1], reverse=True)
 
             if pokemon_rarity_and_dist:
@@ -393,6 +450,7 @@ class PGoApi:
         run_time_hours = float(run_time / 3600.00)
         exp_earned = float(self.exp_current - self.exp_start)
         exp_hour = float(exp_earned / run_time_hours)
+        self.exp_hour = exp_hour
 
         self.log.info((
             PLAYER_LOG +
@@ -402,15 +460,19 @@ class PGoApi:
         return exp_hour
 
     def update_player_inventory(self):
-        self.get_inventory()
-        self.gsleep(0.2)
+        self.get_inventory(last_timestamp_ms=self.inventory.last_timestamp)
         res = self.call()
-        if 'GET_INVENTORY' in res['responses']:
-            self.inventory = Player_Inventory(self.percentages, res['responses']['GET_INVENTORY']['inventory_delta']['inventory_items'])
+        self.apply_inventory_response(res)
         # self.log.info(cdmagenta + "Backpack" + cmagenta + ": " + cwhite + "%s" + cdef, self.inventory)
-        #self.inventory = Player_Inventory(self.percentages, res['responses']['GET_INVENTORY']['inventory_delta']['inventory_items'])
         return res
 
+    def apply_inventory_response(self, res):
+        # the server only sends what changed since the last_timestamp_ms we asked with
+        if res and 'GET_INVENTORY' in res.get('responses', {}):
+            self.inventory.apply_delta(res['responses']['GET_INVENTORY'].get('inventory_delta', {}))
+            return True
+        return False
+
     def get_player_inventory(self, as_json=True):
         return self.inventory.to_json()
 
@@ -419,14 +481,14 @@ class PGoApi:
         self.get_player()
         if self._heartbeat_number % 10 == 0:
             self.check_awarded_badges()
-            self.get_inventory()
+            self.get_inventory(last_timestamp_ms=self.inventory.last_timestamp)
         # self.download_settings(hash="4a2e9bc330dae60e7b74fc85b98868ab4700802e")
-        self.gsleep(0.2)
         res = self.call()
         if not res or res.get("direction", -1) == 102:
             self.log.error(cred + "There were problem responses for API call: " + cwhite + "%s" + cred + ". Restarting!" + cdef, res)
             raise AuthException("Token probably expired?")
-        self.log.debug('Heartbeat dictionary: \n\r{}'.format(json.dumps(res, indent=2, default=lambda obj: obj.decode('utf8'))))
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Heartbeat dictionary: \n\r{}'.format(json.dumps(res, indent=2, default=json_default)))
 
         if 'GET_PLAYER' in res['responses']:
             self.player = Player(res['responses'].get('GET_PLAYER', {}).get('player_data', {}))
@@ -435,26 +497,26 @@ class PGoApi:
                 cdcyan + "User" + ccyan + ":" + cwhite + " %s" + cred + " / " +
                 cdcyan + "Caught" + ccyan + ":" + cwhite + " %s" + cdef, self.player, self.pokemon_caught)
 
-        if 'GET_INVENTORY' in res['responses']:
+        if self.apply_inventory_response(res):
+            # dump and list the whole inventory, not just the delta
+            res['responses']['GET_INVENTORY'] = self.inventory.as_response()
             with open("data_dumps/%s.json" % self.config['username'], "w") as f:
                 res['responses']['lat'] = self._posf[0]
                 res['responses']['lng'] = self._posf[1]
                 res['responses']['hourly_exp'] = self.hourly_exp(self.player_stats.experience)
-                f.write(json.dumps(res['responses'], indent=2, default=lambda obj: obj.decode('utf8')))
+                f.write(json.dumps(res['responses'], indent=2, default=json_default))
 
-            self.inventory = Player_Inventory(self.percentages, res['responses']['GET_INVENTORY']['inventory_delta']['inventory_items'])
-            for inventory_item in self.inventory.inventory_items:
-                if "player_stats" in inventory_item['inventory_item_data']:
-                    self.player_stats = PlayerStats(inventory_item['inventory_item_data']['player_stats'])
-                    self.log.info(
-                        PLAYER_LOG +
-                        cdcyan + "Player Stats: " + cwhite + "%s" + cdef, self.player_stats)
-                    self.hourly_exp(self.player_stats.experience)
+            if self.inventory.player_stats:
+                self.player_stats = PlayerStats(self.inventory.player_stats)
+                self.log.info(
+                    PLAYER_LOG +
+                    cdcyan + "Player Stats: " + cwhite + "%s" + cdef, self.player_stats)
+                self.hourly_exp(self.player_stats.experience)
             if self.LIST_INVENTORY_BEFORE_CLEANUP:
                 self.log.info(
                     INVENTORY_LOG +
                     cyellow + "Before Cleanup: " + cwhite + "%s" + cdef, self.inventory)
-            self.log.debug(self.cleanup_inventory(self.inventory.inventory_items))
+            self.log.debug(self.cleanup_inventory())
             self.log.info(
                 INVENTORY_LOG +
                 cmagenta + "After Cleanup: " + cwhite + "%s" + cdef, self.inventory)
@@ -469,8 +531,8 @@ class PGoApi:
             self.incubate_eggs()
             # Auto-use lucky-egg if applicable
             self.use_lucky_egg()
-            self.attempt_evolve(self.inventory.inventory_items)
-            self.cleanup_pokemon(self.inventory.inventory_items)
+            self.attempt_evolve()
+            self.cleanup_pokemon()
 
             # Farm precon
             if self.FARM_ITEMS_ENABLED:
@@ -504,7 +566,6 @@ class PGoApi:
         if self.config.get("BEHAVIOR", {}).get("AUTO_USE_LUCKY_EGG", False) and \
                 self.inventory.has_lucky_egg() and time() - self._last_egg_use_time > 30 * 60:
             self.use_item_xp_boost(item_id=Inventory.ITEM_LUCKY_EGG)
-            self.gsleep(0.2)
             response = self.call()
             result = response.get('responses', {}).get('USE_ITEM_XP_BOOST', {}).get('result', -1)
             if result == 1:
@@ -539,7 +600,7 @@ class PGoApi:
         route_data = get_route(
             self._posf, loc, use_google, self.config.get("GMAPS_API_KEY", ""),
             self.experimental and self.spin_all_forts, waypoints,
-            step_size=step_size
+            step_size=step_size, geo_cache=self.geo_cache
         )
         catch_attempt = 0
         base_travel_link = "https://www.google.com/maps/dir/%s,%s/" % (self._posf[0], self._posf[1])
@@ -547,36 +608,32 @@ class PGoApi:
         total_distance = route_data['total_distance']
         self.log.info("Total trip distance will be: {0:.2f} meters".format(total_distance))
 
-        for step_data in route_data['steps']:
-            self.log.info(cdgray + "=========================================================================================" + cdef)
-            step = (step_data['lat'], step_data['long'])
-            step_increments = get_increments(self._posf, step, step_size)
+        self.log.info(cdgray + "=========================================================================================" + cdef)
+        # the whole route is interpolated lazily while walking, with the length of every increment
+        waypoints = [(step_data['lat'], step_data['long']) for step_data in route_data['steps']]
+        for next_point, distance_to_point in interpolate_path(self._posf, waypoints, step_size):
+            total_distance_traveled += distance_to_point
+            travel_link = '%s%s,%s' % (base_travel_link, next_point[0], next_point[1])
 
-            for i, next_point in enumerate(step_increments):
-                distance_to_point = distance_in_meters(self._posf, next_point)
-                total_distance_traveled += distance_to_point
-                travel_link = '%s%s,%s' % (base_travel_link, next_point[0], next_point[1])
+            self.log.info(
+                POKESTOP_LOG +
+                cgray + "[" + cwhite + "%.0f" + cgray + "/" + cwhite + "%.0f" + cgray + "m]" +
+                cyellow + " Pokestop" + cdyellow + " @ " + clink + "%s" + cdef,
+                total_distance_traveled,
+                total_distance,
+                travel_link
+            )
+            self.set_position(*next_point)
+            self.heartbeat()
 
-                self.log.info(
-                    POKESTOP_LOG +
-                    cgray + "[" + cwhite + "%.0f" + cgray + "/" + cwhite + "%.0f" + cgray + "m]" +
-                    cyellow + " Pokestop" + cdyellow + " @ " + clink + "%s" + cdef,
-                    total_distance_traveled,
-                    total_distance,
-                    travel_link
-                )
-                self.set_position(*next_point)
-                self.heartbeat()
-
-                if directly is False:
-                    if self.experimental and self.spin_all_forts:
-                        self.spin_nearest_fort()
-
-                # self.gsleep(1)
-                while self.catch_near_pokemon() and catch_attempt <= self.max_catch_attempts:
-                    self.gsleep(1)
-                    catch_attempt += 1
-                catch_attempt = 0
+            if directly is False:
+                if self.experimental and self.spin_all_forts:
+                    self.spin_nearest_fort()
+
+            # self.gsleep(1)
+            while self.catch_near_pokemon() and catch_attempt <= self.max_catch_attempts:
+                catch_attempt += 1
+            catch_attempt = 0
 
             #self.log.info('Traveled %.2f meters of %.2f of the trip', total_distance_traveled, total_distance)
         # self.log.info('===============================================')
@@ -585,9 +642,8 @@ class PGoApi:
         self.walk_to(self._origPosF)
 
     def spin_nearest_fort(self):
-        map_cells = self.nearby_map_objects()['responses'].get('GET_MAP_OBJECTS', {}).get('map_cells', [])
-        forts = PGoApi.flatmap(lambda c: c.get('forts', []), map_cells)
-        destinations = filtered_forts(self._origPosF, self._posf, forts, self.STAY_WITHIN_PROXIMITY, self.visited_forts)
+        self.nearby_map_objects()
+        destinations = self.spinnable_forts()
         if destinations:
             nearest_fort = destinations[0][0]
             nearest_fort_dis = destinations[0][1]
@@ -608,29 +664,22 @@ class PGoApi:
             self.log.info('No spinnable forts within proximity. Or server returned no map objects.')
 
     def fort_search_pgoapi(self, fort, player_postion, fort_distance):
-        self.gsleep(0.2)
         res = self.fort_search(fort_id=fort['id'], fort_latitude=fort['latitude'],
                                fort_longitude=fort['longitude'],
                                player_latitude=player_postion[0],
-                               player_longitude=player_postion[1]).call()['responses']['FORT_SEARCH']
-        result = res.pop('result', -1)
-        if result == 1 and res:
-            items = defaultdict(int)
-            for item in res['items_awarded']:
-                items[item['item_id']] += item['item_count']
-            reward = 'XP +' + str(res['experience_awarded'])
-            for item_id, amount in items.iteritems():
-                reward += ', ' + str(amount) + 'x ' + get_item_name(item_id)
+                               player_longitude=player_postion[1]).call(RpcApi.RESPONSE_MODE_PROTO)['responses']['FORT_SEARCH']
+        result = res.result
+        if result == 1:
             self.log.info(cdgray + "=========================================================================================" + cdef)
             self.log.info(
                 POKESTOP_LOG +
                 cgreen + "Used Pokestop" + cdgreen + " @ " +
                 clink + "http://maps.google.com/maps?q=%s,%s" + cdef, fort['latitude'], fort['longitude'])
-            if "items_awarded" in res:
+            if res.items_awarded:
                 items = defaultdict(int)
-                for item in res['items_awarded']:
-                    items[item['item_id']] += item['item_count']
-                reward = 'XP +' + str(res['experience_awarded'])
+                for item in res.items_awarded:
+                    items[item.item_id] += item.item_count
+                reward = 'XP +' + str(res.experience_awarded)
                 for item_id, amount in six.iteritems(items):
                     reward += ', ' + str(amount) + 'x ' + get_item_name(item_id)
             else:
@@ -664,9 +713,7 @@ class PGoApi:
 
     def spin_all_forts_visible(self):
         res = self.nearby_map_objects()
-        map_cells = res['responses'].get('GET_MAP_OBJECTS', {}).get('map_cells', [])
-        forts = PGoApi.flatmap(lambda c: c.get('forts', []), map_cells)
-        destinations = filtered_forts(self._origPosF, self._posf, forts, self.STAY_WITHIN_PROXIMITY, self.visited_forts)
+        destinations = self.spinnable_forts()
         if not destinations:
             self.log.info(
                 POKESTOP_LOG +
@@ -675,6 +722,12 @@ class PGoApi:
             return False
         if len(destinations) >= 20:
             destinations = destinations[:20]
+        if not self.config.get("BEHAVIOR", {}).get("USE_GOOGLE", False):
+            # without google's optimize_waypoints, walk a locally planned route over the forts,
+            # walk_to spins every fort that comes within reach on the way
+            for fort, _ in self.route_forts(destinations):
+                self.walk_to((fort['latitude'], fort['longitude']))
+            return True
         furthest_fort = destinations[0][0]
         self.log.info(
             POKESTOP_LOG +
@@ -699,9 +752,7 @@ class PGoApi:
 
     def spin_near_fort(self):
         res = self.nearby_map_objects()
-        map_cells = res['responses'].get('GET_MAP_OBJECTS', {}).get('map_cells', [])
-        forts = PGoApi.flatmap(lambda c: c.get('forts', []), map_cells)
-        destinations = filtered_forts(self._origPosF, self._posf, forts, self.STAY_WITHIN_PROXIMITY, self.visited_forts)
+        destinations = self.spinnable_forts()
         if not destinations:
             self.log.debug("No fort to walk to! %s", res)
             self.log.info(
@@ -710,7 +761,7 @@ class PGoApi:
             self.walk_back_to_origin()
             return False
 
-        for fort_data in destinations:
+        for fort_data in self.route_forts(destinations):
             self.walk_to_fort(fort_data)
 
         return True
@@ -721,13 +772,17 @@ class PGoApi:
 
         map_cells = self.nearby_map_objects()['responses'].get('GET_MAP_OBJECTS', {}).get('map_cells', [])
         pokemons = PGoApi.flatmap(lambda c: c.get('catchable_pokemons', []), map_cells)
-        pokemons = filter(lambda p: (p['encounter_id'] not in self.encountered_pokemons), pokemons)
+        # the cache keeps a pokemon until it despawns, only the latest response lists the ones still catchable from here
+        latest = set()
+        if isinstance(self.map_objects_proto, GetMapObjectsResponse):
+            latest = set(p.encounter_id for c in self.map_objects_proto.map_cells for p in c.catchable_pokemons)
+        pokemons = [p for p in pokemons if p['encounter_id'] in latest and p['encounter_id'] not in self.encountered_pokemons]
 
         # catch first pokemon:
         origin = (self._posf[0], self._posf[1])
-        pokemon_distances = [(pokemon, distance_in_meters(origin, (pokemon['latitude'], pokemon['longitude']))) for
-                             pokemon
-                             in pokemons]
+        pokemon_distances = [(pokemon, float(distance)) for pokemon, distance in zip(pokemons, distances_to_objects(origin, pokemons, self.distance_method))
+                             if distance <= ENCOUNTER_RADIUS]
+        pokemons = [pokemon for pokemon, _ in pokemon_distances]
         if pokemons:
             self.log.info(
                 ENCOUNTER_LOG +
@@ -746,21 +801,72 @@ class PGoApi:
         return catches_successful
 
     def nearby_map_objects(self):
-        if time() - self._last_got_map_objects > self._map_objects_rate_limit:
+        neighbors, added, removed = self.neighbor_tracker.update(self._posf)
+        # cells we walked out of are dropped from the cache, the ones we walked into need a request
+        self._unfetched_cells.update(added)
+        self._unfetched_cells.difference_update(removed)
+        self.map_cache.discard(removed)
+        if time() - self._last_got_map_objects > self._map_objects_rate_limit and (
+                time() * 1000 >= self._next_map_objects_ms or self._unfetched_cells):
             position = self.get_position()
-            neighbors = get_neighbors(self._posf)
-            gevent.sleep(1.0)
-            self.map_objects = self.get_map_objects(
+            res = self.get_map_objects(
                 latitude=position[0], longitude=position[1],
-                since_timestamp_ms=[0] * len(neighbors),
-                cell_id=neighbors).call()
+                since_timestamp_ms=self.map_cache.since_timestamps(neighbors),
+                cell_id=neighbors).call(RpcApi.RESPONSE_MODE_PROTO)
+            # the server only sends what changed since each cell's timestamp, merge it into the cached cells
+            # and hand the callers the merged state of the neighbouring cells
+            self.map_objects_proto = res['responses'].get('GET_MAP_OBJECTS')
+            if isinstance(self.map_objects_proto, GetMapObjectsResponse):
+                if self.map_cache.update(self.map_objects_proto):
+                    self.index_map_objects(self.map_objects_proto)
+                    self.spawn_model.observe(self.map_objects_proto)
+                    self._unfetched_cells.clear()
+                    self._next_map_objects_ms = self.spawn_model.next_refresh(
+                        time() * 1000, self._posf, NEARBY_FORT_RADIUS,
+                        self._map_objects_rate_limit * 1000, self._map_objects_max_interval * 1000)
+                    if self.map_store is not None:
+                        self.map_store.record(self.map_objects_proto)
+                res['responses']['GET_MAP_OBJECTS'] = {'status': self.map_objects_proto.status}
+            self.map_objects = res
             self._last_got_map_objects = time()
+        # between requests pokemon keep expiring and cells go out of range, rebuild the view on every call
+        map_objects = self.map_objects.get('responses', {}).get('GET_MAP_OBJECTS')
+        if isinstance(map_objects, dict):
+            self.map_cache.prune()
+            map_objects['map_cells'] = self.map_cache.map_cells(neighbors)
         return self.map_objects
 
+    def index_map_objects(self, map_objects):
+        for cell in map_objects.map_cells:
+            for fort in cell.forts:
+                self.fort_index.insert(fort.id, fort.latitude, fort.longitude, fort_summary(fort),
+                                       fort.cooldown_complete_timestamp_ms)
+            for fort_id in cell.deleted_objects:
+                self.fort_index.remove(fort_id)
+        self.fort_index.prune(self._posf[0], self._posf[1], FORT_INDEX_RADIUS)
+
+    def spinnable_forts(self, radius=NEARBY_FORT_RADIUS):
+        # [(fort, distance)] of the spinnable pokestops around the player, nearest first
+        now_ms = time() * 1000
+        forts = self.fort_index.radius(self._posf[0], self._posf[1], radius, now_ms=now_ms,
+                                       predicate=lambda fort: is_spinnable_pokestop(fort, self.visited_forts, now_ms))
+        if self.STAY_WITHIN_PROXIMITY and self.STAY_WITHIN_PROXIMITY > 0:
+            # the proximity can be far away, measured on the ellipsoid
+            within = distances_to_objects(self._origPosF, [fort for fort, _ in forts], DISTANCE_GEOD) < self.STAY_WITHIN_PROXIMITY
+            forts = [fort for fort, keep in zip(forts, within) if keep]
+        return forts
+
+    def route_forts(self, destinations):
+        # [(fort, distance)] in the order that keeps the walk from the player over all of them short
+        stops = [(fort['latitude'], fort['longitude']) for fort, _ in destinations]
+        order = plan_route(self._posf, stops, method=self.distance_method)
+        self.log.info("Planned a route over %s Pokestops: %.2f meters", len(order), route_distance(self._posf, [stops[i] for i in order]))
+        return [destinations[i] for i in order]
+
     def attempt_catch(self, encounter_id, spawn_point_id, capture_probability=None):
         catch_status = -1
         catch_attempts = 1
-        ret = {}
+        ret = None
         if not capture_probability:
             capture_probability = {}
         # Max 4 attempts to catch pokemon
@@ -770,10 +876,13 @@ class PGoApi:
             # Try to use a berry to increase the chance of catching the pokemon when we have failed enough attempts
             if catch_attempts > self.config.get("CAPTURE", {}).get("MIN_FAILED_ATTEMPTS_BEFORE_USING_BERRY", 3) and self.inventory.has_berry():
                 self.log.info("Feeding da razz berry!")
-                self.gsleep(0.2)
-                r = self.use_item_capture(item_id=self.inventory.take_berry(), encounter_id=encounter_id, spawn_point_id=spawn_point_id).call()['responses']['USE_ITEM_CAPTURE']
-                if r.get("success", False):
-                    item_capture_mult = r.get("item_capture_mult", 1.0)
+                r = self.use_item_capture(
+                    item_id=self.inventory.take_berry(),
+                    encounter_id=encounter_id,
+                    spawn_point_id=spawn_point_id
+                ).call(RpcApi.RESPONSE_MODE_PROTO)['responses']['USE_ITEM_CAPTURE']
+                if r.success:
+                    item_capture_mult = r.item_capture_mult or 1.0
                 else:
                     self.log.info("Could not feed the Pokemon. (%s)", r)
 
@@ -783,7 +892,6 @@ class PGoApi:
                 ccyan + "Throwing: " + cwhite + "{0}" + ccyan + " @ " + cwhite +
                 "{1:.0f}" + ccyan + "% Chance. Try #" + cwhite + "{2}" + cdef)
                 .format(get_item_name(pokeball), capture_probability.get(pokeball, 0.0) * 100, catch_attempts))
-            self.gsleep(0.5)
             r = self.catch_pokemon(
                 normalized_reticle_size=1.950,
                 pokeball=pokeball,
@@ -792,10 +900,10 @@ class PGoApi:
                 normalized_hit_position=1,
                 encounter_id=encounter_id,
                 spawn_point_id=spawn_point_id,
-            ).call()['responses']['CATCH_POKEMON']
+            ).call(RpcApi.RESPONSE_MODE_PROTO)['responses']['CATCH_POKEMON']
             catch_attempts += 1
-            if "status" in r:
-                catch_status = r['status']
+            if r.status:
+                catch_status = r.status
                 # fleed or error
                 if catch_status == 3 or catch_status == 0:
                     break
@@ -806,62 +914,48 @@ class PGoApi:
         # self.gsleep(4)
         return ret
 
-    def cleanup_inventory(self, inventory_items=None):
+    def _indexed_inventory(self, inventory_items=None):
+        # the kept inventory, or an index of the given items
         if not inventory_items:
-            self.gsleep(0.2)
-            inventory_items = self.get_inventory().call()['responses']['GET_INVENTORY']['inventory_delta'][
-                'inventory_items']
+            return self.inventory
+        return Player_Inventory(self.percentages, inventory_items)
+
+    def cleanup_inventory(self, inventory_items=None):
         item_count = 0
-        for inventory_item in inventory_items:
-            if "item" in inventory_item['inventory_item_data']:
-                item = inventory_item['inventory_item_data']['item']
-                if (
-                    item['item_id'] in self.MIN_ITEMS and
-                    "count" in item and
-                    item['count'] > self.MIN_ITEMS[item['item_id']]
-                ):
-                    recycle_count = item['count'] - self.MIN_ITEMS[item['item_id']]
-                    item_count += item['count'] - recycle_count
+        for item_id, count in list(self._indexed_inventory(inventory_items).items.items()):
+            if item_id in self.MIN_ITEMS and count > self.MIN_ITEMS[item_id]:
+                recycle_count = count - self.MIN_ITEMS[item_id]
+                item_count += count - recycle_count
+                self.log.info((
+                    INVENTORY_LOG +
+                    cyellow + "Recycling" + cdyellow + ": " + cwhite + "{1}" + cyellow + " x " + cwhite + "{0}" + cdef).format(get_item_name(item_id), recycle_count))
+                res = self.recycle_inventory_item(item_id=item_id, count=recycle_count).call()['responses'][
+                    'RECYCLE_INVENTORY_ITEM']
+                response_code = res['result']
+                if response_code == 1:
                     self.log.info((
                         INVENTORY_LOG +
-                        cyellow + "Recycling" + cdyellow + ": " + cwhite + "{1}" + cyellow + " x " + cwhite + "{0}" + cdef).format(get_item_name(item['item_id']), recycle_count))
-                    self.gsleep(0.2)
-                    res = self.recycle_inventory_item(item_id=item['item_id'], count=recycle_count).call()['responses'][
-                        'RECYCLE_INVENTORY_ITEM']
-                    response_code = res['result']
-                    if response_code == 1:
-                        self.log.info((
-                            INVENTORY_LOG +
-                            cmagenta + "New Count" + cdmagenta + ": " + cwhite + "{1}" + cmagenta + " x " + cwhite + "{0}" + cdef).format(get_item_name(item['item_id']), res.get('new_count', 0)))
-                    else:
-                        self.log.info(
-                            INVENTORY_LOG +
-                            cdred + "Failed to recycle Item:" + cred + " %s" + cdred + ", Code:" + cred + " %s" + cdef, item['item_id'], response_code)
-                    self.gsleep(1)
-                elif "count" in item:
-                    item_count += item['count']
+                        cmagenta + "New Count" + cdmagenta + ": " + cwhite + "{1}" + cmagenta + " x " + cwhite + "{0}" + cdef).format(get_item_name(item_id), res.get('new_count', 0)))
+                else:
+                    self.log.info(
+                        INVENTORY_LOG +
+                        cdred + "Failed to recycle Item:" + cred + " %s" + cdred + ", Code:" + cred + " %s" + cdef, item_id, response_code)
+            else:
+                item_count += count
         if item_count > 0:
             self.log.info(
                 INVENTORY_LOG +
                 cyellow + "Inventory has " + cwhite + "%s" + cyellow + "/" + cwhite + "%s" + cyellow + " items" + cdef, item_count, self.player.max_item_storage)
         return self.update_player_inventory()
 
+    def _pokemon_collection(self, inventory_items=None):
+        return PokemonCollection(self._indexed_inventory(inventory_items).pokemon.values(),
+                                 self.player_stats.level, self.SCORE_METHOD, self.SCORE_SETTINGS)
+
     def get_caught_pokemons(self, inventory_items=None, as_json=False):
-        if not inventory_items:
-            self.gsleep(0.2)
-            inventory_items = self.get_inventory().call()['responses']['GET_INVENTORY']['inventory_delta'][
-                'inventory_items']
-        caught_pokemon = defaultdict(list)
-        for inventory_item in inventory_items:
-            if "pokemon_data" in inventory_item['inventory_item_data'] and not inventory_item['inventory_item_data']['pokemon_data'].get("is_egg", False):
-                # is a pokemon:
-                pokemon_data = inventory_item['inventory_item_data']['pokemon_data']
-                pokemon = Pokemon(pokemon_data, self.player_stats.level, self.SCORE_METHOD, self.SCORE_SETTINGS)
-
-                if not pokemon.is_egg:
-                    caught_pokemon[pokemon.pokemon_id].append(pokemon)
+        caught_pokemon = defaultdict(list, self._pokemon_collection(inventory_items).by_species())
         if as_json:
-            return json.dumps(caught_pokemon, default=lambda p: p.__dict__)  # reduce the data sent?
+            return json.dumps(caught_pokemon, default=json_default)  # reduce the data sent?
         return caught_pokemon
 
     def get_player_info(self, as_json=True):
@@ -869,9 +963,11 @@ class PGoApi:
 
     def do_release_pokemon_by_id(self, p_id):
         self.release_pokemon(pokemon_id=int(p_id))
-        self.gsleep(0.2)
         release_res = self.call()['responses']['RELEASE_POKEMON']
         status = release_res.get('result', -1)
+        if status == 1:
+            # until the next inventory delta confirms it, cleanup must not pick it again
+            self.inventory.remove_pokemon(int(p_id))
         return status
 
     def do_release_pokemon(self, pokemon):
@@ -886,100 +982,19 @@ class PGoApi:
             self.log.info(
                 INVENTORY_LOG +
                 cred + "Failed to release Pokemon: " + cwhite + "%s" + cdef, pokemon)
-        self.gsleep(1.0)
 
     def get_pokemon_stats(self, inventory_items=None):
-        if not inventory_items:
-            self.gsleep(0.2)
-            inventory_items = self.get_inventory().call()['responses']['GET_INVENTORY']['inventory_delta'][
-                'inventory_items']
         caught_pokemon = self.get_caught_pokemons(inventory_items)
         for pokemons in caught_pokemon.values():
             for pokemon in pokemons:
                 self.log.info("%s", pokemon)
 
     def cleanup_pokemon(self, inventory_items=None):
-        if not inventory_items:
-            self.gsleep(0.2)
-            inventory_items = self.get_inventory().call()['responses']['GET_INVENTORY']['inventory_delta'][
-                'inventory_items']
-        caught_pokemon = self.get_caught_pokemons(inventory_items)
-        for pokemons in caught_pokemon.values():
-            if len(pokemons) > self.MIN_SIMILAR_POKEMON:
-                # sorting for CLASSIC method as default
-                sorted_pokemons = sorted(pokemons, key=lambda x: (x.cp, x.iv), reverse=True)
-
-                # Release method ADVANCED will set try_keep for each pokemon that qualifies
-                if self.RELEASE_METHOD == "ADVANCED":
-                    sorted_pokemons = sorted(sorted_pokemons, key=lambda x: (x.iv, x.cp), reverse=True)
-                    iv_options = self.RELEASE_METHOD_CONF.get("BEST_IV", {})
-                    keep = 0
-                    for i, pokemon in enumerate(sorted_pokemons):
-                        if keep >= iv_options.get("MAX_AMOUNT", 999) or pokemon.iv < (
-                                iv_options.get("IGNORE_BELOW", 0)):
-                            break
-                        if keep < iv_options.get("MIN_AMOUNT", 1) or pokemon.iv > (
-                                sorted_pokemons[0].iv * iv_options.get("KEEP_ADDITIONAL_SCALAR", 1.0)):
-                            sorted_pokemons[i].try_keep = True
-                            keep += 1
-                    sorted_pokemons = sorted(sorted_pokemons, key=lambda x: (x.cp, x.iv), reverse=True)
-                    cp_options = self.RELEASE_METHOD_CONF.get("BEST_CP", {})
-                    keep = 0
-                    for i, pokemon in enumerate(sorted_pokemons):
-                        if keep >= cp_options.get("MAX_AMOUNT", 999):
-                            break
-                        if keep < cp_options.get("MIN_AMOUNT", 1) or pokemon.cp > (
-                                sorted_pokemons[0].cp * cp_options.get("KEEP_ADDITIONAL_SCALAR", 1.0)):
-                            sorted_pokemons[i].try_keep = True
-                            keep += 1
-
-                elif self.RELEASE_METHOD == "DUPLICATES":
-                    sorted_pokemons = sorted(sorted_pokemons, key=lambda x: (x.score, x.cp, x.iv), reverse=True)
-
-                kept_pokemon_of_type = self.MIN_SIMILAR_POKEMON
-                for pokemon in sorted_pokemons[self.MIN_SIMILAR_POKEMON:]:
-                    if self.is_pokemon_eligible_for_transfer(pokemon, sorted_pokemons[0], kept_pokemon_of_type):
-                        self.do_release_pokemon(pokemon)
-                    else:
-                        kept_pokemon_of_type += 1
-
-    def is_pokemon_eligible_for_transfer(self, pokemon, best_pokemon=None, kept_pokemon_of_type=0):
-        # never release favorites
-        if pokemon.is_favorite:
-            return False
-        # keep defined pokemon unless we are above MAX_SIMILAR_POKEMON
-        if pokemon.pokemon_id in self.keep_pokemon_ids and kept_pokemon_of_type <= self.MAX_SIMILAR_POKEMON:
-            return False
-        # release defined throwaway pokemons
-        if pokemon.pokemon_id in self.throw_pokemon_ids:
-            return True
-        if self.RELEASE_METHOD == "DUPLICATES":
-            if best_pokemon.score * self.RELEASE_METHOD_CONF.get("RELEASE_DUPLICATES_SCALAR", 1.0) > pokemon.score \
-                    and pokemon.score < self.RELEASE_METHOD_CONF.get("RELEASE_DUPLICATES_MAX_SCORE", 0):
-                return True
-            else:
-                return False
-        elif self.RELEASE_METHOD == "ADVANCED":
-            if pokemon.level < self.RELEASE_METHOD_CONF.get("ALWAYS_RELEASE_BELOW_LEVEL", 0):
-                return True
-            elif pokemon.try_keep:
-                return False
-            elif pokemon.cp > self.RELEASE_METHOD_CONF.get("KEEP_CP_OVER", 500) \
-                    or pokemon.iv > self.RELEASE_METHOD_CONF.get("KEEP_IV_OVER", 50):
-                return False
-            return True
-        # CLASSIC fallback method
-        elif pokemon.cp > self.KEEP_CP_OVER or pokemon.iv > self.KEEP_IV_OVER:
-            return False
-        return True
+        for pokemon in self.release_policy.release_list(self._pokemon_collection(inventory_items)):
+            self.do_release_pokemon(pokemon)
 
     def attempt_evolve(self, inventory_items=None):
-        if not inventory_items:
-            self.gsleep(0.2)
-            inventory_items = self.get_inventory().call()['responses']['GET_INVENTORY']['inventory_delta'][
-                'inventory_items']
         caught_pokemon = self.get_caught_pokemons(inventory_items)
-        self.inventory = Player_Inventory(self.percentages, inventory_items)
         for pokemons in caught_pokemon.values():
             if len(pokemons) > self.MIN_SIMILAR_POKEMON:
                 pokemons = sorted(pokemons, key=lambda x: (x.cp, x.iv), reverse=True)
@@ -993,7 +1008,6 @@ class PGoApi:
             self.log.info(
                 INVENTORY_LOG +
                 cyellow + "Evolving Pokemon: " + cwhite + "%s" + cdef, pokemon)
-            self.gsleep(0.2)
             evo_res = self.evolve_pokemon(pokemon_id=pokemon.id).call()['responses']['EVOLVE_POKEMON']
             status = evo_res.get('result', -1)
             # self.gsleep(3)
@@ -1027,7 +1041,9 @@ class PGoApi:
 
     def disk_encounter_pokemon(self, lureinfo, retry=False):
         try:
-            self.update_player_inventory()
+            # the heartbeat keeps the inventory current, only ask again when we seem to be out of balls
+            if not self.inventory.can_attempt_catch():
+                self.update_player_inventory()
             if not self.inventory.can_attempt_catch():
                 self.log.info(
                     INVENTORY_LOG +
@@ -1041,20 +1057,22 @@ class PGoApi:
                 POKESTOP_LOG +
                 cdgreen + "At Pokestop with Lure AND Active Pokemon: " + cgreen + "%s" + cdef,
                 POKEMON_NAMES.get(str(lureinfo.get('active_pokemon_id', 0)), "NA"))
-            self.gsleep(0.2)
             resp = self.disk_encounter(encounter_id=encounter_id, fort_id=fort_id, player_latitude=position[0],
                                        player_longitude=position[1]).call()['responses']['DISK_ENCOUNTER']
             result = resp.get('result', -1)
             if result == 1 and 'pokemon_data' in resp and 'capture_probability' in resp:
                 pokemon = Pokemon(resp.get('pokemon_data', {}))
                 capture_probability = create_capture_probability(resp.get('capture_probability', {}))
-                self.log.debug("Attempt Encounter: %s", json.dumps(resp, indent=4, sort_keys=True))
+                if self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug("Attempt Encounter: %s", json.dumps(resp, indent=4, sort_keys=True, default=json_default))
                 return self.do_catch_pokemon(encounter_id, fort_id, capture_probability, pokemon)
             elif result == 5:
                 self.log.info(
                     INVENTORY_LOG +
                     cred + "Couldn't catch %s Your pokemon bag was full, attempting to clear and re-try" + cdef,
                     POKEMON_NAMES.get(str(lureinfo.get('active_pokemon_id', 0)), "NA"))
+                # the cached inventory lags behind the catches since the last heartbeat
+                self.update_player_inventory()
                 self.cleanup_pokemon()
                 if not retry:
                     return self.disk_encounter_pokemon(lureinfo, retry=True)
@@ -1072,7 +1090,7 @@ class PGoApi:
             ENCOUNTER_LOG +
             ccyan + "Catching Pokemon: " + cgreen + "%s" + cdef, pokemon)
         catch_attempt = self.attempt_catch(encounter_id, spawn_point_id, capture_probability)
-        capture_status = catch_attempt.get('status', -1)
+        capture_status = catch_attempt.status if catch_attempt is not None else -1
         if capture_status == 1:
             self.log.debug("Caught Pokemon: : %s", catch_attempt)
             self.log.info(
@@ -1107,9 +1125,10 @@ class PGoApi:
             return False
 
     def encounter_pokemon(self, pokemon_data, retry=False, new_loc=None):  # take in a MapPokemon from MapCell.catchable_pokemons
-        # Update Inventory to make sure we can catch this mon
         try:
-            self.update_player_inventory()
+            # the heartbeat keeps the inventory current, only ask again when we seem to be out of balls
+            if not self.inventory.can_attempt_catch():
+                self.update_player_inventory()
             if not self.inventory.can_attempt_catch():
                 self.log.info(
                     INVENTORY_LOG +
@@ -1123,7 +1142,6 @@ class PGoApi:
             self.log.info(
                 ENCOUNTER_LOG +
                 ccyan + "Encountering Pokemon: " + cgreen + "%s" + cdef, pokemon)
-            self.gsleep(0.2)
             encounter = self.encounter(encounter_id=encounter_id,
                                        spawn_point_id=spawn_point_id,
                                        player_latitude=position[0],
@@ -1133,7 +1151,8 @@ class PGoApi:
             if result == 1 and 'wild_pokemon' in encounter and 'capture_probability' in encounter:
                 pokemon = Pokemon(encounter.get('wild_pokemon', {}).get('pokemon_data', {}))
                 capture_probability = create_capture_probability(encounter.get('capture_probability', {}))
-                self.log.debug("Attempt Encounter Capture Probability: %s", json.dumps(encounter, indent=4, sort_keys=True))
+                if self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug("Attempt Encounter Capture Probability: %s", json.dumps(encounter, indent=4, sort_keys=True, default=json_default))
 
                 if new_loc:
                     # change loc for sniping
@@ -1148,10 +1167,14 @@ class PGoApi:
                 self.log.info(
                     ENCOUNTER_LOG +
                     cred + "Couldn't catch " + cwhite + "%s" + cred + "! Your pokemon bag was full, attempting to clear and re-try" + cdef, pokemon)
+                # the cached inventory lags behind the catches since the last heartbeat
+                self.update_player_inventory()
                 self.cleanup_pokemon()
                 if not retry:
                     return self.encounter_pokemon(pokemon_data, retry=True, new_loc=new_loc)
             else:
+                if result in ENCOUNTER_FINAL_STATUSES:
+                    self.encountered_pokemons[encounter_id] = pokemon_data
                 self.log.info(
                     ENCOUNTER_LOG +
                     cred + "Could not start encounter for pokemon: " + cwhite + "%s" + cdef, pokemon)
@@ -1200,7 +1223,6 @@ class PGoApi:
     def attempt_start_incubation(self, egg, incubator):
         #self.log.info(cdgreen + "Start incubating " + cgreen + "%s" + cdgreen + "km egg" + cdef, egg['egg_km_walked_target'])
         # self.log.info("Start incubating %skm egg", egg['egg_km_walked_target'])
-        self.gsleep(0.2)
         incubate_res = self.use_item_egg_incubator(item_id=incubator['id'], pokemon_id=egg['id']).call()['responses'][
             'USE_ITEM_EGG_INCUBATOR']
         status = incubate_res.get('result', -1)
@@ -1217,13 +1239,12 @@ class PGoApi:
                 INVENTORY_LOG +
                 cred + "Failed to Start Incubating " + cwhite + "%s" + cred + "km Egg | Status " + cwhite + "%s" + cdef, egg['egg_km_walked_target'], status)
             self.update_player_inventory()
-            return Falsew
+            return False
 
     def attempt_finish_incubation(self):
         self.log.info(
                 INVENTORY_LOG +
                 cyellow + "Checking for hatched eggs" + cdef)
-        self.gsleep(0.2)
         hatch_res = self.get_hatched_eggs().call()['responses']['GET_HATCHED_EGGS']
         status = hatch_res.get('success', -1)
         # self.gsleep(3)
@@ -1231,7 +1252,7 @@ class PGoApi:
             self.update_player_inventory()
             i = 0
             for pokemon_id in hatch_res['pokemon_id']:
-                pokemon = get_pokemon_by_long_id(pokemon_id, self.inventory.inventory_items)
+                pokemon = get_pokemon_by_long_id(pokemon_id, self.inventory)
                 self.log.info(
                     INVENTORY_LOG +
                     cgreen + "Egg Hatched! XP +" + cwhite + "%s" +
@@ -1280,7 +1301,6 @@ class PGoApi:
         self.get_inventory()
         self.check_awarded_badges()
         self.download_settings(hash="05daf51635c82611d1aac95c0b051d3ec088a930")
-        self.gsleep(1.0)
         response = self.call()
 
         if not response:
@@ -1298,6 +1318,8 @@ class PGoApi:
                 cred + 'Login failed - unexpected server response!' + cdef)
             return False
 
+        self.apply_inventory_response(response)
+
         if 'auth_ticket' in response:
             self._auth_provider.set_ticket(response['auth_ticket'].values())
 
@@ -1,5 +1,7 @@
 import json
 
+from pgoapi.utilities import json_default
+
 
 class Player:
     def __init__(self, player_data):
@@ -30,4 +32,4 @@ class Player:
         return self.__str__()
 
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__)
+        return json.dumps(self, default=json_default)
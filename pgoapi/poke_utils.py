@@ -55,12 +55,9 @@ def create_capture_probability(capture_probability):
         return dict(zip(capture_balls, capture_rate))
 
 
-def get_pokemon_by_long_id(pokemon_id, res):
-    for inventory_item in res:
-        pokemon_data = inventory_item['inventory_item_data'].get('pokemon_data', {})
-        if not pokemon_data.get('is_egg', False) and pokemon_data.get('id', 'NA') == pokemon_id:
-            return Pokemon(pokemon_data)
-    return None
+def get_pokemon_by_long_id(pokemon_id, inventory):
+    pokemon_data = inventory.pokemon.get(pokemon_id)
+    return Pokemon(pokemon_data) if pokemon_data is not None else None
 
 
 def get_item_name(item):
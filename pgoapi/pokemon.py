@@ -1,9 +1,14 @@
 from __future__ import absolute_import
 import json
+from bisect import bisect_left
+from collections import namedtuple
 from math import sqrt
 from os import path
 
+import numpy as np
+import six
 from pgoapi.game_master import GAME_MASTER
+from pgoapi.utilities import json_default
 
 
 POKEMON_NAMES = {}
@@ -86,24 +91,18 @@ class Pokemon(object):
         self.cpm_total = self.cp_multiplier + self.additional_cp_multiplier
         self.level_wild = self.get_level_by_cpm(self.cp_multiplier)
         self.level = self.get_level_by_cpm(self.cpm_total)
-        additional_data = GAME_MASTER.get(self.pokemon_id)
-        self.family_id = additional_data.FamilyId if additional_data else None
+        species = species_constants(self.pokemon_id)
+        self.family_id = species.family_id
 
         # Thanks to http://pokemongo.gamepress.gg/pokemon-stats-advanced for the magical formulas
-        attack = float(additional_data.BaseAttack) if additional_data else 0.0
-        defense = float(additional_data.BaseDefense) if additional_data else 0.0
-        stamina = float(additional_data.BaseStamina) if additional_data else 0.0
-        self.max_cp = ((attack + self.individual_attack) *
-                       sqrt(defense + self.individual_defense) *
-                       sqrt(stamina + self.individual_stamina) *
-                       pow(self.get_cpm_by_level(player_level + 1.5), 2)) / 10
-        self.max_cp_absolute = ((attack + self.individual_attack) *
-                                sqrt(defense + self.individual_defense) *
-                                sqrt(stamina + self.individual_stamina) *
-                                pow(self.get_cpm_by_level(40), 2)) / 10
+        base_cp = ((species.attack + self.individual_attack) *
+                   species.sqrt_defense(self.individual_defense) *
+                   species.sqrt_stamina(self.individual_stamina))
+        self.max_cp = (base_cp * cpm_squared_by_level(player_level + 1.5)) / 10
+        self.max_cp_absolute = (base_cp * CPM_SQUARED_BY_LEVEL[40]) / 10
         # calculating these for level 40 to get more accurate values
-        worst_iv_cp = (attack * sqrt(defense) * sqrt(stamina) * pow(self.get_cpm_by_level(40), 2)) / 10
-        perfect_iv_cp = ((attack + 15) * sqrt(defense + 15) * sqrt(stamina + 15) * pow(self.get_cpm_by_level(40), 2)) / 10
+        worst_iv_cp = species.worst_iv_cp
+        perfect_iv_cp = species.perfect_iv_cp
         if perfect_iv_cp - worst_iv_cp > 0:
                 self.iv_normalized = 100 * (self.max_cp_absolute - worst_iv_cp) / (perfect_iv_cp - worst_iv_cp)
         self.score = 0.0
@@ -154,30 +153,26 @@ class Pokemon(object):
     def __repr__(self):
         return self.__str__()
 
-    def get_level_by_cpm(self, cpm_total):
-        prev_max_level = 0
-        prev_max_level_cpm = 0
-        for cpm_increment in self.CPM_calculation_increments:
-            max_level = cpm_increment['max_level']
-            cpm_sqrt_increase_per_level = cpm_increment['cpm_sqrt_increase_per_level']
-            if "max_level_cpm" in cpm_increment:
-                max_level_cpm = cpm_increment['max_level_cpm']
-            else:
-                # this calculates the CPM for a pokemon with max_level of the current iteration
-                max_level_cpm = self.get_cpm_by_level(max_level)
-            if cpm_total <= max_level_cpm:
-                # cpm_sqrt_increase_per_level is only valid for CPM increase since prev_max_level
-                level_diff_prev_max_level = (pow(cpm_total, 2) - pow(prev_max_level_cpm, 2)) / cpm_sqrt_increase_per_level
-                return round(prev_max_level + level_diff_prev_max_level, 1)
-            else:
-                prev_max_level = max_level
-                prev_max_level_cpm = max_level_cpm
-        return 0.0
+    @classmethod
+    def get_level_by_cpm(cls, cpm_total):
+        # also false for nan
+        if not cpm_total <= LEVEL_SEGMENT_CPMS[-1]:
+            return 0.0
+        _, prev_max_level, prev_max_level_cpm_squared, cpm_sqrt_increase_per_level = LEVEL_SEGMENTS[bisect_left(LEVEL_SEGMENT_CPMS, cpm_total)]
+        # cpm_sqrt_increase_per_level is only valid for CPM increase since prev_max_level
+        level_diff_prev_max_level = (pow(cpm_total, 2) - prev_max_level_cpm_squared) / cpm_sqrt_increase_per_level
+        return round(prev_max_level + level_diff_prev_max_level, 1)
 
-    def get_cpm_by_level(self, level):
+    @classmethod
+    def get_cpm_by_level(cls, level):
+        cpm = CPM_BY_LEVEL.get(level)
+        return cpm if cpm is not None else cls.calculate_cpm_by_level(level)
+
+    @classmethod
+    def calculate_cpm_by_level(cls, level):
         prev_max_level = 0
         prev_max_level_cpm = 0
-        for cpm_increment in self.CPM_calculation_increments:
+        for cpm_increment in cls.CPM_calculation_increments:
             max_level = cpm_increment['max_level']
             cpm_sqrt_increase_per_level = cpm_increment['cpm_sqrt_increase_per_level']
             if level <= max_level:  # we are below the max level of current cpm iteration
@@ -202,4 +197,377 @@ class Pokemon(object):
         return self.pokemon_id > 0
 
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__)
+        return json.dumps(self, default=json_default)
+
+
+# the CPM of every half level from 1 to 40, and its square the CP formulas use
+CPM_BY_LEVEL = dict((level / 2.0, Pokemon.calculate_cpm_by_level(level / 2.0)) for level in range(2, 81))
+CPM_SQUARED_BY_LEVEL = dict((level, pow(cpm, 2)) for level, cpm in CPM_BY_LEVEL.items())
+
+
+def cpm_squared_by_level(level):
+    cpm_squared = CPM_SQUARED_BY_LEVEL.get(level)
+    return cpm_squared if cpm_squared is not None else pow(Pokemon.get_cpm_by_level(level), 2)
+
+
+def _level_segments():
+    # (max_level_cpm, prev_max_level, prev_max_level_cpm squared, cpm_sqrt_increase_per_level) of every CPM increment
+    segments = []
+    prev_max_level = 0
+    prev_max_level_cpm = 0
+    for cpm_increment in Pokemon.CPM_calculation_increments:
+        max_level = cpm_increment['max_level']
+        if "max_level_cpm" in cpm_increment:
+            max_level_cpm = cpm_increment['max_level_cpm']
+        else:
+            max_level_cpm = CPM_BY_LEVEL[max_level]
+        segments.append((max_level_cpm, prev_max_level, pow(prev_max_level_cpm, 2), cpm_increment['cpm_sqrt_increase_per_level']))
+        prev_max_level = max_level
+        prev_max_level_cpm = max_level_cpm
+    return segments
+
+
+LEVEL_SEGMENTS = _level_segments()
+LEVEL_SEGMENT_CPMS = [segment[0] for segment in LEVEL_SEGMENTS]
+
+
+class SpeciesConstants(namedtuple('SpeciesConstants', ('family_id', 'attack', 'defense', 'stamina', 'defense_roots',
+                                                       'stamina_roots', 'worst_iv_cp', 'perfect_iv_cp'))):
+    """ base stats of a species with everything of the CP formulas that doesn't depend on the individual pokemon """
+    __slots__ = ()
+
+    def sqrt_defense(self, individual_defense):
+        return _root(self.defense_roots, self.defense, individual_defense)
+
+    def sqrt_stamina(self, individual_stamina):
+        return _root(self.stamina_roots, self.stamina, individual_stamina)
+
+
+def _root(roots, base, individual):
+    # sqrt(base + individual), looked up for the individual values 0 to 15
+    if isinstance(individual, six.integer_types) and 0 <= individual < len(roots):
+        return roots[individual]
+    return sqrt(base + individual)
+
+
+_species_constants = {}
+
+
+def species_constants(pokemon_id):
+    constants = _species_constants.get(pokemon_id)
+    if constants is None:
+        additional_data = GAME_MASTER.get(pokemon_id)
+        attack = float(additional_data.BaseAttack) if additional_data else 0.0
+        defense = float(additional_data.BaseDefense) if additional_data else 0.0
+        stamina = float(additional_data.BaseStamina) if additional_data else 0.0
+        constants = SpeciesConstants(
+            additional_data.FamilyId if additional_data else None, attack, defense, stamina,
+            tuple(sqrt(defense + individual) for individual in range(16)), tuple(sqrt(stamina + individual) for individual in range(16)),
+            (attack * sqrt(defense) * sqrt(stamina) * CPM_SQUARED_BY_LEVEL[40]) / 10,
+            ((attack + 15) * sqrt(defense + 15) * sqrt(stamina + 15) * CPM_SQUARED_BY_LEVEL[40]) / 10)
+        _species_constants[pokemon_id] = constants
+    return constants
+
+
+def evaluate_pokemon(pokemon_id, individual_attack, individual_defense, individual_stamina, cp_multiplier,
+                     additional_cp_multiplier, cp, player_level=0, score_method="CP", score_settings=dict()):
+    """
+    iv, level_wild, level, max_cp, max_cp_absolute, iv_normalized and score
+    of every pokemon given as arrays, with the formulas of Pokemon.__init__
+    evaluated in the same order, so the results are identical to it.
+    """
+    # base stats of every species in the bag once, spread over its pokemon
+    species, species_index = np.unique(np.asarray(pokemon_id, dtype=np.int64), return_inverse=True)
+    constants = [species_constants(int(pokemon_id)) for pokemon_id in species]
+    attack = np.array([c.attack for c in constants], dtype=np.float64)[species_index]
+    defense = np.array([c.defense for c in constants], dtype=np.float64)[species_index]
+    stamina = np.array([c.stamina for c in constants], dtype=np.float64)[species_index]
+    individual_attack = np.asarray(individual_attack, dtype=np.float64)
+    individual_defense = np.asarray(individual_defense, dtype=np.float64)
+    individual_stamina = np.asarray(individual_stamina, dtype=np.float64)
+    cp_multiplier = np.asarray(cp_multiplier, dtype=np.float64)
+    cp = np.asarray(cp, dtype=np.float64)
+
+    iv = ((individual_attack + individual_stamina + individual_defense + 0.0) / 45.0) * 100.0
+    level_wild = _levels_by_cpm(cp_multiplier)
+    level = _levels_by_cpm(cp_multiplier + np.asarray(additional_cp_multiplier, dtype=np.float64))
+    cpm_player_squared = cpm_squared_by_level(player_level + 1.5)
+    cpm_40_squared = CPM_SQUARED_BY_LEVEL[40]
+    max_cp = ((attack + individual_attack) * np.sqrt(defense + individual_defense) * np.sqrt(stamina + individual_stamina) *
+              cpm_player_squared) / 10
+    max_cp_absolute = ((attack + individual_attack) * np.sqrt(defense + individual_defense) * np.sqrt(stamina + individual_stamina) *
+                       cpm_40_squared) / 10
+    worst_iv_cp = (attack * np.sqrt(defense) * np.sqrt(stamina) * cpm_40_squared) / 10
+    perfect_iv_cp = ((attack + 15) * np.sqrt(defense + 15) * np.sqrt(stamina + 15) * cpm_40_squared) / 10
+    spread = perfect_iv_cp - worst_iv_cp
+    valid = spread > 0
+    iv_normalized = np.full(len(iv), -1.0)
+    iv_normalized[valid] = 100 * (max_cp_absolute[valid] - worst_iv_cp[valid]) / spread[valid]
+
+    if score_method == "CP":
+        score = cp
+    elif score_method == "IV":
+        score = iv_normalized
+    elif score_method == "CP*IV":
+        score = cp * iv_normalized
+    elif score_method == "CP+IV":
+        score = cp + iv_normalized
+    elif score_method == "FANCY":
+        score = (iv_normalized / 100.0 * score_settings.get("WEIGHT_IV", 0.5)) + \
+                (level / (player_level + 1.5) * score_settings.get("WEIGHT_LVL", 0.5))
+    else:
+        score = np.zeros(len(iv))
+    return {'iv': iv, 'level_wild': level_wild, 'level': level, 'max_cp': max_cp, 'max_cp_absolute': max_cp_absolute,
+            'iv_normalized': iv_normalized, 'score': score}
+
+
+def _levels_by_cpm(cpm_total):
+    # Pokemon.get_level_by_cpm for an array, searchsorted finds the same segment as bisect_left
+    segments = np.array(LEVEL_SEGMENTS, dtype=np.float64)
+    done = cpm_total <= LEVEL_SEGMENT_CPMS[-1]
+    segment = np.minimum(np.searchsorted(LEVEL_SEGMENT_CPMS, cpm_total), len(LEVEL_SEGMENTS) - 1)
+    raw = segments[segment, 1] + (cpm_total ** 2 - segments[segment, 2]) / segments[segment, 3]
+    # np.round rounds x * 10, round() the exact binary value, they disagree on halves
+    return np.array([round(value, 1) if found else 0.0 for value, found in zip(raw.tolist(), done.tolist())], dtype=np.float64)
+
+
+class PokemonCollection(object):
+    """
+    The pokemon of a bag stored column-wise: one compact array per field
+    (id, pokemon_id, cp, ivs, cpm, favorite, ...) instead of one Pokemon
+    object, with its pokemon_data dict, per pokemon. Derived columns (iv,
+    level, max_cp, iv_normalized, score) are only computed, for the whole
+    bag at once, when they are first read. Indexing or iterating gives
+    PokemonView rows that read like Pokemon objects.
+    """
+
+    _INT_COLUMNS = (
+        ('id', np.uint64), ('pokemon_id', np.int16), ('cp', np.int32), ('stamina', np.int32), ('stamina_max', np.int32),
+        ('individual_attack', np.int8), ('individual_defense', np.int8), ('individual_stamina', np.int8),
+        ('favorite', np.int8), ('origin', np.int8),
+    )
+    _FLOAT_COLUMNS = ('cp_multiplier', 'additional_cp_multiplier', 'height_m', 'weight_kg')
+    _DEFAULTS = {'favorite': -1}
+
+    def __init__(self, pokemon_data_list, player_level=0, score_method="CP", score_settings=dict()):
+        pokemon_data_list = [p for p in pokemon_data_list if not p.get('is_egg', False)]
+        for name, dtype in self._INT_COLUMNS:
+            default = self._DEFAULTS.get(name, 0)
+            setattr(self, name, np.array([p.get(name, default) for p in pokemon_data_list], dtype=dtype))
+        for name in self._FLOAT_COLUMNS:
+            setattr(self, name, np.array([p.get(name, 0.0) for p in pokemon_data_list], dtype=np.float64))
+        # most pokemon have no nickname
+        self.nicknames = dict((i, p['nickname']) for i, p in enumerate(pokemon_data_list) if p.get('nickname'))
+        self.try_keep = np.zeros(len(pokemon_data_list), dtype=bool)
+        self.player_level = player_level
+        self.score_method = score_method
+        self.score_settings = score_settings
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return PokemonView(self, index % len(self))
+
+    def __iter__(self):
+        return (PokemonView(self, i) for i in range(len(self)))
+
+    def by_species(self):
+        """ {pokemon_id: [PokemonView]} in bag order """
+        groups = {}
+        for i, pokemon_id in enumerate(self.pokemon_id.tolist()):
+            groups.setdefault(pokemon_id, []).append(PokemonView(self, i))
+        return groups
+
+    def column(self, name):
+        """ a derived column, computed for every pokemon on first use """
+        if name not in self._derived:
+            self._derived.update(self._derive())
+        return self._derived[name]
+
+    def _derive(self):
+        return evaluate_pokemon(self.pokemon_id, self.individual_attack, self.individual_defense, self.individual_stamina,
+                                self.cp_multiplier, self.additional_cp_multiplier, self.cp,
+                                self.player_level, self.score_method, self.score_settings)
+
+
+def _stored(name, convert):
+    return property(lambda self: convert(getattr(self.collection, name)[self.index]))
+
+
+def _derived(name):
+    return property(lambda self: float(self.collection.column(name)[self.index]))
+
+
+class PokemonView(object):
+    """ one pokemon of a PokemonCollection, read like a Pokemon """
+    __slots__ = ('collection', 'index')
+
+    is_egg = False
+
+    def __init__(self, collection, index):
+        self.collection = collection
+        self.index = index
+
+    id = _stored('id', int)
+    pokemon_id = _stored('pokemon_id', int)
+    cp = _stored('cp', int)
+    stamina = _stored('stamina', int)
+    stamina_max = _stored('stamina_max', int)
+    individual_attack = _stored('individual_attack', int)
+    individual_defense = _stored('individual_defense', int)
+    individual_stamina = _stored('individual_stamina', int)
+    favorite = _stored('favorite', int)
+    origin = _stored('origin', int)
+    cp_multiplier = _stored('cp_multiplier', float)
+    additional_cp_multiplier = _stored('additional_cp_multiplier', float)
+    height_m = _stored('height_m', float)
+    weight_kg = _stored('weight_kg', float)
+    iv = _derived('iv')
+    level_wild = _derived('level_wild')
+    level = _derived('level')
+    max_cp = _derived('max_cp')
+    max_cp_absolute = _derived('max_cp_absolute')
+    iv_normalized = _derived('iv_normalized')
+
+    @property
+    def score(self):
+        score = self.collection.column('score')[self.index]
+        # CP scores are ints, like Pokemon.score
+        return int(score) if self.collection.score_method == "CP" else float(score)
+
+    @property
+    def is_favorite(self):
+        return self.favorite != -1
+
+    @property
+    def cpm_total(self):
+        return self.cp_multiplier + self.additional_cp_multiplier
+
+    @property
+    def nickname(self):
+        return self.collection.nicknames.get(self.index, "").encode('utf8')
+
+    @property
+    def pokemon_type(self):
+        return POKEMON_NAMES.get(str(self.pokemon_id), "NA").encode('utf-8', 'ignore')
+
+    @property
+    def family_id(self):
+        additional_data = GAME_MASTER.get(self.pokemon_id)
+        return additional_data.FamilyId if additional_data else None
+
+    @property
+    def try_keep(self):
+        return bool(self.collection.try_keep[self.index])
+
+    @try_keep.setter
+    def try_keep(self, value):
+        self.collection.try_keep[self.index] = value
+
+    def is_valid_pokemon(self):
+        return self.pokemon_id > 0
+
+    def to_dict(self):
+        fields = ('id', 'pokemon_id', 'cp', 'stamina', 'stamina_max', 'individual_attack', 'individual_defense', 'individual_stamina',
+                  'favorite', 'is_favorite', 'origin', 'cp_multiplier', 'additional_cp_multiplier', 'height_m', 'weight_kg', 'nickname',
+                  'pokemon_type', 'family_id', 'iv', 'level_wild', 'level', 'max_cp', 'max_cp_absolute', 'iv_normalized', 'score', 'try_keep')
+        return dict((field, getattr(self, field)) for field in fields)
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), default=json_default)
+
+    def __str__(self):
+        return (cgray + "[" + cwhite + "{3:2>.0f}%" + cgray + "]" +
+                cdarkmagenta + "(" + cmagenta + "{2}" + cdarkmagenta + ")" +
+                cgreen + "{1}" + cdefault).format(self.nickname, self.pokemon_type, self.cp, self.iv)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class ReleasePolicy(object):
+    """
+    The POKEMON_CLEANUP release rules (CLASSIC, ADVANCED and DUPLICATES)
+    evaluated for a whole PokemonCollection at once: the species groups are
+    sorted with one lexsort, the best pokemon are marked try_keep and every
+    rule is a mask over the bag. Releases the same pokemon, in the same
+    order, as checking them one by one against the rules did.
+    """
+
+    def __init__(self, method="CLASSIC", method_conf=None, min_similar=1, max_similar=999, keep_ids=(), throw_ids=(),
+                 keep_cp_over=0, keep_iv_over=0):
+        self.method = method
+        self.method_conf = method_conf or {}
+        self.min_similar = min_similar
+        self.max_similar = max_similar
+        self.keep_ids = list(keep_ids)
+        self.throw_ids = list(throw_ids)
+        self.keep_cp_over = keep_cp_over
+        self.keep_iv_over = keep_iv_over
+
+    def release_list(self, pokemons):
+        """ the PokemonViews to release, species by species in bag order, each species best first """
+        if not len(pokemons):
+            return []
+        conf = self.method_conf
+        cp = pokemons.cp.astype(np.float64)
+        iv = pokemons.column('iv')
+        score = pokemons.column('score')
+
+        # species numbered in the order their first pokemon appears in the bag, like by_species()
+        _, first, species = np.unique(pokemons.pokemon_id, return_index=True, return_inverse=True)
+        group = np.argsort(np.argsort(first))[species.ravel()]
+        sizes = np.bincount(group)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        crowded = sizes[group] > self.min_similar
+
+        def positions(order):
+            # rank of every pokemon within its species for a lexsort order
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order)) - starts[group[order]]
+            return ranks
+
+        def best(values, ranks):
+            # the value of the first pokemon of its species, for every pokemon
+            firsts = np.empty(len(sizes), dtype=np.int64)
+            firsts[group[ranks == 0]] = np.nonzero(ranks == 0)[0]
+            return values[firsts][group]
+
+        # lexsort is stable, ties stay in bag order like with the repeated sorted() calls
+        order = np.lexsort((-iv, -cp, group))
+        if self.method == "DUPLICATES":
+            order = np.lexsort((-iv, -cp, -score, group))
+        rank = positions(order)
+
+        if self.method == "ADVANCED":
+            rank_iv = positions(np.lexsort((-cp, -iv, group)))
+            iv_options = conf.get("BEST_IV", {})
+            better = iv > best(iv, rank_iv) * iv_options.get("KEEP_ADDITIONAL_SCALAR", 1.0)
+            # marking stops at the first pokemon below IGNORE_BELOW
+            limit = np.minimum(np.maximum(np.bincount(group, better, len(sizes)), iv_options.get("MIN_AMOUNT", 1)),
+                               np.bincount(group, iv >= iv_options.get("IGNORE_BELOW", 0), len(sizes)))
+            keep_iv = rank_iv < np.minimum(limit, iv_options.get("MAX_AMOUNT", 999))[group]
+
+            cp_options = conf.get("BEST_CP", {})
+            better = cp > best(cp, rank) * cp_options.get("KEEP_ADDITIONAL_SCALAR", 1.0)
+            limit = np.maximum(np.bincount(group, better, len(sizes)), cp_options.get("MIN_AMOUNT", 1))
+            keep_cp = rank < np.minimum(limit, cp_options.get("MAX_AMOUNT", 999))[group]
+            pokemons.try_keep |= crowded & (keep_iv | keep_cp)
+
+            release = (pokemons.column('level') < conf.get("ALWAYS_RELEASE_BELOW_LEVEL", 0)) | \
+                (~pokemons.try_keep & ~((cp > conf.get("KEEP_CP_OVER", 500)) | (iv > conf.get("KEEP_IV_OVER", 50))))
+        elif self.method == "DUPLICATES":
+            release = (best(score, rank) * conf.get("RELEASE_DUPLICATES_SCALAR", 1.0) > score) & \
+                (score < conf.get("RELEASE_DUPLICATES_MAX_SCORE", 0))
+        else:
+            release = ~((cp > self.keep_cp_over) | (iv > self.keep_iv_over))
+
+        # a kept species stays until max_similar are kept, nothing of it is released before that
+        kept_species = np.isin(pokemons.pokemon_id, self.keep_ids) & (rank <= self.max_similar)
+        release = (np.isin(pokemons.pokemon_id, self.throw_ids) | release) & ~kept_species & (pokemons.favorite == -1)
+        release &= crowded & (rank >= self.min_similar)
+        return [PokemonView(pokemons, i) for i in order.tolist() if release[i]]
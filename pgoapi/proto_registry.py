@@ -0,0 +1,62 @@
+from __future__ import absolute_import
+
+import logging
+
+from pgoapi.protos.POGOProtos.Networking import Responses_pb2
+from pgoapi.protos.POGOProtos.Networking.Requests import Messages_pb2
+from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
+from pgoapi.utilities import to_camel_case
+
+_MISSING = object()
+
+
+class ProtoRegistry(object):
+    """
+    Maps every RequestType value to its *Message and *Response classes.
+
+    Classes are resolved lazily the first time a request type is used (or
+    all at once with warm_up) and cached; types without a protobuf definition
+    are cached as None so they aren't looked up again on every call.
+    """
+
+    def __init__(self):
+        self.log = logging.getLogger(__name__)
+        self._names = {}
+        self._messages = {}
+        self._responses = {}
+
+    def get_name(self, request_type):
+        name = self._names.get(request_type)
+        if name is None:
+            name = RequestType.Name(request_type)
+            self._names[request_type] = name
+        return name
+
+    def get_message_class(self, request_type):
+        cls = self._messages.get(request_type, _MISSING)
+        if cls is _MISSING:
+            cls = self._resolve(self._messages, Messages_pb2, request_type, 'Message')
+        return cls
+
+    def get_response_class(self, request_type):
+        cls = self._responses.get(request_type, _MISSING)
+        if cls is _MISSING:
+            cls = self._resolve(self._responses, Responses_pb2, request_type, 'Response')
+        return cls
+
+    def _resolve(self, cache, module, request_type, suffix):
+        class_name = to_camel_case(self.get_name(request_type).lower()) + suffix
+        cls = getattr(module, class_name, None)
+        if cls is None:
+            self.log.debug('Protobuf definition for %s not found', class_name)
+        cache[request_type] = cls
+        return cls
+
+    def warm_up(self):
+        for request_type in RequestType.values():
+            self.get_message_class(request_type)
+            self.get_response_class(request_type)
+        return self
+
+
+registry = ProtoRegistry()
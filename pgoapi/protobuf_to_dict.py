@@ -4,8 +4,13 @@ import six
 from google.protobuf.descriptor import FieldDescriptor
 from google.protobuf.message import Message
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 __all__ = ["protobuf_to_dict", "TYPE_CALLABLE_MAP", "dict_to_protobuf",
-           "REVERSE_TYPE_CALLABLE_MAP"]
+           "REVERSE_TYPE_CALLABLE_MAP", "LazyMessageDict"]
 
 EXTENSION_CONTAINER = '___X'
 
@@ -38,33 +43,76 @@ def enum_label_name(field, value):
 
 
 def protobuf_to_dict(pb, type_callable_map=TYPE_CALLABLE_MAP, use_enum_labels=False):
-    result_dict = {}
-    extensions = {}
-    for field, value in pb.ListFields():
-        if field.message_type and field.message_type.has_options and field.message_type.GetOptions().map_entry:
-            result_dict[field.name] = dict(value)
-            continue
-        type_callable = _get_field_value_adaptor(pb, field, type_callable_map, use_enum_labels)
-        if field.label == FieldDescriptor.LABEL_REPEATED:
-            type_callable = repeated(type_callable)
+    return _get_conversion_plan(pb.DESCRIPTOR, type_callable_map, use_enum_labels).convert(pb)
 
-        if field.is_extension:
-            extensions[str(field.number)] = type_callable(value)
-            continue
 
-        result_dict[field.name] = type_callable(value)
+# compiled conversion plans, keyed by (message descriptor, id(type_callable_map), use_enum_labels)
+_conversion_plans = {}
+
 
-    if extensions:
-        result_dict[EXTENSION_CONTAINER] = extensions
-    return result_dict
+def _get_conversion_plan(descriptor, type_callable_map, use_enum_labels):
+    key = (descriptor, id(type_callable_map), use_enum_labels)
+    plan = _conversion_plans.get(key)
+    # the map is kept on the plan so a recycled id() of another map never matches
+    if plan is None or plan.type_callable_map is not type_callable_map:
+        plan = _ConversionPlan(type_callable_map, use_enum_labels)
+        _conversion_plans[key] = plan
+    return plan
+
+
+class _ConversionPlan(object):
+    """
+    Conversion of one message type to a dict, compiled once per descriptor.
+
+    Every field gets its (name, converter, is_extension) entry the first time
+    it is seen; later messages of the same type only look the entry up
+    instead of re-checking map-entry options and building new adaptors.
+    """
+
+    __slots__ = ('type_callable_map', 'use_enum_labels', 'fields')
+
+    def __init__(self, type_callable_map, use_enum_labels):
+        self.type_callable_map = type_callable_map
+        self.use_enum_labels = use_enum_labels
+        self.fields = {}
+
+    def convert(self, pb):
+        result_dict = {}
+        extensions = {}
+        fields = self.fields
+        for field, value in pb.ListFields():
+            entry = fields.get(field)
+            if entry is None:
+                entry = self._compile_field(pb, field)
+            name, type_callable, is_extension = entry
+            if is_extension:
+                extensions[name] = type_callable(value)
+            else:
+                result_dict[name] = type_callable(value)
+
+        if extensions:
+            result_dict[EXTENSION_CONTAINER] = extensions
+        return result_dict
+
+    def _compile_field(self, pb, field):
+        if field.message_type and field.message_type.has_options and field.message_type.GetOptions().map_entry:
+            entry = (field.name, dict, False)
+        else:
+            type_callable = _get_field_value_adaptor(pb, field, self.type_callable_map, self.use_enum_labels)
+            if field.label == FieldDescriptor.LABEL_REPEATED:
+                type_callable = repeated(type_callable)
+            if field.is_extension:
+                entry = (str(field.number), type_callable, True)
+            else:
+                entry = (field.name, type_callable, False)
+        self.fields[field] = entry
+        return entry
 
 
 def _get_field_value_adaptor(pb, field, type_callable_map=TYPE_CALLABLE_MAP, use_enum_labels=False):
     if field.type == FieldDescriptor.TYPE_MESSAGE:
         # recursively encode protobuf sub-message
-        return lambda pb: protobuf_to_dict(
-            pb, type_callable_map=type_callable_map,
-            use_enum_labels=use_enum_labels)
+        return _get_conversion_plan(field.message_type, type_callable_map, use_enum_labels).convert
 
     if use_enum_labels and field.type == FieldDescriptor.TYPE_ENUM:
         return lambda value: enum_label_name(field, value)
@@ -76,6 +124,83 @@ def _get_field_value_adaptor(pb, field, type_callable_map=TYPE_CALLABLE_MAP, use
         pb.__class__.__name__, field.name, field.type))
 
 
+class LazyMessageDict(Mapping):
+    """
+    Read-only, dict-compatible view of a protobuf message.
+
+    Only the names of the set fields are listed up front; a field is converted
+    the first time it is accessed and the result is kept. Sub-messages become
+    views themselves, so untouched parts of a big response are never converted.
+    Converting the whole view with to_dict() gives exactly protobuf_to_dict().
+    """
+
+    __slots__ = ('_pb', '_fields', '_values')
+
+    def __init__(self, pb):
+        self._pb = pb
+        self._fields = None
+        self._values = {}
+
+    def _listed_fields(self):
+        if self._fields is None:
+            fields = {}
+            extensions = []
+            for field, value in self._pb.ListFields():
+                if field.is_extension:
+                    extensions.append((field, value))
+                else:
+                    fields[field.name] = (field, value)
+            if extensions:
+                # extensions are rare enough to be converted right away
+                self._values[EXTENSION_CONTAINER] = protobuf_to_dict(self._pb)[EXTENSION_CONTAINER]
+                fields[EXTENSION_CONTAINER] = None
+            self._fields = fields
+        return self._fields
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        field, value = self._listed_fields()[key]
+        converted = self._values[key] = _get_lazy_adaptor(self._pb, field)(value)
+        return converted
+
+    def __iter__(self):
+        return iter(self._listed_fields())
+
+    def __len__(self):
+        return len(self._listed_fields())
+
+    def __contains__(self, key):
+        return key in self._listed_fields()
+
+    def to_dict(self):
+        return protobuf_to_dict(self._pb)
+
+    def __repr__(self):
+        return 'LazyMessageDict(%r)' % self.to_dict()
+
+
+# converters for LazyMessageDict values, keyed by field descriptor
+_lazy_adaptors = {}
+
+
+def _get_lazy_adaptor(pb, field):
+    adaptor = _lazy_adaptors.get(field)
+    if adaptor is None:
+        if field.message_type and field.message_type.has_options and field.message_type.GetOptions().map_entry:
+            adaptor = dict
+        elif field.type == FieldDescriptor.TYPE_MESSAGE:
+            adaptor = LazyMessageDict
+            if field.label == FieldDescriptor.LABEL_REPEATED:
+                adaptor = repeated(adaptor)
+        else:
+            adaptor = _get_conversion_plan(pb.DESCRIPTOR, TYPE_CALLABLE_MAP, False)._compile_field(pb, field)[1]
+        _lazy_adaptors[field] = adaptor
+    return adaptor
+
+
 def get_bytes(value):
     return base64.b64decode(value)
 
@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+
+import logging
+import threading
+from time import time
+
+import gevent
+
+# envelope status the server answers with when it refuses a request (throttled or bad auth)
+STATUS_THROTTLED = 102
+
+
+def is_throttled(response):
+    """ empty, non-200 and undecodable responses come back as False/None from RpcApi """
+    if not response:
+        return True
+    status = response.get("status_code", response.get("direction", -1))
+    return status == STATUS_THROTTLED
+
+
+class TokenBucket(object):
+    """
+    rate tokens per second, up to burst of them saved up. A token is
+    reserved for every request, so concurrent greenlets queue up behind each
+    other and each one waits exactly until its token is due.
+    """
+
+    def __init__(self, rate, burst=1, clock=time):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """ takes a token, returns the seconds to wait until it is due """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(self.clock())
+            self.rate = float(rate)
+
+    def drain(self):
+        # nothing saved up anymore, the next request waits a full interval
+        with self._lock:
+            self._refill(self.clock())
+            self._tokens = min(self._tokens, 0.0)
+
+
+class RateLimiter(object):
+    """
+    Request budget of one account, optionally on top of a global budget
+    shared by every account of the process. Requests go out as soon as both
+    budgets allow. When the server starts refusing requests the account rate
+    is halved (down to min_rate), every successful request then wins back
+    a tenth of the configured rate.
+    """
+
+    def __init__(self, rate=1.5, burst=3, min_rate=0.1, shared=None, clock=time, sleep=gevent.sleep):
+        self.log = logging.getLogger(__name__)
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.shared = shared
+        self.sleep = sleep
+        self.throttled = 0
+
+    @classmethod
+    def from_config(cls, config, shared=None):
+        limit = config.get("RATE_LIMIT", {})
+        return cls(rate=limit.get("REQUESTS_PER_SECOND", 1.5), burst=limit.get("BURST", 3),
+                   min_rate=limit.get("MIN_REQUESTS_PER_SECOND", 0.1), shared=shared)
+
+    @staticmethod
+    def shared_from_config(config):
+        """ the global TokenBucket of GLOBAL_REQUESTS_PER_SECOND, None when unlimited """
+        limit = config.get("RATE_LIMIT", {})
+        rate = limit.get("GLOBAL_REQUESTS_PER_SECOND", 0)
+        if not rate:
+            return None
+        return TokenBucket(rate, limit.get("GLOBAL_BURST", 10))
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def reserve(self):
+        """ takes a token of every budget, returns the seconds to wait before sending the request """
+        wait = self.bucket.reserve()
+        if self.shared is not None:
+            wait = max(wait, self.shared.reserve())
+        return wait
+
+    def acquire(self):
+        """ blocks the greenlet until the request may be sent, returns the seconds waited """
+        wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def report(self, response):
+        """ adapts the account rate to the outcome of the request, returns whether it was throttled """
+        if is_throttled(response):
+            self.throttled += 1
+            rate = max(self.min_rate, self.bucket.rate / 2)
+            if rate < self.bucket.rate:
+                self.log.warning('Server is throttling requests, slowing down to %.2f requests per second', rate)
+            self.bucket.set_rate(rate)
+            self.bucket.drain()
+            return True
+        if self.bucket.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.max_rate / 10))
+        return False
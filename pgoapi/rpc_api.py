@@ -28,59 +28,47 @@ Modifications by: Brad Smith <https://github.com/infinitewarp>
 from __future__ import absolute_import
 
 import logging
-import subprocess
-from importlib import import_module
 
-import requests
 from google.protobuf.message import DecodeError
 
-from pgoapi.exceptions import (NotLoggedInException,
-                               ServerBusyOrOfflineException)
-from pgoapi.protobuf_to_dict import protobuf_to_dict
+from pgoapi.exceptions import NotLoggedInException
+from pgoapi.proto_registry import registry
+from pgoapi.protobuf_to_dict import LazyMessageDict, protobuf_to_dict
 from pgoapi.protos.POGOProtos.Networking.Envelopes_pb2 import (RequestEnvelope,
                                                                ResponseEnvelope)
-from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
-from pgoapi.utilities import to_camel_case
+from pgoapi.transport import Transport
 
 
 class RpcApi:
-    def __init__(self, auth_provider):
+    # sub-responses are converted to nested dicts right away
+    RESPONSE_MODE_DICT = 'dict'
+    # sub-responses are read-only LazyMessageDict views, converted field by field on first access
+    RESPONSE_MODE_LAZY = 'lazy'
+    # sub-responses are the parsed *Response protobuf objects themselves, nothing is converted
+    RESPONSE_MODE_PROTO = 'proto'
+
+    def __init__(self, auth_provider, transport=None, capture=None, response_mode=RESPONSE_MODE_DICT):
 
         self.log = logging.getLogger(__name__)
 
-        self._session = requests.session()
-        self._session.headers.update({'User-Agent': 'Niantic App'})
-        self._session.verify = True
+        # reuse the caller's pooled transport, only fall back to a private one
+        self._transport = transport or Transport()
 
         self._auth_provider = auth_provider
 
-    def get_rpc_id(self):
-        return 8145806132888207460
-
-    def decode_raw(self, raw):
-        output = error = None
-        try:
-            process = subprocess.Popen(['protoc', '--decode_raw'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE)
-            output, error = process.communicate(raw)
-        except:
-            output = "Couldn't find protoc in your environment OR other issue..."
+        # optional ResponseCapture, responses are only decoded for debugging when it's set
+        self._capture = capture
 
-        return output
+        self.response_mode = response_mode
 
-    def get_class(self, cls):
-        module_, class_ = cls.rsplit('.', 1)
-        class_ = getattr(import_module(module_), class_)
-        return class_
+    def get_rpc_id(self):
+        return 8145806132888207460
 
     def _make_rpc(self, endpoint, request_proto_plain):
         self.log.debug('Execution of RPC')
 
         request_proto_serialized = request_proto_plain.SerializeToString()
-        try:
-            http_response = self._session.post(endpoint, data=request_proto_serialized)
-        except requests.exceptions.ConnectionError:
-            raise ServerBusyOrOfflineException
+        http_response = self._transport.post(endpoint, request_proto_serialized)
 
         return http_response
 
@@ -132,13 +120,13 @@ class RpcApi:
                 entry_id = list(entry.items())[0][0]
                 entry_content = entry[entry_id]
 
-                entry_name = RequestType.Name(entry_id)
+                message_class = registry.get_message_class(entry_id)
+                if message_class is None:
+                    raise Exception('Protobuf definition for {} not found'.format(registry.get_name(entry_id)))
+                subrequest_extension = message_class()
+                proto_name = message_class.__name__
 
-                proto_name = to_camel_case(entry_name.lower()) + 'Message'
-                proto_classname = 'POGOProtos.Networking.Requests.Messages_pb2.' + proto_name
-                subrequest_extension = self.get_class(proto_classname)()
-
-                self.log.debug("Subrequest class: %s", proto_classname)
+                self.log.debug("Subrequest class: %s", proto_name)
 
                 for (key, value) in entry_content.items():
                     if isinstance(value, list):
@@ -195,18 +183,25 @@ class RpcApi:
             return False
 
         self.log.debug('Protobuf structure of rpc response:\n\r%s', response_proto)
-        try:
-            self.log.debug('Decode raw over protoc (protoc has to be in your PATH):\n\r%s',
-                           self.decode_raw(response_raw.content).decode('utf-8'))
-        except:
-            self.log.debug('Error during protoc parsing - ignored.')
 
-        response_proto_dict = protobuf_to_dict(response_proto)
-        response_proto_dict = self._parse_sub_responses(response_proto, subrequests, response_proto_dict)
+        captured = None
+        if self._capture and self._capture.sample():
+            captured = []
+
+        if self.response_mode == self.RESPONSE_MODE_DICT:
+            response_proto_dict = protobuf_to_dict(response_proto)
+        else:
+            envelope = LazyMessageDict(response_proto)
+            # the raw returns are parsed separately below, so they are never converted
+            response_proto_dict = dict((key, envelope[key]) for key in envelope if key != 'returns')
+        response_proto_dict = self._parse_sub_responses(response_proto, subrequests, response_proto_dict, captured)
+
+        if captured is not None:
+            self._capture.write(response_proto, captured)
 
         return response_proto_dict
 
-    def _parse_sub_responses(self, response_proto, subrequests_list, response_proto_dict):
+    def _parse_sub_responses(self, response_proto, subrequests_list, response_proto_dict, captured=None):
         self.log.debug('Parsing sub RPC responses...')
         response_proto_dict['responses'] = {}
 
@@ -225,30 +220,39 @@ class RpcApi:
             else:
                 entry_id = list(request_entry.items())[0][0]
 
-            entry_name = RequestType.Name(entry_id)
-            proto_name = to_camel_case(entry_name.lower()) + 'Response'
-            proto_classname = 'POGOProtos.Networking.Responses_pb2.' + proto_name
-
-            self.log.debug("Parsing class: %s", proto_classname)
+            entry_name = registry.get_name(entry_id)
+            response_class = registry.get_response_class(entry_id)
 
             subresponse_return = None
-            try:
-                subresponse_extension = self.get_class(proto_classname)()
-            except Exception:
+            if response_class is not None:
+                subresponse_extension = response_class()
+                proto_classname = response_class.DESCRIPTOR.full_name
+                self.log.debug("Parsing class: %s", proto_classname)
+            else:
                 subresponse_extension = None
-                error = 'Protobuf definition for {} not found'.format(proto_classname)
+                error = 'Protobuf definition for {} not found'.format(entry_name)
                 subresponse_return = error
                 self.log.debug(error)
 
             if subresponse_extension:
                 try:
                     subresponse_extension.ParseFromString(subresponse)
-                    subresponse_return = protobuf_to_dict(subresponse_extension)
+                    subresponse_return = self._convert_sub_response(subresponse_extension)
                 except:
                     error = "Protobuf definition for {} seems not to match".format(proto_classname)
                     subresponse_return = error
                     self.log.debug(error)
 
+            if captured is not None:
+                captured.append((entry_name, subresponse_extension))
+
             response_proto_dict['responses'][entry_name] = subresponse_return
             i += 1
         return response_proto_dict
+
+    def _convert_sub_response(self, subresponse):
+        if self.response_mode == self.RESPONSE_MODE_PROTO:
+            return subresponse
+        if self.response_mode == self.RESPONSE_MODE_LAZY:
+            return LazyMessageDict(subresponse)
+        return protobuf_to_dict(subresponse)
@@ -0,0 +1,137 @@
+from __future__ import absolute_import
+
+import math
+from collections import defaultdict
+from time import time
+
+from pgoapi.location import (DISTANCE_GEOD, EARTH_RADIUS_METERS,
+                             distances_in_meters)
+
+# the local projection used to pick buckets is off by well under this factor
+# anywhere within a few hundred km of the first object indexed
+PROJECTION_MARGIN = 1.02
+
+
+class SpatialIndex(object):
+    """
+    In-memory index of map objects (forts, spawn points) by position.
+
+    Objects are bucketed in a grid of bucket_size metres in a local
+    equirectangular projection, so radius and k-nearest queries only look at
+    the buckets around the query point instead of every object ever seen.
+    The candidates are then measured exactly with distances_in_meters.
+    An object can be hidden until a timestamp, e.g. a fort until its
+    cooldown_complete_timestamp_ms.
+    """
+
+    def __init__(self, bucket_size=250, method=DISTANCE_GEOD):
+        self.bucket_size = float(bucket_size)
+        self.method = method
+        self._origin = None
+        self._buckets = defaultdict(dict)
+        # object id -> (bucket, lat, lng, obj, available_at_ms)
+        self._entries = {}
+
+    def _project(self, lat, lng):
+        if self._origin is None:
+            self._origin = (lat, lng, math.cos(math.radians(lat)))
+        lat0, lng0, cos0 = self._origin
+        return (math.radians(lng - lng0) * EARTH_RADIUS_METERS * cos0, math.radians(lat - lat0) * EARTH_RADIUS_METERS)
+
+    def _bucket(self, x, y):
+        return (int(math.floor(x / self.bucket_size)), int(math.floor(y / self.bucket_size)))
+
+    def insert(self, obj_id, lat, lng, obj, available_at_ms=0):
+        # inserting a known id replaces the old version, wherever it was
+        self.remove(obj_id)
+        bucket = self._bucket(*self._project(lat, lng))
+        self._buckets[bucket][obj_id] = obj
+        self._entries[obj_id] = (bucket, lat, lng, obj, available_at_ms)
+
+    def remove(self, obj_id):
+        entry = self._entries.pop(obj_id, None)
+        if entry is not None:
+            bucket = self._buckets[entry[0]]
+            del bucket[obj_id]
+            if not bucket:
+                del self._buckets[entry[0]]
+
+    def set_available_at(self, obj_id, available_at_ms):
+        entry = self._entries.get(obj_id)
+        if entry is not None:
+            self._entries[obj_id] = entry[:4] + (available_at_ms,)
+
+    def get(self, obj_id):
+        entry = self._entries.get(obj_id)
+        return entry[3] if entry is not None else None
+
+    def radius(self, lat, lng, radius, predicate=None, now_ms=None, include_unavailable=False):
+        """ [(obj, distance)] of the objects within radius metres, nearest first """
+        if not self._entries:
+            return []
+        if now_ms is None:
+            now_ms = time() * 1000
+        x, y = self._project(lat, lng)
+        reach = radius * PROJECTION_MARGIN
+        if math.isinf(reach):
+            buckets = list(self._buckets)
+        else:
+            min_x, min_y = self._bucket(x - reach, y - reach)
+            max_x, max_y = self._bucket(x + reach, y + reach)
+            if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._buckets):
+                buckets = [b for b in self._buckets if min_x <= b[0] <= max_x and min_y <= b[1] <= max_y]
+            else:
+                buckets = [(bx, by) for bx in range(min_x, max_x + 1) for by in range(min_y, max_y + 1) if (bx, by) in self._buckets]
+
+        candidates = []
+        for bucket in buckets:
+            for obj_id in self._buckets[bucket]:
+                entry = self._entries[obj_id]
+                if not include_unavailable and entry[4] > now_ms:
+                    continue
+                if predicate is not None and not predicate(entry[3]):
+                    continue
+                candidates.append(entry)
+
+        distances = distances_in_meters((lat, lng), [e[1] for e in candidates], [e[2] for e in candidates], self.method)
+        found = [(entry[3], float(distance)) for entry, distance in zip(candidates, distances) if distance <= radius]
+        found.sort(key=lambda x: x[1])
+        return found
+
+    def nearest(self, lat, lng, k=1, max_distance=None, predicate=None, now_ms=None):
+        """ [(obj, distance)] of the k nearest objects, nearest first """
+        radius = self.bucket_size
+        while True:
+            if max_distance is not None and radius >= max_distance:
+                return self.radius(lat, lng, max_distance, predicate, now_ms)[:k]
+            found = self.radius(lat, lng, radius, predicate, now_ms)
+            # everything closer than radius is in found, so the first k are exact
+            if len(found) >= k or len(found) == len(self._entries):
+                return found[:k]
+            if (2 * radius / self.bucket_size) ** 2 > 4 * len(self._buckets) and radius > self.bucket_size:
+                # the search area outgrew the index, one last query over everything
+                return self.radius(lat, lng, float('inf'), predicate, now_ms)[:k]
+            radius *= 2
+
+    def prune(self, lat, lng, radius):
+        """ drops the objects further than radius metres away, returns how many """
+        if not self._entries:
+            return 0
+        obj_ids = list(self._entries)
+        entries = [self._entries[obj_id] for obj_id in obj_ids]
+        distances = distances_in_meters((lat, lng), [e[1] for e in entries], [e[2] for e in entries], self.method)
+        far = [obj_id for obj_id, distance in zip(obj_ids, distances) if distance > radius]
+        for obj_id in far:
+            self.remove(obj_id)
+        return len(far)
+
+    def clear(self):
+        self._origin = None
+        self._buckets.clear()
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, obj_id):
+        return obj_id in self._entries
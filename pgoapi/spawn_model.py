@@ -0,0 +1,102 @@
+from __future__ import absolute_import
+
+from time import time
+
+from pgoapi.location import DISTANCE_EQUIRECTANGULAR, distances_in_meters
+
+HOUR_MS = 3600 * 1000
+# pokemon stay at least this long, longer spawns are learned from the sightings
+DEFAULT_DURATION_MS = 15 * 60 * 1000
+# the server lists a pokemon a moment after it appeared
+APPEARANCE_DELAY_MS = 2000
+
+
+class SpawnPoint(object):
+    __slots__ = ('spawn_point_id', 'latitude', 'longitude', 'despawn_ms_of_hour', 'duration_ms', 'sightings')
+
+    def __init__(self, spawn_point_id, latitude, longitude):
+        self.spawn_point_id = spawn_point_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.despawn_ms_of_hour = None
+        self.duration_ms = DEFAULT_DURATION_MS
+        self.sightings = 0
+
+    def observe(self, despawn_ms, seen_ms):
+        self.despawn_ms_of_hour = despawn_ms % HOUR_MS
+        self.duration_ms = min(HOUR_MS, max(self.duration_ms, despawn_ms - seen_ms))
+        self.sightings += 1
+
+    def next_appearance(self, now_ms):
+        # spawn points spawn once an hour, at the same time of the hour
+        appear = (self.despawn_ms_of_hour - self.duration_ms) % HOUR_MS
+        return now_ms + (appear - now_ms) % HOUR_MS
+
+    def is_active(self, now_ms):
+        return (self.despawn_ms_of_hour - now_ms) % HOUR_MS < self.duration_ms
+
+
+class SpawnModel(object):
+    """
+    Learns when each spawn point spawns from the pokemon seen on it: the
+    time of the hour it despawns, and how long its pokemon stay. Map objects
+    only need to be requested again when a spawn point around the player is
+    about to spawn, not every few seconds.
+    """
+
+    def __init__(self):
+        self.spawn_points = {}
+
+    def observe(self, map_objects, now_ms=None):
+        """ learns from the pokemon of a GetMapObjectsResponse """
+        if now_ms is None:
+            now_ms = time() * 1000
+        for cell in map_objects.map_cells:
+            for pokemon in cell.catchable_pokemons:
+                if pokemon.expiration_timestamp_ms > 0:
+                    self.observe_pokemon(pokemon.spawn_point_id, pokemon.latitude, pokemon.longitude,
+                                         pokemon.expiration_timestamp_ms, now_ms)
+            for pokemon in cell.wild_pokemons:
+                # time_till_hidden_ms is only meaningful while positive
+                if 0 < pokemon.time_till_hidden_ms <= HOUR_MS:
+                    self.observe_pokemon(pokemon.spawn_point_id, pokemon.latitude, pokemon.longitude,
+                                         pokemon.last_modified_timestamp_ms + pokemon.time_till_hidden_ms, now_ms)
+
+    def observe_pokemon(self, spawn_point_id, latitude, longitude, despawn_ms, seen_ms):
+        if not spawn_point_id:
+            return
+        spawn_point = self.spawn_points.get(spawn_point_id)
+        if spawn_point is None:
+            spawn_point = self.spawn_points[spawn_point_id] = SpawnPoint(spawn_point_id, latitude, longitude)
+        spawn_point.observe(despawn_ms, seen_ms)
+
+    def _near(self, origin, radius):
+        spawn_points = [sp for sp in self.spawn_points.values() if sp.despawn_ms_of_hour is not None]
+        if origin is None or not spawn_points:
+            return spawn_points
+        distances = distances_in_meters(origin, [sp.latitude for sp in spawn_points], [sp.longitude for sp in spawn_points],
+                                        DISTANCE_EQUIRECTANGULAR)
+        return [sp for sp, distance in zip(spawn_points, distances) if distance <= radius]
+
+    def upcoming(self, now_ms, horizon_ms=HOUR_MS, origin=None, radius=1000):
+        """ [(spawn_point, appearance_ms)] of the spawns expected within horizon_ms, soonest first """
+        spawns = [(sp, sp.next_appearance(now_ms)) for sp in self._near(origin, radius)]
+        return sorted([s for s in spawns if s[1] - now_ms <= horizon_ms], key=lambda s: s[1])
+
+    def active(self, now_ms, origin=None, radius=1000):
+        return [sp for sp in self._near(origin, radius) if sp.is_active(now_ms)]
+
+    def next_refresh(self, now_ms, origin=None, radius=1000, min_interval_ms=5000, max_interval_ms=60000):
+        """
+        When to request the map objects around origin again: right after the
+        next expected spawn, but no sooner than min_interval_ms and no later
+        than max_interval_ms, so new spawn points are still learned.
+        """
+        refresh = now_ms + max_interval_ms
+        upcoming = self.upcoming(now_ms, max_interval_ms, origin, radius)
+        if upcoming:
+            refresh = min(refresh, upcoming[0][1] + APPEARANCE_DELAY_MS)
+        return max(refresh, now_ms + min_interval_ms)
+
+    def __len__(self):
+        return len(self.spawn_points)
@@ -0,0 +1,142 @@
+from __future__ import absolute_import
+
+import logging
+from time import time
+
+import gevent
+from gevent.pool import Group
+
+from pgoapi.pgoapi import PGoApi
+from pgoapi.proto_registry import registry
+from pgoapi.transport import Transport
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+class AccountRunner(object):
+    """
+    One account of a Supervisor: logs in, runs PGoApi.main_loop and starts a
+    fresh PGoApi at the last known position whenever it fails, without
+    affecting the other accounts of the process.
+    """
+
+    def __init__(self, config, position, transport, setup_api=None, restart_delay=30, max_restart_delay=600, api_class=PGoApi):
+        self.log = logging.getLogger(__name__)
+        self.config = config
+        self.username = config["username"]
+        self.position = position
+        self.transport = transport
+        self.setup_api = setup_api
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.api_class = api_class
+        self.api = None
+        self.restarts = 0
+        self._failures = 0
+
+    def _create_api(self):
+        api = self.api_class(self.config, transport=self.transport)
+        api.set_position(*self.position)
+        if self.setup_api:
+            self.setup_api(api, self.config)
+        return api
+
+    def run(self):
+        while True:
+            self.api = self._create_api()
+            started = time()
+            try:
+                while not self.api.login(self.config["auth_service"], self.config["username"], self.config["password"]):
+                    self.log.error('[%s] Retrying Login in %s seconds', self.username, self.restart_delay)
+                    gevent.sleep(self.restart_delay)
+                self.api.main_loop()
+            except gevent.GreenletExit:
+                raise
+            except Exception as e:
+                self.log.exception('[%s] Error in main loop %s, restarting at location: %s', self.username, e, self.api._posf)
+
+            if self.api._posf != (0, 0, 0):
+                self.position = self.api._posf
+            # back off while an account keeps failing right away, a long healthy run resets it
+            if time() - started > self.max_restart_delay:
+                self._failures = 0
+            delay = min(self.restart_delay * 2 ** self._failures, self.max_restart_delay)
+            self._failures += 1
+            self.restarts += 1
+            gevent.sleep(delay)
+
+    def status(self):
+        return {
+            'username': self.username,
+            'restarts': self.restarts,
+            'position': self.api._posf if self.api else self.position,
+            'xp_hour': getattr(self.api, 'exp_hour', 0.0),
+            'pokemon_caught': getattr(self.api, 'pokemon_caught', 0),
+        }
+
+
+class Supervisor(object):
+    """
+    Runs several accounts of config.json in one process, each PGoApi on its
+    own greenlet. The static game data, the protobuf registry and one pooled
+    Transport are shared by every account instead of being loaded per process,
+    the Transport also enforces the global request budget of all accounts.
+    Accounts are started staggered so their logins don't hit the servers at once.
+    """
+
+    def __init__(self, accounts, setup_api=None, start_delay=5, restart_delay=30, api_class=PGoApi):
+        # accounts is a list of (config, position) tuples
+        self.log = logging.getLogger(__name__)
+        self.start_delay = start_delay
+        registry.warm_up()
+        self.transport = self._create_transport([config for config, _ in accounts])
+        self.setup_api = setup_api
+        self.restart_delay = restart_delay
+        self.api_class = api_class
+        self.runners = [self._create_runner(config, position) for config, position in accounts]
+        self._group = Group()
+
+    def _create_runner(self, config, position):
+        return AccountRunner(config, position, self.transport, setup_api=self.setup_api,
+                             restart_delay=self.restart_delay, api_class=self.api_class)
+
+    @staticmethod
+    def _create_transport(configs):
+        # every account may have an RPC in flight, so keep a connection per account
+        network = dict(configs[0].get("NETWORK", {}))
+        network["POOL_MAXSIZE"] = max(network.get("POOL_MAXSIZE", Transport.DEFAULT_POOL_MAXSIZE), len(configs))
+        return Transport.from_config({"NETWORK": network, "RATE_LIMIT": configs[0].get("RATE_LIMIT", {})})
+
+    def start(self):
+        for i, runner in enumerate(self.runners):
+            self._group.add(gevent.spawn_later(i * self.start_delay, runner.run))
+
+    def add(self, config, position):
+        # accounts handed over at runtime, e.g. from a worker process that died
+        runner = self._create_runner(config, position)
+        self.runners.append(runner)
+        self._group.add(gevent.spawn(runner.run))
+        return runner
+
+    def join(self, status_interval=300):
+        while len(self._group):
+            self._group.join(timeout=status_interval)
+            self.log_status()
+
+    def stop(self):
+        self._group.kill()
+        self.transport.close()
+
+    def status(self):
+        return [runner.status() for runner in self.runners]
+
+    def log_status(self):
+        for status in self.status():
+            self.log.info('[%s] restarts: %s, position: %s', status['username'], status['restarts'], status['position'])
+        self.log.info('Transport: %s', self.transport)
+        if resource is not None:
+            # ru_maxrss is in kilobytes on linux
+            self.log.info('%s accounts, peak memory %.1f MB', len(self.runners), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
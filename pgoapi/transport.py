@@ -0,0 +1,87 @@
+from __future__ import absolute_import
+
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pgoapi.exceptions import ServerBusyOrOfflineException
+from pgoapi.rate_limiter import RateLimiter
+
+
+class Transport(object):
+    """
+    Long lived HTTP transport for the RPC endpoints.
+
+    A single keep-alive session is kept open so consecutive RPCs reuse the
+    same TCP/TLS connection instead of doing a new handshake every call.
+    One instance can be owned by a PGoApi or shared between several of them,
+    together with the global request budget (rate_limit) of every api using it.
+    """
+
+    DEFAULT_POOL_CONNECTIONS = 10
+    DEFAULT_POOL_MAXSIZE = 10
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, max_retries=0, rate_limit=None):
+        self.log = logging.getLogger(__name__)
+
+        self._adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                    pool_block=pool_block, max_retries=max_retries)
+
+        self._session = requests.session()
+        self._session.headers.update({'User-Agent': 'Niantic App'})
+        self._session.verify = True
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+        # every connection pool we've posted through, so the counters survive
+        # the pool manager evicting a pool it hasn't used lately
+        self._pools = {}
+        # TokenBucket shared by the RateLimiter of every api posting through this transport
+        self.rate_limit = rate_limit
+
+    @classmethod
+    def from_config(cls, config):
+        network = config.get("NETWORK", {})
+        return cls(pool_connections=network.get("POOL_CONNECTIONS", cls.DEFAULT_POOL_CONNECTIONS),
+                   pool_maxsize=network.get("POOL_MAXSIZE", cls.DEFAULT_POOL_MAXSIZE),
+                   pool_block=network.get("POOL_BLOCK", False),
+                   max_retries=network.get("MAX_RETRIES", 0),
+                   rate_limit=RateLimiter.shared_from_config(config))
+
+    def post(self, endpoint, data):
+        try:
+            return self._session.post(endpoint, data=data)
+        except requests.exceptions.ConnectionError:
+            raise ServerBusyOrOfflineException
+        finally:
+            self._track_pools()
+
+    def _track_pools(self):
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            self._pools[key] = pools[key]
+
+    def stats(self):
+        requests_sent = 0
+        connections_opened = 0
+        for pool in self._pools.values():
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+        return {
+            'requests': requests_sent,
+            'connections_opened': connections_opened,
+            'connections_reused': max(requests_sent - connections_opened, 0),
+        }
+
+    def close(self):
+        self._session.close()
+
+    def __str__(self):
+        stats = self.stats()
+        return "Requests: {0}, Connections opened: {1}, Connections reused: {2}".format(
+            stats['requests'], stats['connections_opened'], stats['connections_reused'])
+
+    def __repr__(self):
+        return self.__str__()
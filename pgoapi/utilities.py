@@ -27,6 +27,11 @@ Modifications by: Brad Smith <https://github.com/infinitewarp>
 
 import struct
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 
 def f2i(float):
     return struct.unpack('<Q', struct.pack('<d', float))[0]
@@ -47,3 +52,15 @@ def to_camel_case(value):
 
     c = camelcase()
     return "".join(next(c)(x) if x else '_' for x in value.split("_"))
+
+
+def json_default(obj):
+    # json.dumps fallback for lazy response views, raw bytes and plain objects
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf8')
+    if not hasattr(obj, '__dict__') and hasattr(obj, 'to_dict'):
+        # __slots__ classes like PokemonView
+        return obj.to_dict()
+    return obj.__dict__
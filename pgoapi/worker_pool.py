@@ -0,0 +1,175 @@
+from __future__ import absolute_import
+
+import logging
+import multiprocessing
+from time import time
+
+from six.moves import queue
+
+
+def _worker_main(worker_id, accounts, inbox, status_queue, setup_api, status_interval):
+    # runs in the worker process: a Supervisor for the accounts assigned to it,
+    # fed by its inbox and reporting to the shared status queue
+    import gevent
+    from pgoapi.supervisor import Supervisor
+
+    supervisor = Supervisor(accounts, setup_api=setup_api)
+    supervisor.start()
+
+    def report_status():
+        while True:
+            status_queue.put({
+                'worker': worker_id,
+                'time': time(),
+                'requests': supervisor.transport.stats()['requests'],
+                'accounts': supervisor.status(),
+            })
+            gevent.sleep(status_interval)
+    gevent.spawn(report_status)
+
+    while True:
+        try:
+            command, payload = inbox.get_nowait()
+        except queue.Empty:
+            gevent.sleep(1)
+            continue
+        if command == 'add':
+            for config, position in payload:
+                supervisor.add(config, position)
+        elif command == 'stop':
+            supervisor.stop()
+            return
+
+
+class Worker(object):
+    """ Parent side bookkeeping of one worker process. """
+
+    def __init__(self, worker_id, process, inbox, accounts):
+        self.worker_id = worker_id
+        self.process = process
+        self.inbox = inbox
+        self.accounts = accounts
+        self.account_status = []
+        self.requests = 0
+        self.requests_per_minute = 0.0
+        self.last_report = None
+
+    def update(self, report):
+        if self.last_report is not None and report['time'] > self.last_report:
+            self.requests_per_minute = (report['requests'] - self.requests) * 60.0 / (report['time'] - self.last_report)
+        self.requests = report['requests']
+        self.last_report = report['time']
+        self.account_status = report['accounts']
+
+    def status(self):
+        return {
+            'worker': self.worker_id,
+            'pid': self.process.pid,
+            'alive': self.process.is_alive(),
+            'accounts': len(self.accounts),
+            'requests': self.requests,
+            'requests_per_minute': self.requests_per_minute,
+            'xp_hour': sum(account['xp_hour'] for account in self.account_status),
+            'restarts': sum(account['restarts'] for account in self.account_status),
+        }
+
+
+class WorkerPool(object):
+    """
+    Spreads the accounts over several worker processes, roughly one per core,
+    each running a Supervisor, so response parsing isn't capped by one GIL.
+
+    The workers report their status over a shared queue; the parent aggregates
+    XP/hour, restarts and RPC throughput per worker and hands the accounts of
+    a worker that died to the least loaded workers still alive.
+    """
+
+    def __init__(self, accounts, workers=None, setup_api=None, status_interval=60):
+        # accounts is a list of (config, position) tuples
+        self.log = logging.getLogger(__name__)
+        self.accounts = accounts
+        self.worker_count = max(1, min(workers or multiprocessing.cpu_count(), len(accounts)))
+        self.setup_api = setup_api
+        self.status_interval = status_interval
+        self.workers = {}
+        self._next_worker_id = 0
+        self._status_queue = multiprocessing.Queue()
+
+    def _spawn(self, accounts):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        inbox = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_worker_main, name='pgoapi-worker-%i' % worker_id,
+                                          args=(worker_id, accounts, inbox, self._status_queue, self.setup_api, self.status_interval))
+        process.daemon = True
+        process.start()
+        self.workers[worker_id] = Worker(worker_id, process, inbox, list(accounts))
+        self.log.info('Worker %s (pid %s) started with %s accounts', worker_id, process.pid, len(accounts))
+        return self.workers[worker_id]
+
+    def start(self):
+        for i in range(self.worker_count):
+            self._spawn(self.accounts[i::self.worker_count])
+
+    def run(self):
+        last_status = time()
+        while self.workers:
+            self.collect_status(timeout=1)
+            self.rebalance()
+            if time() - last_status >= self.status_interval:
+                self.log_status()
+                last_status = time()
+
+    def collect_status(self, timeout=0):
+        try:
+            report = self._status_queue.get(timeout=timeout)
+            while True:
+                worker = self.workers.get(report['worker'])
+                if worker is not None:
+                    worker.update(report)
+                report = self._status_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def rebalance(self):
+        orphans = []
+        for worker in list(self.workers.values()):
+            if not worker.process.is_alive():
+                self.log.error('Worker %s (pid %s) died with exit code %s, moving its %s accounts',
+                               worker.worker_id, worker.process.pid, worker.process.exitcode, len(worker.accounts))
+                del self.workers[worker.worker_id]
+                orphans.extend(worker.accounts)
+        if not orphans:
+            return
+
+        if not self.workers:
+            self._spawn(orphans)
+            return
+
+        handed_over = {}
+        for account in orphans:
+            worker = min(self.workers.values(), key=lambda w: len(w.accounts))
+            worker.accounts.append(account)
+            handed_over.setdefault(worker.worker_id, []).append(account)
+        for worker_id, accounts in handed_over.items():
+            self.workers[worker_id].inbox.put(('add', accounts))
+
+    def stop(self, timeout=10):
+        for worker in self.workers.values():
+            worker.inbox.put(('stop', None))
+        for worker in self.workers.values():
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def status(self):
+        return [worker.status() for worker in sorted(self.workers.values(), key=lambda w: w.worker_id)]
+
+    def log_status(self):
+        total_xp_hour = 0.0
+        for status in self.status():
+            total_xp_hour += status['xp_hour']
+            self.log.info('Worker %s (pid %s): %s accounts, %.1f RPC/min, %.0f XP/HR, %s restarts',
+                          status['worker'], status['pid'], status['accounts'], status['requests_per_minute'],
+                          status['xp_hour'], status['restarts'])
+        self.log.info('%s workers, %.0f XP/HR in total', len(self.workers), total_xp_hour)
@@ -28,20 +28,38 @@ Modifications by: j-e-k <https://github.com/j-e-k>
 Modifications by: Brad Smith <https://github.com/infinitewarp>
 """
 
-import argparse
-import collections
-import json
-import logging
-import os
-import os.path
-import socket
-from time import sleep
-
-from geopy.geocoders import GoogleV3
-from six import PY2, iteritems
-
-from listener import Listener
-from pgoapi import PGoApi
+from gevent import monkey; monkey.patch_all()  # noqa
+
+import argparse  # noqa
+import copy  # noqa
+import json  # noqa
+import logging  # noqa
+import os  # noqa
+import os.path  # noqa
+import socket  # noqa
+from time import sleep  # noqa
+
+import gevent  # noqa
+import zerorpc  # noqa
+from geopy.geocoders import GoogleV3  # noqa
+from six import PY2, iteritems  # noqa
+
+from listener import Listener  # noqa
+from pgoapi import PGoApi  # noqa
+from pgoapi.geo_cache import GeoCache  # noqa
+from pgoapi.proto_registry import registry  # noqa
+from pgoapi.supervisor import Supervisor  # noqa
+from pgoapi.worker_pool import WorkerPool  # noqa
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -64,24 +82,31 @@ cwhite = '\033[1;37m'
 cdefault = '\033[0;39m'
 
 log = logging.getLogger(__name__)
-from threading import Thread
-from Queue import Queue
 
-def get_pos_by_name(location_name):
+def get_pos_by_name(location_name, geo_cache=None):
     geolocator = GoogleV3()
-    loc = geolocator.geocode(location_name)
+    if geo_cache is not None:
+        latitude, longitude, altitude, address = geo_cache.geocode(location_name, geolocator)
+    else:
+        loc = geolocator.geocode(location_name)
+        latitude, longitude, altitude, address = loc.latitude, loc.longitude, loc.altitude, loc.address
+
+    logger.info(cdarkyellow + 'Your given location:' + cyellow + ' %s' + cdefault, address.encode('utf-8'))
+    logger.info(cdarkyellow + 'lat/long/alt:' + cyellow + ' %s %s %s', latitude, longitude, altitude)
 
-    logger.info(cdarkyellow + 'Your given location:' + cyellow + ' %s' + cdefault, loc.address.encode('utf-8'))
-    logger.info(cdarkyellow + 'lat/long/alt:' + cyellow + ' %s %s %s', loc.latitude, loc.longitude, loc.altitude)
+    return (latitude, longitude, altitude)
 
-    return (loc.latitude, loc.longitude, loc.altitude)
+
+def config_position(config):
+    # geocoded through the on-disk cache, so restarts don't spend quota on it again
+    return get_pos_by_name(config["location"], GeoCache.from_config(config))
 
 
 def dict_merge(dct, merge_dct):
     for k, v in iteritems(merge_dct):
         if (
             k in dct and isinstance(dct[k], dict) and
-            isinstance(merge_dct[k], collections.Mapping)
+            isinstance(merge_dct[k], Mapping)
         ):
             dict_merge(dct[k], merge_dct[k])
         else:
@@ -103,19 +128,103 @@ def init_config():
     parser.add_argument("-i", "--config_index", help="Index of account in config.json", default=0, type=int)
     parser.add_argument("-l", "--location", help="Location")
     parser.add_argument("-d", "--debug", help="Debug Mode", action='store_true', default=False)
-    config = parser.parse_args()
-    defaults = load.get('defaults', {})
-    account = load['accounts'][config.__dict__['config_index']]
-    load = dict_merge(defaults, account)
+    parser.add_argument("-s", "--supervisor", help="Run every account of config.json in this process", action='store_true', default=False)
+    parser.add_argument("-w", "--workers", help="Spread every account of config.json over this many processes (0: one per core)", type=int)
+    args = parser.parse_args()
+
+    if args.supervisor or args.workers is not None:
+        indexes = range(len(load['accounts']))
+    else:
+        indexes = [args.config_index]
+
+    configs = []
+    for index in indexes:
+        config = account_config(load, index, args)
+        if not config:
+            return None
+        configs.append(config)
+    return configs
+
+
+def account_config(load, index, args):
+    # every account merges into its own copy of the defaults
+    defaults = copy.deepcopy(load.get('defaults', {}))
+    config = dict_merge(defaults, load['accounts'][index])
     # Passed in arguments shoud trump
-    for key, value in iteritems(load):
-        if key not in config.__dict__ or not config.__dict__[key]:
-            config.__dict__[key] = value
-    if config.auth_service not in ['ptc', 'google']:
-      logger.error(cred + "Invalid Auth service specified! ('ptc' or 'google')" + cdefault)
-      return None
+    for key, value in iteritems(vars(args)):
+        if value or key not in config:
+            config[key] = value
+    if config["auth_service"] not in ['ptc', 'google']:
+        logger.error(cred + "Invalid Auth service specified! ('ptc' or 'google')" + cdefault)
+        return None
+
+    return config
+
+
+def register_listener(username, sock_port):
+    desc_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".listeners")
+    # the workers of a pool start at the same time, the lock keeps them from
+    # overwriting each other's entries
+    with os.fdopen(os.open(desc_file, os.O_RDWR | os.O_CREAT, 0o644), 'r+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        data = f.read()
+        if PY2:
+            data = json.loads(data.encode() if len(data) > 0 else '{}')
+        else:
+            data = json.loads(data if len(data) > 0 else '{}')
+        data[username] = sock_port
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(data, indent=2))
+        f.flush()
+
+
+def start_listener(api, username):
+    sock_port = 0
+    s = socket.socket()
+    s.bind(("", 0))  # let the kernel find a free port
+    sock_port = s.getsockname()[1]
+    s.close()
+    register_listener(username, sock_port)
+
+    listener = Listener(api)
+    s = zerorpc.Server(listener)
+    s.bind("tcp://127.0.0.1:%i" % sock_port) # the free port should still be the same
+    gevent.spawn(s.run)
+    return listener
 
-    return config.__dict__
+
+# one listener per account, a restarted account's new api takes over its listener
+listeners = {}
+
+
+def attach_listener(api, config):
+    listener = listeners.get(config["username"])
+    if listener is None:
+        listeners[config["username"]] = start_listener(api, config["username"])
+    else:
+        listener.api = api
+
+
+def run_supervisor(configs):
+    accounts = [(config, config_position(config)) for config in configs]
+    supervisor = Supervisor(accounts, setup_api=attach_listener)
+    supervisor.start()
+    try:
+        supervisor.join()
+    finally:
+        supervisor.stop()
+
+
+def run_worker_pool(configs, workers):
+    accounts = [(config, config_position(config)) for config in configs]
+    pool = WorkerPool(accounts, workers=workers or None, setup_api=attach_listener)
+    pool.start()
+    try:
+        pool.run()
+    finally:
+        pool.stop()
 
 
 def main(position=None):
@@ -129,17 +238,26 @@ def main(position=None):
     # log level for internal pgoapi class
     logging.getLogger("rpc_api").setLevel(logging.INFO)
 
-    config = init_config()
-    if not config:
+    configs = init_config()
+    if not configs:
         return
+    config = configs[0]
 
     if config["debug"]:
         logging.getLogger("requests").setLevel(logging.DEBUG)
         logging.getLogger("pgoapi").setLevel(logging.DEBUG)
         logging.getLogger("rpc_api").setLevel(logging.DEBUG)
 
+    if config["workers"] is not None:
+        return run_worker_pool(configs, config["workers"])
+    if config["supervisor"]:
+        return run_supervisor(configs)
+
     if not position:
-        position = get_pos_by_name(config["location"])
+        position = config_position(config)
+
+    # resolve all request/response protobuf classes up front
+    registry.warm_up()
 
     # instantiate pgoapi
     api = PGoApi(config)
@@ -147,28 +265,7 @@ def main(position=None):
     # provide player position on the earth
     api.set_position(*position)
 
-    desc_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".listeners")
-    sock_port = 0
-    s = socket.socket()
-    s.bind(("", 0))  # let the kernel find a free port
-    sock_port = s.getsockname()[1]
-    s.close()
-    data = {}
-
-    if os.path.isfile(desc_file):
-        with open(desc_file, 'r+') as f:
-            data = f.read()
-            if PY2:
-                data = json.loads(data.encode() if len(data) > 0 else '{}')
-            else:
-                data = json.loads(data if len(data) > 0 else '{}')
-    data[config["username"]] = sock_port
-    with open(desc_file, "w+") as f:
-        f.write(json.dumps(data, indent=2))
-
-    s = zerorpc.Server(Listener(api))
-    s.bind("tcp://127.0.0.1:%i" % sock_port) # the free port should still be the same
-    gevent.spawn(s.run)
+    start_listener(api, config["username"])
 
     # retry login every 30 seconds if any errors
     while not api.login(config["auth_service"], config["username"], config["password"]):
@@ -0,0 +1,21 @@
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import \
+    GetMapObjectsResponse
+
+CELL_ID = 9279742050779955200  # above 2 ** 63
+NOW_MS = 1469600000000
+
+
+def map_objects(cell_id=CELL_ID, timestamp_ms=NOW_MS, status=1, forts=(), deleted=(), spawn_points=(), catchable=(), wild=()):
+    # a response with a single cell, every object is given as the fields of its message
+    response = GetMapObjectsResponse(status=status)
+    cell = response.map_cells.add(s2_cell_id=cell_id, current_timestamp_ms=timestamp_ms)
+    for fields in forts:
+        cell.forts.add(**fields)
+    cell.deleted_objects.extend(deleted)
+    for fields in spawn_points:
+        cell.spawn_points.add(**fields)
+    for fields in catchable:
+        cell.catchable_pokemons.add(**fields)
+    for fields in wild:
+        cell.wild_pokemons.add(**fields)
+    return response
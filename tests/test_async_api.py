@@ -0,0 +1,107 @@
+import threading
+import unittest
+
+import six
+from six.moves.BaseHTTPServer import HTTPServer
+
+from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
+from pgoapi.rate_limiter import RateLimiter
+from tests.test_rpc_api import mock_server_response
+from tests.test_transport import _RpcHandler
+
+aiohttp = None
+if six.PY3:
+    import asyncio
+    from pgoapi.async_api import AsyncPGoApi, AsyncRpcApi, AsyncTransport, aiohttp
+
+
+class MockAuthProvider(object):
+    def is_login(self):
+        return True
+
+    def get_name(self):
+        return 'ptc'
+
+    def get_token(self):
+        return 'token'
+
+
+class MockAsyncTransport(object):
+    def __init__(self):
+        self.posted = []
+
+    def post(self, endpoint, data):
+        self.posted.append((endpoint, data))
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(mock_server_response())
+        return future
+
+
+@unittest.skipIf(six.PY2, "asyncio is only available on Python 3")
+class TestAsyncPGoApi(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.transport = MockAsyncTransport()
+        self.api = AsyncPGoApi({'RATE_LIMIT': {'BURST': 10}}, transport=self.transport)
+        self.api._auth_provider = MockAuthProvider()
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_call_chaining(self):
+        request = self.api.fort_search(fort_id='abc').get_player()
+        self.assertEqual(request._req_method_list, [{RequestType.Value('FORT_SEARCH'): {'fort_id': 'abc'}}, RequestType.Value('GET_PLAYER')])
+        response = self.loop.run_until_complete(request.call())
+        self.assertEqual(response['responses']['FORT_SEARCH']['result'], 1)
+        self.assertEqual(response['responses']['GET_PLAYER']['player_data']['username'], 'trainer')
+        self.assertEqual(self.transport.posted[0][0], AsyncPGoApi.API_ENTRY)
+
+    def test_concurrent_chains_are_independent(self):
+        calls = [self.api.fort_search(fort_id=str(i)).get_player().call(AsyncRpcApi.RESPONSE_MODE_PROTO) for i in range(3)]
+        responses = self.loop.run_until_complete(asyncio.gather(*calls))
+        self.assertEqual([r['responses']['FORT_SEARCH'].experience_awarded for r in responses], [50, 50, 50])
+        self.assertEqual(len(self.transport.posted), 3)
+
+    def test_rate_limited(self):
+        self.api.rate_limiter = RateLimiter(rate=1000, burst=1)
+        calls = [self.api.fort_search(fort_id='abc').get_player().call() for _ in range(3)]
+        started = self.loop.time()
+        self.loop.run_until_complete(asyncio.gather(*calls))
+        # the second and third call wait for their tokens, 1 ms apart
+        self.assertGreaterEqual(self.loop.time() - started, 0.0015)
+        self.assertEqual(self.api.rate_limiter.throttled, 0)
+
+    def test_not_logged_in(self):
+        self.api._auth_provider = None
+        self.assertFalse(self.loop.run_until_complete(self.api.get_player().call()))
+        self.assertFalse(self.loop.run_until_complete(self.api.create_request().call()))
+        with self.assertRaises(AttributeError):
+            self.api.not_a_request_type()
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class TestAsyncTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _RpcHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.endpoint = 'http://127.0.0.1:%i/rpc' % self.server.server_port
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_post(self):
+        transport = AsyncTransport.from_config({'NETWORK': {'POOL_MAXSIZE': 1}})
+        responses = self.loop.run_until_complete(asyncio.gather(*[transport.post(self.endpoint, b'request') for _ in range(3)]))
+        self.loop.run_until_complete(transport.close())
+        self.assertEqual([(r.status_code, r.content) for r in responses], [(200, b'ok')] * 3)
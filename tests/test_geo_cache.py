@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+from pgoapi.exceptions import GeoCacheMiss
+from pgoapi.geo_cache import GeoCache, geocode_key, route_key
+from pgoapi.location import get_route
+
+Location = namedtuple('Location', 'latitude longitude altitude address')
+USC = (34.0205, -118.2856, 0)
+
+
+class MockGeocoder(object):
+
+    def __init__(self, fail=False):
+        self.queries = []
+        self.fail = fail
+
+    def geocode(self, query):
+        self.queries.append(query)
+        if self.fail:
+            raise IOError('offline')
+        return Location(USC[0], USC[1], USC[2], u'University of Southern California')
+
+
+def directions(distance):
+    return [{'legs': [{'distance': {'value': distance},
+                       'steps': [{'end_location': {'lat': 34.03, 'lng': -118.27}, 'distance': {'value': distance}}]}]}]
+
+
+class TestGeoCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'geo_cache.db')
+        self.cache = GeoCache(self.path, ttl=3600)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp)
+
+    def test_keys(self):
+        self.assertEqual(geocode_key('  University of Southern  California '), geocode_key('university of southern california'))
+        self.assertEqual(route_key((34.020501, -118.285601, 0), (34.03, -118.27)), route_key((34.020504, -118.285598), (34.03, -118.27)))
+        self.assertNotEqual(route_key(USC, (34.03, -118.27)), route_key(USC, (34.03, -118.27), ['via:34.0,-118.0'], True))
+
+    def test_geocode_is_cached_on_disk(self):
+        geocoder = MockGeocoder()
+        self.assertEqual(self.cache.geocode('USC', geocoder), USC + (u'University of Southern California',))
+        self.assertEqual(self.cache.geocode(' usc', geocoder)[:3], USC)
+        self.assertEqual(len(geocoder.queries), 1)
+        # a restart opens the same file
+        other = GeoCache(self.path, offline=True)
+        self.assertEqual(other.geocode('USC', MockGeocoder(fail=True))[:3], USC)
+        other.close()
+
+    def test_ttl(self):
+        geocoder = MockGeocoder()
+        self.cache.geocode('USC', geocoder)
+        self.cache.ttl = 0
+        self.cache.geocode('USC', geocoder)
+        self.assertEqual(len(geocoder.queries), 2)
+        # a failed refresh falls back to the expired entry
+        self.assertEqual(self.cache.geocode('USC', MockGeocoder(fail=True))[:3], USC)
+        self.assertEqual(self.cache.prune(), 1)
+        with self.assertRaises(IOError):
+            self.cache.geocode('USC', MockGeocoder(fail=True))
+
+    def test_offline_miss(self):
+        self.cache.offline = True
+        with self.assertRaises(GeoCacheMiss):
+            self.cache.geocode('USC', MockGeocoder())
+
+    def test_directions(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return directions(1234)
+        self.assertEqual(self.cache.directions(USC, (34.03, -118.27), fetch), directions(1234))
+        self.assertEqual(self.cache.directions(USC, (34.03, -118.27), fetch), directions(1234))
+        self.assertEqual(len(calls), 1)
+
+    def test_get_route_offline(self):
+        destination = (34.03, -118.27)
+        self.cache.offline = True
+        self.cache.store(GeoCache.ROUTE, route_key(USC, destination), directions(1234))
+        route = get_route(USC, destination, use_google=True, geo_cache=self.cache)
+        self.assertEqual(route['total_distance'], 1234)
+        # not cached: a straight line instead of a request to google
+        route = get_route(USC, (34.04, -118.27), use_google=True, geo_cache=self.cache)
+        self.assertEqual([(step['lat'], step['long']) for step in route['steps']], [(34.04, -118.27)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import json
+import unittest
+
+from pgoapi.inventory import Inventory
+from pgoapi.pgoapi import PGoApi
+from pgoapi.poke_utils import get_pokemon_by_long_id
+from pgoapi.protos.POGOProtos.Inventory import Item_pb2
+
+PERCENTAGES = [15, 15, 15, False]
+
+
+def item(item_id, count):
+    return {'modified_timestamp_ms': 1, 'inventory_item_data': {'item': {'item_id': item_id, 'count': count}}}
+
+
+def pokemon(pokemon_id, species=16, **fields):
+    fields.update(id=pokemon_id, pokemon_id=species)
+    return {'modified_timestamp_ms': 1, 'inventory_item_data': {'pokemon_data': fields}}
+
+
+def egg(egg_id, **fields):
+    fields.update(id=egg_id, is_egg=True)
+    return {'modified_timestamp_ms': 1, 'inventory_item_data': {'pokemon_data': fields}}
+
+
+def candy(family_id, count):
+    return {'modified_timestamp_ms': 1, 'inventory_item_data': {'pokemon_family': {'family_id': family_id, 'candy': count}}}
+
+
+def incubators(*incubator_list):
+    return {'modified_timestamp_ms': 1, 'inventory_item_data': {'egg_incubators': {'egg_incubator': list(incubator_list)}}}
+
+
+FULL_INVENTORY = {
+    'original_timestamp_ms': 0,
+    'new_timestamp_ms': 1000,
+    'inventory_items': [
+        item(Item_pb2.ITEM_POKE_BALL, 20),
+        item(Item_pb2.ITEM_RAZZ_BERRY, 2),
+        pokemon(11), pokemon(12, species=19),
+        egg(21, egg_km_walked_target=2.0),
+        egg(22, egg_km_walked_target=5.0, egg_incubator_id='inc1'),
+        candy(16, 30),
+        incubators({'id': 'inc1', 'item_id': 901, 'pokemon_id': 22}, {'id': 'inc2', 'item_id': 902}),
+        {'modified_timestamp_ms': 1, 'inventory_item_data': {'player_stats': {'level': 12}}},
+    ],
+}
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = Inventory(PERCENTAGES).apply_delta(FULL_INVENTORY)
+
+    def test_full_inventory(self):
+        inventory = self.inventory
+        self.assertEqual(inventory.last_timestamp, 1000)
+        self.assertEqual((inventory.poke_balls, inventory.razz_berries, inventory.great_balls), (20, 2, 0))
+        self.assertEqual(sorted(inventory.pokemon), [11, 12])
+        self.assertEqual(sorted(inventory.eggs), [21, 22])
+        self.assertEqual([e['id'] for e in inventory.eggs_available], [21])
+        self.assertEqual([i['id'] for i in inventory.incubators_busy], ['inc1'])
+        self.assertEqual([i['id'] for i in inventory.incubators_available], ['inc2'])
+        self.assertEqual(inventory.pokemon_candy, {16: 30})
+        self.assertEqual(len(inventory.inventory_items), len(FULL_INVENTORY['inventory_items']))
+
+    def test_apply_delta(self):
+        inventory = self.inventory
+        inventory.take_pokeball()
+        inventory.apply_delta({
+            'original_timestamp_ms': 1000,
+            'new_timestamp_ms': 2000,
+            'inventory_items': [
+                item(Item_pb2.ITEM_POKE_BALL, 17),
+                pokemon(13, species=16),
+                candy(16, 33),
+                {'modified_timestamp_ms': 2000, 'deleted_item_key': 12},
+                {'modified_timestamp_ms': 2000, 'deleted_item_key': 21},
+            ],
+        })
+        self.assertEqual(inventory.last_timestamp, 2000)
+        self.assertEqual(inventory.poke_balls, 17)
+        self.assertEqual(inventory.razz_berries, 2)
+        self.assertEqual(sorted(inventory.pokemon), [11, 13])
+        self.assertEqual(sorted(inventory.eggs), [22])
+        self.assertEqual(inventory.eggs_available, [])
+        self.assertEqual(inventory.pokemon_candy, {16: 33})
+        self.assertEqual(len(inventory.inventory_items), len(FULL_INVENTORY['inventory_items']) - 1)
+
+        # an empty delta changes nothing, an older one doesn't move the timestamp back
+        inventory.apply_delta({'new_timestamp_ms': 1500})
+        self.assertEqual((inventory.last_timestamp, inventory.poke_balls), (2000, 17))
+
+    def test_indexes(self):
+        inventory = self.inventory
+        self.assertEqual(sorted(inventory.pokemon_by_species), [16, 19])
+        # pidgey is family 16, rattata family 19
+        self.assertEqual(sorted(inventory.pokemon_by_family[16]), [11])
+        self.assertEqual(inventory.player_stats, {'level': 12})
+        self.assertTrue(inventory.has_berry())
+        self.assertFalse(inventory.has_lucky_egg())
+        inventory.take_berry()
+        inventory.take_berry()
+        self.assertFalse(inventory.has_berry())
+        self.assertEqual(get_pokemon_by_long_id(12, inventory).pokemon_id, 19)
+        self.assertIsNone(get_pokemon_by_long_id(21, inventory))
+
+        # pidgey 11 evolved into pidgeotto 13
+        inventory.apply_delta({'new_timestamp_ms': 2000, 'inventory_items': [
+            {'modified_timestamp_ms': 2000, 'deleted_item_key': 11}, pokemon(13, species=17)]})
+        self.assertEqual(sorted(inventory.pokemon_by_species), [17, 19])
+        self.assertEqual(sorted(inventory.pokemon_by_family[16]), [13])
+        # a pokemon changing species moves between the groups
+        inventory.apply_delta({'new_timestamp_ms': 3000, 'inventory_items': [pokemon(12, species=20)]})
+        self.assertEqual(sorted(inventory.pokemon_by_species), [17, 20])
+
+    def test_remove_pokemon(self):
+        self.inventory.remove_pokemon(11)
+        self.inventory.remove_pokemon(21)
+        self.inventory.remove_pokemon(99)
+        self.assertEqual(sorted(self.inventory.pokemon), [12])
+        self.assertEqual(sorted(self.inventory.pokemon_by_species), [19])
+        self.assertEqual(sorted(self.inventory.eggs), [22])
+
+    def test_deleted_keys_above_int64(self):
+        big_id = 2 ** 63 + 5
+        self.inventory.apply_delta({'new_timestamp_ms': 2000, 'inventory_items': [pokemon(big_id)]})
+        self.assertIn(big_id, self.inventory.pokemon)
+        # deleted_item_key is a signed int64
+        self.inventory.apply_delta({'new_timestamp_ms': 3000, 'inventory_items': [{'deleted_item_key': big_id - 2 ** 64}]})
+        self.assertNotIn(big_id, self.inventory.pokemon)
+        self.assertEqual(sorted(self.inventory.pokemon_by_species[16]), [11])
+
+    def test_taken_items_survive_updates(self):
+        inventory = Inventory(PERCENTAGES).apply_delta({'new_timestamp_ms': 1000, 'inventory_items': [
+            item(Item_pb2.ITEM_POKE_BALL, 1), item(Item_pb2.ITEM_RAZZ_BERRY, 1), pokemon(7)]})
+        self.assertEqual(inventory.take_next_ball({}), Item_pb2.ITEM_POKE_BALL)
+        inventory.take_berry()
+        inventory.remove_pokemon(7)
+        self.assertEqual((inventory.poke_balls, inventory.razz_berries), (0, 0))
+        self.assertFalse(inventory.can_attempt_catch())
+        # the server's count replaces ours
+        inventory.apply_delta({'new_timestamp_ms': 2000, 'inventory_items': [item(Item_pb2.ITEM_POKE_BALL, 5)]})
+        self.assertEqual(inventory.poke_balls, 5)
+
+    def test_released_pokemon_leave_the_inventory(self):
+        api = PGoApi({"POKEMON_CLEANUP": {"RELEASE_METHOD_CLASSIC": {"KEEP_CP_OVER": 1000, "KEEP_IV_OVER": 100}}})
+        api.inventory.apply_delta({'new_timestamp_ms': 1000, 'inventory_items': [pokemon(i, cp=10 * i) for i in range(1, 5)]})
+        released = []
+        api.release_pokemon = lambda pokemon_id: released.append(pokemon_id)
+        api.call = lambda: {'responses': {'RELEASE_POKEMON': {'result': 1}}}
+        api.cleanup_pokemon()
+        # all but the best pidgey, each once
+        api.cleanup_pokemon()
+        self.assertEqual(released, [3, 2, 1])
+        self.assertEqual(sorted(api.inventory.pokemon), [4])
+
+    def test_as_response_and_json(self):
+        response = self.inventory.as_response()
+        self.assertEqual(response['inventory_delta']['new_timestamp_ms'], 1000)
+        rebuilt = Inventory(PERCENTAGES, response['inventory_delta']['inventory_items'])
+        self.assertEqual(rebuilt.pokemon, self.inventory.pokemon)
+        state = json.loads(self.inventory.to_json())
+        self.assertEqual(state['poke_balls'], 20)
+        self.assertEqual(len(state['inventory_items']), len(FULL_INVENTORY['inventory_items']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+import itertools
+import random
+import types
+import unittest
+
+import pyproj
+
+from pgoapi.location import (DISTANCE_EQUIRECTANGULAR, DISTANCE_GEOD,
+                             DISTANCE_HAVERSINE, DISTANCE_METHODS,
+                             NeighborTracker, _coverings, distance_in_meters,
+                             distance_matrix, distances_in_meters,
+                             filtered_forts, get_increments, get_neighbors,
+                             get_route, interpolate_path, plan_route,
+                             route_distance)
+
+USC = (34.0205, -118.2856, 0)
+g = pyproj.Geod(ellps='WGS84')
+
+
+class TestNeighbors(unittest.TestCase):
+
+    def setUp(self):
+        _coverings.clear()
+
+    def test_covering_is_cached(self):
+        cells = get_neighbors(USC)
+        self.assertEqual(len(_coverings), 1)
+        # a few metres away, still inside the same key cell
+        self.assertEqual(get_neighbors((USC[0] + 0.00001, USC[1] + 0.00001, 0)), cells)
+        self.assertEqual(len(_coverings), 1)
+        self.assertEqual(get_neighbors(USC, level=14), get_neighbors(USC, level=14, key_level=None))
+        self.assertEqual(len(_coverings), 2)
+
+    def test_close_to_exact_covering(self):
+        cells = set(get_neighbors(USC))
+        exact = set(get_neighbors(USC, key_level=None))
+        self.assertLessEqual(len(cells ^ exact), 2)
+        self.assertGreater(len(cells), 20)
+
+    def test_returns_a_copy(self):
+        get_neighbors(USC).append(1)
+        self.assertNotIn(1, get_neighbors(USC))
+
+    def test_tracker_reports_added_and_removed_cells(self):
+        tracker = NeighborTracker()
+        cells, added, removed = tracker.update(USC)
+        self.assertEqual((added, removed), (cells, []))
+        self.assertEqual(tracker.update(USC), (cells, [], []))
+        moved, added, removed = tracker.update((USC[0] + 0.005, USC[1], 0))
+        self.assertTrue(added and removed)
+        self.assertEqual(set(moved), (set(cells) - set(removed)) | set(added))
+
+
+def random_forts(count, seed=42):
+    rnd = random.Random(seed)
+    forts = []
+    for i in range(count):
+        fort = {'id': 'fort-%i' % i, 'latitude': USC[0] + rnd.uniform(-0.05, 0.05), 'longitude': USC[1] + rnd.uniform(-0.05, 0.05)}
+        if i % 4:
+            fort.update({'type': 1, 'enabled': True})
+        if i % 7 == 0:
+            fort['cooldown_complete_timestamp_ms'] = 4102444800000
+        forts.append(fort)
+    return forts
+
+
+class TestBatchDistances(unittest.TestCase):
+
+    def test_matches_vincenty(self):
+        forts = random_forts(50)
+        lats = [f['latitude'] for f in forts]
+        lngs = [f['longitude'] for f in forts]
+        expected = [distance_in_meters(USC, (lat, lng)) for lat, lng in zip(lats, lngs)]
+        for distance, vincenty in zip(distances_in_meters(USC, lats, lngs), expected):
+            self.assertAlmostEqual(distance, vincenty, places=3)
+        for distance, vincenty in zip(distances_in_meters(USC, lats, lngs, DISTANCE_HAVERSINE), expected):
+            self.assertLess(abs(distance - vincenty), vincenty * 0.005)
+        self.assertEqual(len(distances_in_meters(USC, [], [])), 0)
+        with self.assertRaises(ValueError):
+            distances_in_meters(USC, lats, lngs, 'manhattan')
+
+    def test_filtered_forts(self):
+        forts = random_forts(200)
+        origin = (USC[0] + 0.01, USC[1], 0)
+        visited = {'fort-1': True}
+        result = filtered_forts(USC, origin, forts, 3000, visited)
+        expected = sorted([(f, distance_in_meters(origin, (f['latitude'], f['longitude']))) for f in forts
+                           if f.get('type') == 1 and 'cooldown_complete_timestamp_ms' not in f and f['id'] not in visited and
+                           distance_in_meters(USC, (f['latitude'], f['longitude'])) < 3000], key=lambda x: x[1])
+        self.assertEqual([f['id'] for f, _ in result], [f['id'] for f, _ in expected])
+        for (_, distance), (_, vincenty) in zip(result, expected):
+            self.assertAlmostEqual(distance, vincenty, places=3)
+        self.assertEqual(len(filtered_forts(USC, origin, forts, 0)), len([f for f in forts if f.get('type') == 1 and 'cooldown_complete_timestamp_ms' not in f]))
+        self.assertEqual(filtered_forts(USC, origin, [], 3000), [])
+
+
+class TestDistanceMethods(unittest.TestCase):
+    # largest error against vincenty, as documented in pgoapi.location: (distance, geod, haversine, equirectangular)
+    ERROR_BOUNDS = [
+        (10, 1e-4, 0.0056 * 10, 1e-4),
+        (100, 1e-4, 0.0056 * 100, 1e-4),
+        (1000, 1e-4, 0.0056 * 1000, 1e-4),
+        (10000, 1e-4, 0.0056 * 10000, 0.04),
+        (100000, 1e-4, 0.0056 * 100000, 38),
+    ]
+
+    def pairs(self, distance, count=200, seed=11):
+        # random start points up to 80 degrees latitude, with the destination distance metres away in any direction
+        rnd = random.Random(seed)
+        starts = [(rnd.uniform(-80, 80), rnd.uniform(-180, 180)) for _ in range(count)]
+        ends = []
+        for lat, lng in starts:
+            lng2, lat2, _ = g.fwd(lng, lat, rnd.uniform(0, 360), distance)
+            ends.append((lat2, lng2))
+        return starts, ends
+
+    def test_error_bounds(self):
+        for distance, geod_bound, haversine_bound, equirectangular_bound in self.ERROR_BOUNDS:
+            starts, ends = self.pairs(distance)
+            for start, end in zip(starts, ends):
+                vincenty = distance_in_meters(start, end)
+                self.assertAlmostEqual(vincenty, distance, delta=1e-3)
+                self.assertLess(abs(distance_in_meters(start, end, DISTANCE_GEOD) - vincenty), geod_bound)
+                self.assertLess(abs(distance_in_meters(start, end, DISTANCE_HAVERSINE) - vincenty), haversine_bound)
+                self.assertLess(abs(distance_in_meters(start, end, DISTANCE_EQUIRECTANGULAR) - vincenty), equirectangular_bound)
+
+    def test_batch_matches_scalar(self):
+        starts, ends = self.pairs(500)
+        lats, lngs = [e[0] for e in ends], [e[1] for e in ends]
+        for method in DISTANCE_METHODS:
+            distances = distances_in_meters(starts[0], lats, lngs, method)
+            for end, distance in zip(ends, distances):
+                self.assertAlmostEqual(distance, distance_in_meters(starts[0], end, method), places=6)
+
+    def test_antimeridian(self):
+        for method in DISTANCE_METHODS:
+            self.assertAlmostEqual(distance_in_meters((0, 179.9999), (0, -179.9999), method), 22.26, places=1)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            distance_in_meters(USC, USC, 'manhattan')
+
+
+class TestRoutePlanner(unittest.TestCase):
+
+    def stops(self, count, seed=3):
+        return [(f['latitude'], f['longitude']) for f in random_forts(count, seed)]
+
+    def test_distance_matrix(self):
+        stops = self.stops(10)
+        lats, lngs = [s[0] for s in stops], [s[1] for s in stops]
+        for method in DISTANCE_METHODS:
+            matrix = distance_matrix(lats, lngs, method)
+            for i, stop in enumerate(stops):
+                for distance, expected in zip(matrix[i], distances_in_meters(stop, lats, lngs, method)):
+                    self.assertAlmostEqual(distance, expected, places=3)
+        self.assertEqual(distance_matrix([], [], DISTANCE_GEOD).shape, (0, 0))
+
+    def test_route_distance(self):
+        stops = self.stops(5)
+        expected = sum(distance_in_meters(a, b) for a, b in zip([USC] + stops, stops + [USC]))
+        self.assertAlmostEqual(route_distance(USC, stops, USC, DISTANCE_GEOD), expected, places=3)
+        self.assertLess(abs(route_distance(USC, stops, USC) - expected), expected * 0.005)
+        self.assertEqual(route_distance(USC, []), 0.0)
+
+    def test_optimal_for_few_stops(self):
+        for seed in range(5):
+            stops = self.stops(7, seed)
+            for end in (None, USC):
+                order = plan_route(USC, stops, end)
+                self.assertEqual(sorted(order), list(range(7)))
+                best = min(route_distance(USC, [stops[i] for i in p], end) for p in itertools.permutations(range(7)))
+                # 2-opt isn't exact, but on a handful of stops it should be close
+                self.assertLess(route_distance(USC, [stops[i] for i in order], end), best * 1.05)
+
+    def test_shorter_than_distance_order(self):
+        stops = self.stops(200)
+        order = plan_route(USC, stops)
+        self.assertEqual(sorted(order), list(range(200)))
+        by_distance = sorted(stops, key=lambda s: distance_in_meters(USC, s))
+        self.assertLess(route_distance(USC, [stops[i] for i in order]), route_distance(USC, by_distance) / 2)
+
+    def test_trivial(self):
+        self.assertEqual(plan_route(USC, []), [])
+        self.assertEqual(plan_route(USC, [(USC[0], USC[1])]), [0])
+
+
+class TestInterpolatePath(unittest.TestCase):
+
+    def test_points_and_distances(self):
+        waypoints = [(34.0300, -118.2700), (34.0310, -118.2700), (34.0310, -118.2700)]
+        previous = USC
+        points = list(interpolate_path(USC, waypoints, step_size=50))
+        for point, distance in points:
+            self.assertAlmostEqual(distance, distance_in_meters(previous, point), places=3)
+            self.assertLessEqual(distance, 50)
+            previous = point
+        walked = [point for point, _ in points]
+        for waypoint in waypoints:
+            self.assertIn(waypoint + (0,), walked)
+        total = sum(distance for _, distance in points)
+        self.assertAlmostEqual(total, route_distance(USC, waypoints, method=DISTANCE_GEOD), places=3)
+
+    def test_lazy(self):
+        path = interpolate_path(USC, [(USC[0] + 10, USC[1])], step_size=1, chunk_size=10)
+        self.assertIsInstance(path, types.GeneratorType)
+        first = [point for point, _ in itertools.islice(path, 25)]
+        self.assertEqual(len(first), 25)
+        self.assertAlmostEqual(distance_in_meters(USC, first[-1]), 25, places=3)
+
+    def test_same_path_as_get_increments(self):
+        end = (34.0300, -118.2700)
+        increments = get_increments(USC, end, 200)
+        points = [point for point, _ in interpolate_path(USC, [end], 200)]
+        self.assertEqual(points[-1], increments[-1])
+        # both lie on the same geodesic
+        total = distance_in_meters(USC, end)
+        for point in points + increments:
+            self.assertAlmostEqual(distance_in_meters(USC, point) + distance_in_meters(point, end), total, places=3)
+
+    def test_get_route_without_google(self):
+        end = (34.0300, -118.2700)
+        route = get_route(USC, end)
+        self.assertAlmostEqual(route['total_distance'], distance_in_meters(USC, end), places=3)
+        self.assertEqual([(step['lat'], step['long']) for step in route['steps']], [end])
@@ -0,0 +1,174 @@
+import unittest
+from time import time
+
+from pgoapi.location import get_neighbors
+from pgoapi.map_cache import MapCellCache
+from pgoapi.pgoapi import PGoApi
+from pgoapi.protobuf_to_dict import protobuf_to_dict
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import \
+    GetMapObjectsResponse
+from pgoapi.spawn_model import DEFAULT_DURATION_MS
+from tests.map_objects import CELL_ID, NOW_MS, map_objects
+
+class TestMapCellCache(unittest.TestCase):
+
+    def test_since_timestamps(self):
+        cache = MapCellCache()
+        self.assertEqual(cache.since_timestamps([CELL_ID, 1]), [0, 0])
+        cache.update(map_objects(), now_ms=NOW_MS)
+        self.assertEqual(cache.since_timestamps([CELL_ID, 1]), [NOW_MS, 0])
+        cache.update(map_objects(timestamp_ms=NOW_MS + 5000, status=2), now_ms=NOW_MS)
+        self.assertEqual(cache.since_timestamps([CELL_ID]), [NOW_MS])
+
+    def test_full_response_matches_protobuf_to_dict(self):
+        cache = MapCellCache()
+        response = map_objects(forts=[dict(id='fort-1', type=1)], catchable=[dict(encounter_id=1, pokemon_id=16, expiration_timestamp_ms=NOW_MS + 60000)])
+        cache.update(response, now_ms=NOW_MS)
+        self.assertEqual(cache.map_cells([CELL_ID]), protobuf_to_dict(response)['map_cells'])
+
+    def test_merges_deltas(self):
+        cache = MapCellCache()
+        cache.update(map_objects(forts=[dict(id='fort-1', type=1), dict(id='fort-2', type=1)],
+                                 catchable=[dict(encounter_id=1, pokemon_id=16, expiration_timestamp_ms=NOW_MS + 60000)]), now_ms=NOW_MS)
+        # fort-1 went on cooldown, fort-2 was removed and a new pokemon spawned
+        cache.update(map_objects(timestamp_ms=NOW_MS + 5000, forts=[dict(id='fort-1', type=1, cooldown_complete_timestamp_ms=NOW_MS + 300000)], deleted=['fort-2'],
+                                 catchable=[dict(encounter_id=2, pokemon_id=16, expiration_timestamp_ms=NOW_MS + 90000)]), now_ms=NOW_MS + 5000)
+        cell = cache.map_cells([CELL_ID])[0]
+        self.assertEqual(cell['current_timestamp_ms'], NOW_MS + 5000)
+        self.assertEqual([(f['id'], f['cooldown_complete_timestamp_ms']) for f in cell['forts']], [('fort-1', NOW_MS + 300000)])
+        self.assertEqual(sorted(p['encounter_id'] for p in cell['catchable_pokemons']), [1, 2])
+
+    def test_prunes_expired_pokemon(self):
+        cache = MapCellCache()
+        cache.update(map_objects(catchable=[dict(encounter_id=1, pokemon_id=16, expiration_timestamp_ms=NOW_MS + 60000),
+                                             dict(encounter_id=2, pokemon_id=16, expiration_timestamp_ms=NOW_MS + 120000)]), now_ms=NOW_MS)
+        cache.prune(NOW_MS + 90000)
+        self.assertEqual([p['encounter_id'] for p in cache.map_cells([CELL_ID])[0]['catchable_pokemons']], [2])
+        cache.prune(NOW_MS + 180000)
+        self.assertNotIn('catchable_pokemons', cache.map_cells([CELL_ID])[0])
+
+    def test_prunes_pokemon_of_unknown_lifetime(self):
+        cache = MapCellCache()
+        cache.update(map_objects(catchable=[dict(encounter_id=1, pokemon_id=16)],
+                                 wild=[dict(encounter_id=2, last_modified_timestamp_ms=NOW_MS, time_till_hidden_ms=-1),
+                                       dict(encounter_id=3, last_modified_timestamp_ms=NOW_MS)]), now_ms=NOW_MS)
+        # pokemon 3 is sent again in a later delta, which restarts its fallback lifetime
+        cache.update(map_objects(timestamp_ms=NOW_MS + 600000, wild=[dict(encounter_id=3, last_modified_timestamp_ms=NOW_MS)]), now_ms=NOW_MS + 600000)
+        cell = cache.get(CELL_ID)
+        self.assertEqual((len(cell.catchable_pokemons), len(cell.wild_pokemons)), (1, 2))
+        cache.prune(NOW_MS + DEFAULT_DURATION_MS + 1)
+        self.assertEqual((list(cell.catchable_pokemons), list(cell.wild_pokemons)), ([], [3]))
+        cache.prune(NOW_MS + 600000 + DEFAULT_DURATION_MS + 1)
+        self.assertEqual((cell.wild_pokemons, cell.pokemon_seen_ms), ({}, {}))
+
+    def test_evicts_least_recently_used_cells(self):
+        cache = MapCellCache(max_cells=1)
+        cache.update(map_objects(), now_ms=NOW_MS)
+        cache.update(map_objects(cell_id=CELL_ID + 1), now_ms=NOW_MS)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get(CELL_ID))
+
+
+USC = (34.0205, -118.2856, 0)
+
+
+class FakeMapRequest(object):
+    def __init__(self, requests, kwargs, catchable=()):
+        self.requests = requests
+        self.kwargs = kwargs
+        self.catchable = catchable
+
+    def call(self, mode):
+        self.requests.append(self.kwargs['cell_id'])
+        response = GetMapObjectsResponse()
+        response.status = 1
+        for cell_id in self.kwargs['cell_id']:
+            response.map_cells.add(s2_cell_id=cell_id, current_timestamp_ms=NOW_MS)
+        for pokemon in self.catchable:
+            response.map_cells[0].catchable_pokemons.add(**pokemon)
+        return {'responses': {'GET_MAP_OBJECTS': response}}
+
+
+class TestNearbyMapObjects(unittest.TestCase):
+
+    def setUp(self):
+        self.api = PGoApi({})
+        self.requests = []
+        self.api.get_map_objects = lambda **kwargs: FakeMapRequest(self.requests, kwargs)
+
+    def nearby(self, position):
+        self.api.set_position(*position)
+        self.api._last_got_map_objects = 0
+        return self.api.nearby_map_objects()
+
+    def test_requests_when_walking_into_new_cells(self):
+        cells = get_neighbors(USC)
+        self.nearby(USC)
+        self.assertEqual(self.requests, [cells])
+        # same cells, the next refresh isn't due yet
+        self.nearby(USC)
+        self.assertEqual(len(self.requests), 1)
+
+        moved = (USC[0] + 0.005, USC[1], 0)
+        self.nearby(moved)
+        self.assertEqual(self.requests[-1], get_neighbors(moved))
+        left = set(cells) - set(get_neighbors(moved))
+        self.assertTrue(left)
+        self.assertEqual([self.api.map_cache.get(cell_id) for cell_id in left], [None] * len(left))
+        self.assertEqual(len(self.api.map_cache), len(get_neighbors(moved)))
+
+    def test_drops_expired_pokemon_between_requests(self):
+        cell_id = get_neighbors(USC)[0]
+        self.api.get_map_objects = lambda **kwargs: FakeMapRequest(self.requests, kwargs, catchable=[
+            dict(encounter_id=1, pokemon_id=16, expiration_timestamp_ms=int(time() * 1000) + 60000)])
+        map_cells = self.nearby(USC)['responses']['GET_MAP_OBJECTS']['map_cells']
+        self.assertEqual([p['encounter_id'] for c in map_cells for p in c.get('catchable_pokemons', [])], [1])
+        # the pokemon expires before the next request is due
+        self.api.map_cache.get(cell_id).catchable_pokemons[1].expiration_timestamp_ms = NOW_MS
+        map_cells = self.nearby(USC)['responses']['GET_MAP_OBJECTS']['map_cells']
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual([p['encounter_id'] for c in map_cells for p in c.get('catchable_pokemons', [])], [])
+
+
+class FakeEncounterRequest(object):
+    def __init__(self, status):
+        self.status = status
+
+    def call(self):
+        return {'responses': {'ENCOUNTER': {'status': self.status}}}
+
+
+class TestCatchNearPokemon(unittest.TestCase):
+
+    def setUp(self):
+        self.api = PGoApi({})
+        self.api.set_position(*USC)
+        self.api.pokemon_names = {'16': 'Pidgey'}
+        self.catchable = []
+        self.api.get_map_objects = lambda **kwargs: FakeMapRequest([], kwargs, catchable=self.catchable)
+
+    def catch(self):
+        encountered = []
+        self.api.encounter_pokemon = lambda pokemon: encountered.append(pokemon['encounter_id']) or False
+        # force a request
+        self.api._last_got_map_objects = 0
+        self.api._next_map_objects_ms = 0
+        self.api.catch_near_pokemon()
+        return encountered
+
+    def test_offers_listed_pokemon_in_range(self):
+        expiration = int(time() * 1000) + 600000
+        self.catchable = [dict(encounter_id=1, pokemon_id=16, latitude=USC[0], longitude=USC[1], expiration_timestamp_ms=expiration),
+                          dict(encounter_id=2, pokemon_id=16, latitude=USC[0] + 0.002, longitude=USC[1], expiration_timestamp_ms=expiration)]
+        self.assertEqual(self.catch(), [1])
+        # still cached until it expires, but the server stopped listing it
+        self.catchable = []
+        self.assertEqual(self.catch(), [])
+
+    def test_remembers_final_encounter_statuses(self):
+        self.api.inventory.apply_delta({'new_timestamp_ms': 1000, 'inventory_items': [
+            {'inventory_item_data': {'item': {'item_id': 1, 'count': 10}}}]})
+        for encounter_id, status in enumerate([0, 2, 5, 6], 1):
+            self.api.encounter = lambda **kwargs: FakeEncounterRequest(status)
+            self.assertFalse(self.api.encounter_pokemon({'encounter_id': encounter_id, 'spawn_point_id': 'a', 'pokemon_id': 16}))
+        self.assertEqual(sorted(self.api.encountered_pokemons), [2, 3, 4])
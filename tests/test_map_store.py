@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pgoapi.map_store import CATCHABLE, WILD, MapStore
+from pgoapi.spawn_model import DEFAULT_DURATION_MS
+from tests.map_objects import CELL_ID, NOW_MS, map_objects
+
+OTHER_CELL_ID = 9279742052927438848
+ENCOUNTER_ID = 17562209016521355917
+FORT = dict(type=1, latitude=34.0205, longitude=-118.2856)
+
+
+def sighting(encounter_id, pokemon_id, spawn_point_id, expiration):
+    # a pokemon close enough to catch is listed as catchable and as wild
+    return dict(catchable=[dict(encounter_id=encounter_id, pokemon_id=pokemon_id, spawn_point_id=spawn_point_id, expiration_timestamp_ms=expiration)],
+                wild=[dict(encounter_id=encounter_id, pokemon_data=dict(pokemon_id=pokemon_id), spawn_point_id=spawn_point_id)])
+
+
+class TestMapStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = MapStore(os.path.join(self.tmp, 'map_store.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp)
+
+    def test_failed_responses_are_not_recorded(self):
+        self.assertFalse(self.store.record(map_objects(status=2), NOW_MS))
+        self.assertEqual(self.store.coverage(), {})
+
+    def test_snapshot(self):
+        self.store.record(map_objects(forts=[dict(FORT, id='a'), dict(FORT, id='b')], spawn_points=[dict(latitude=34.02, longitude=-118.28)],
+                                      **sighting(ENCOUNTER_ID, 16, '80c2c', NOW_MS + 60000)), NOW_MS)
+        self.store.record(map_objects(forts=[dict(FORT, id='a', cooldown_complete_timestamp_ms=NOW_MS + 300000)], deleted=['b']), NOW_MS + 10000)
+
+        before = self.store.snapshot(NOW_MS + 5000)
+        self.assertEqual([(f['fort_id'], f['cooldown_complete_ms']) for f in before['forts']], [('a', 0), ('b', 0)])
+        self.assertEqual(sorted((p['kind'], p['encounter_id'], p['cell_id']) for p in before['pokemon']),
+                         [(CATCHABLE, ENCOUNTER_ID, CELL_ID), (WILD, ENCOUNTER_ID, CELL_ID)])
+        self.assertEqual(len(before['spawn_points']), 1)
+
+        after = self.store.snapshot(NOW_MS + 20000)
+        self.assertEqual([(f['fort_id'], f['cooldown_complete_ms']) for f in after['forts']], [('a', NOW_MS + 300000)])
+        # the delta at NOW_MS + 10000 didn't repeat the unchanged pokemon, they are alive until they expire
+        self.assertEqual(sorted(p['kind'] for p in after['pokemon']), [CATCHABLE, WILD])
+        self.assertEqual([p['kind'] for p in self.store.snapshot(NOW_MS + 60001)['pokemon']], [WILD])
+        # the wild pokemon has no time_till_hidden_ms
+        self.assertEqual(self.store.snapshot(NOW_MS + DEFAULT_DURATION_MS + 1)['pokemon'], [])
+        self.assertEqual(self.store.snapshot(NOW_MS - 1), {'forts': [], 'spawn_points': [], 'pokemon': []})
+        self.assertEqual(self.store.snapshot(NOW_MS + 5000, cell_ids=[OTHER_CELL_ID])['forts'], [])
+
+    def test_snapshot_of_deltas(self):
+        self.store.record(map_objects(**sighting(ENCOUNTER_ID, 16, '80c2c', 10000000)), 1000)
+        self.assertEqual(len(self.store.snapshot(1500)['pokemon']), 2)
+        # an empty delta: nothing changed in the cell
+        self.store.record(map_objects(), 2000)
+        self.assertEqual(sorted(p['kind'] for p in self.store.snapshot(2500)['pokemon']), [CATCHABLE, WILD])
+        # a later sighting replaces the earlier one
+        self.store.record(map_objects(**sighting(ENCOUNTER_ID, 16, '80c2c', 3000)), 2600)
+        self.assertEqual([p['expires_ms'] for p in self.store.snapshot(2700)['pokemon'] if p['kind'] == CATCHABLE], [3000])
+        self.assertEqual([p['kind'] for p in self.store.snapshot(3500)['pokemon']], [WILD])
+
+    def test_spawn_history(self):
+        for i in range(3):
+            self.store.record(map_objects(**sighting(ENCOUNTER_ID + i, 16 + i, '80c2c', NOW_MS + i * 3600000 + 900000)), NOW_MS + i * 3600000)
+            self.store.record(map_objects(**sighting(ENCOUNTER_ID + i, 16 + i, '80c2c', NOW_MS + i * 3600000 + 900000)), NOW_MS + i * 3600000 + 5000)
+        history = self.store.spawn_history(spawn_point_id='80c2c', kinds=(CATCHABLE,))
+        self.assertEqual([(h['pokemon_id'], h['first_seen_ms'], h['last_seen_ms']) for h in history],
+                         [(16 + i, NOW_MS + i * 3600000, NOW_MS + i * 3600000 + 5000) for i in range(3)])
+        self.assertEqual(len(self.store.spawn_history(pokemon_id=17)), 2)
+        self.assertEqual(self.store.spawn_history(spawn_point_id='other'), [])
+        self.assertEqual(len(self.store.spawn_history(until_ms=NOW_MS + 1, kinds=(CATCHABLE,))), 1)
+
+    def test_coverage(self):
+        self.store.record(map_objects(), NOW_MS)
+        self.store.record(map_objects(), NOW_MS + 5000)
+        self.store.record(map_objects(cell_id=OTHER_CELL_ID), NOW_MS + 5000)
+        self.assertEqual(self.store.coverage(), {
+            CELL_ID: {'observations': 2, 'first_seen_ms': NOW_MS, 'last_seen_ms': NOW_MS + 5000},
+            OTHER_CELL_ID: {'observations': 1, 'first_seen_ms': NOW_MS + 5000, 'last_seen_ms': NOW_MS + 5000},
+        })
+        self.assertEqual(list(self.store.coverage(since_ms=NOW_MS + 1, cell_ids=[CELL_ID])), [CELL_ID])
+
+
+if __name__ == '__main__':
+    unittest.main()
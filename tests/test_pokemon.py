@@ -0,0 +1,229 @@
+import json
+import random
+import unittest
+from collections import OrderedDict
+
+from pgoapi.pgoapi import PGoApi
+from pgoapi.pokemon import (CPM_BY_LEVEL, Pokemon, PokemonCollection,
+                            species_constants)
+from pgoapi.utilities import json_default
+
+SCORE_METHODS = ("CP", "IV", "CP*IV", "CP+IV", "FANCY")
+COMPARED_FIELDS = ('id', 'pokemon_id', 'cp', 'individual_attack', 'individual_defense', 'individual_stamina', 'cp_multiplier',
+                   'is_favorite', 'nickname', 'pokemon_type', 'family_id', 'iv', 'level_wild', 'level', 'max_cp',
+                   'max_cp_absolute', 'iv_normalized', 'score')
+
+
+def random_bag(count=250, seed=42):
+    rnd = random.Random(seed)
+    bag = []
+    for i in range(count):
+        pokemon_data = {
+            'id': 10000000000000000000 + i,
+            'pokemon_id': rnd.randint(1, 151),
+            'cp': rnd.randint(10, 2000),
+            'individual_attack': rnd.randint(0, 15),
+            'individual_defense': rnd.randint(0, 15),
+            'individual_stamina': rnd.randint(0, 15),
+            'cp_multiplier': rnd.uniform(0.094, 0.79),
+        }
+        if rnd.random() < 0.2:
+            pokemon_data['additional_cp_multiplier'] = rnd.uniform(0.0, 0.05)
+        if rnd.random() < 0.1:
+            pokemon_data['favorite'] = 1
+        if rnd.random() < 0.1:
+            pokemon_data['nickname'] = u'Sp\xe4rky'
+        bag.append(pokemon_data)
+    # eggs, unknown species and missing ivs
+    bag.append({'id': 1, 'is_egg': True, 'egg_km_walked_target': 5.0})
+    bag.append({'id': 2, 'pokemon_id': 200, 'cp': 10, 'cp_multiplier': 0.5})
+    bag.append({'id': 3, 'pokemon_id': 16})
+    return bag
+
+
+def calculated_level_by_cpm(cpm_total):
+    # Pokemon.get_level_by_cpm before the CPM table
+    prev_max_level = 0
+    prev_max_level_cpm = 0
+    for cpm_increment in Pokemon.CPM_calculation_increments:
+        max_level = cpm_increment['max_level']
+        max_level_cpm = cpm_increment.get('max_level_cpm') or Pokemon.calculate_cpm_by_level(max_level)
+        if cpm_total <= max_level_cpm:
+            return round(prev_max_level + (pow(cpm_total, 2) - pow(prev_max_level_cpm, 2)) / cpm_increment['cpm_sqrt_increase_per_level'], 1)
+        prev_max_level = max_level
+        prev_max_level_cpm = max_level_cpm
+    return 0.0
+
+
+class TestCpmTable(unittest.TestCase):
+
+    def test_cpm_by_level(self):
+        self.assertEqual(sorted(CPM_BY_LEVEL), [level / 2.0 for level in range(2, 81)])
+        for level in range(0, 170):
+            self.assertEqual(Pokemon.get_cpm_by_level(level / 4.0), Pokemon.calculate_cpm_by_level(level / 4.0))
+        self.assertEqual(Pokemon.get_cpm_by_level(41), 0.0)
+
+    def test_level_by_cpm(self):
+        for level, cpm in CPM_BY_LEVEL.items():
+            self.assertEqual(Pokemon.get_level_by_cpm(cpm), level)
+        rnd = random.Random(3)
+        for cpm in [rnd.uniform(0, 0.85) for _ in range(5000)] + [0, 0.094, CPM_BY_LEVEL[40], 1.0, float('nan')]:
+            self.assertEqual(repr(Pokemon.get_level_by_cpm(cpm)), repr(calculated_level_by_cpm(cpm)))
+
+    def test_species_constants(self):
+        pidgey = species_constants(16)
+        self.assertIs(species_constants(16), pidgey)
+        self.assertEqual((pidgey.family_id, pidgey.sqrt_defense(4), pidgey.sqrt_stamina(16)), ('0016', (pidgey.defense + 4) ** 0.5, (pidgey.stamina + 16) ** 0.5))
+        self.assertLess(pidgey.worst_iv_cp, pidgey.perfect_iv_cp)
+        self.assertEqual(species_constants(1000).family_id, None)
+
+
+class TestPokemonCollection(unittest.TestCase):
+
+    def test_matches_pokemon(self):
+        bag = random_bag()
+        for score_method in SCORE_METHODS:
+            settings = {"WEIGHT_IV": 0.3, "WEIGHT_LVL": 0.7}
+            pokemons = PokemonCollection(bag, 22, score_method, settings)
+            expected = [Pokemon(p, 22, score_method, settings) for p in bag if not p.get('is_egg')]
+            self.assertEqual(len(pokemons), len(expected))
+            for view, pokemon in zip(pokemons, expected):
+                for field in COMPARED_FIELDS:
+                    self.assertEqual(getattr(view, field), getattr(pokemon, field), (score_method, field))
+                    self.assertEqual(type(getattr(view, field)), type(getattr(pokemon, field)), (score_method, field))
+                self.assertEqual(str(view), str(pokemon))
+
+    def test_views(self):
+        pokemons = PokemonCollection(random_bag(10))
+        groups = pokemons.by_species()
+        self.assertEqual(sum(len(group) for group in groups.values()), len(pokemons))
+        for pokemon_id, group in groups.items():
+            self.assertTrue(all(view.pokemon_id == pokemon_id for view in group))
+        self.assertEqual(pokemons[-1].id, pokemons[len(pokemons) - 1].id)
+        self.assertRaises(IndexError, lambda: pokemons[len(pokemons)])
+
+        view = pokemons[0]
+        self.assertFalse(hasattr(view, '__dict__'))
+        self.assertFalse(view.try_keep)
+        view.try_keep = True
+        self.assertTrue(pokemons[0].try_keep)
+        self.assertFalse(pokemons[1].try_keep)
+        self.assertEqual(json.loads(json.dumps([view], default=json_default))[0]['id'], view.id)
+
+
+def tied_bag(count=300, seed=7):
+    # few species and coarse stats, so the sorts have lots of ties
+    rnd = random.Random(seed)
+    return [{'id': 5000 + i, 'pokemon_id': rnd.choice((16, 19, 41, 129, 133)), 'cp': rnd.choice((10, 100, 250, 600, 900)),
+             'individual_attack': rnd.choice((0, 8, 15)), 'individual_defense': rnd.choice((0, 8, 15)),
+             'individual_stamina': rnd.choice((0, 8, 15)), 'cp_multiplier': rnd.choice((0.094, 0.3, 0.5, 0.6)),
+             'favorite': 1 if rnd.random() < 0.05 else -1} for i in range(count)]
+
+
+def is_eligible_for_transfer(api, pokemon, best_pokemon=None, kept_pokemon_of_type=0):
+    # PGoApi.is_pokemon_eligible_for_transfer before the release rules were vectorized
+    # never release favorites
+    if pokemon.is_favorite:
+        return False
+    # keep defined pokemon unless we are above MAX_SIMILAR_POKEMON
+    if pokemon.pokemon_id in api.keep_pokemon_ids and kept_pokemon_of_type <= api.MAX_SIMILAR_POKEMON:
+        return False
+    # release defined throwaway pokemons
+    if pokemon.pokemon_id in api.throw_pokemon_ids:
+        return True
+    if api.RELEASE_METHOD == "DUPLICATES":
+        return best_pokemon.score * api.RELEASE_METHOD_CONF.get("RELEASE_DUPLICATES_SCALAR", 1.0) > pokemon.score \
+            and pokemon.score < api.RELEASE_METHOD_CONF.get("RELEASE_DUPLICATES_MAX_SCORE", 0)
+    elif api.RELEASE_METHOD == "ADVANCED":
+        if pokemon.level < api.RELEASE_METHOD_CONF.get("ALWAYS_RELEASE_BELOW_LEVEL", 0):
+            return True
+        elif pokemon.try_keep:
+            return False
+        elif pokemon.cp > api.RELEASE_METHOD_CONF.get("KEEP_CP_OVER", 500) \
+                or pokemon.iv > api.RELEASE_METHOD_CONF.get("KEEP_IV_OVER", 50):
+            return False
+        return True
+    # CLASSIC fallback method
+    elif pokemon.cp > api.KEEP_CP_OVER or pokemon.iv > api.KEEP_IV_OVER:
+        return False
+    return True
+
+
+def per_object_release(api, bag):
+    # PGoApi.cleanup_pokemon before the release rules were vectorized
+    caught_pokemon = OrderedDict()
+    for pokemon_data in bag:
+        pokemon = Pokemon(pokemon_data, 22, api.SCORE_METHOD, api.SCORE_SETTINGS)
+        caught_pokemon.setdefault(pokemon.pokemon_id, []).append(pokemon)
+    released = []
+    kept = []
+    for pokemons in caught_pokemon.values():
+        if len(pokemons) > api.MIN_SIMILAR_POKEMON:
+            sorted_pokemons = sorted(pokemons, key=lambda x: (x.cp, x.iv), reverse=True)
+            if api.RELEASE_METHOD == "ADVANCED":
+                sorted_pokemons = sorted(sorted_pokemons, key=lambda x: (x.iv, x.cp), reverse=True)
+                iv_options = api.RELEASE_METHOD_CONF.get("BEST_IV", {})
+                keep = 0
+                for i, pokemon in enumerate(sorted_pokemons):
+                    if keep >= iv_options.get("MAX_AMOUNT", 999) or pokemon.iv < (iv_options.get("IGNORE_BELOW", 0)):
+                        break
+                    if keep < iv_options.get("MIN_AMOUNT", 1) or pokemon.iv > (
+                            sorted_pokemons[0].iv * iv_options.get("KEEP_ADDITIONAL_SCALAR", 1.0)):
+                        sorted_pokemons[i].try_keep = True
+                        keep += 1
+                sorted_pokemons = sorted(sorted_pokemons, key=lambda x: (x.cp, x.iv), reverse=True)
+                cp_options = api.RELEASE_METHOD_CONF.get("BEST_CP", {})
+                keep = 0
+                for i, pokemon in enumerate(sorted_pokemons):
+                    if keep >= cp_options.get("MAX_AMOUNT", 999):
+                        break
+                    if keep < cp_options.get("MIN_AMOUNT", 1) or pokemon.cp > (
+                            sorted_pokemons[0].cp * cp_options.get("KEEP_ADDITIONAL_SCALAR", 1.0)):
+                        sorted_pokemons[i].try_keep = True
+                        keep += 1
+            elif api.RELEASE_METHOD == "DUPLICATES":
+                sorted_pokemons = sorted(sorted_pokemons, key=lambda x: (x.score, x.cp, x.iv), reverse=True)
+            kept_pokemon_of_type = api.MIN_SIMILAR_POKEMON
+            for pokemon in sorted_pokemons[api.MIN_SIMILAR_POKEMON:]:
+                if is_eligible_for_transfer(api, pokemon, sorted_pokemons[0], kept_pokemon_of_type):
+                    released.append(pokemon.id)
+                else:
+                    kept_pokemon_of_type += 1
+            kept.extend(pokemon.id for pokemon in sorted_pokemons if pokemon.try_keep)
+    return released, sorted(kept)
+
+
+CLEANUP_CONFIGS = [
+    {"RELEASE_METHOD": "CLASSIC", "RELEASE_METHOD_CLASSIC": {"KEEP_CP_OVER": 300, "KEEP_IV_OVER": 60}},
+    {"RELEASE_METHOD": "CLASSIC", "MIN_SIMILAR_POKEMON": 3, "KEEP_POKEMON_NAMES": ["PIDGEY"], "MAX_SIMILAR_POKEMON": 10,
+     "THROW_POKEMON_NAMES": ["MAGIKARP"], "RELEASE_METHOD_CLASSIC": {"KEEP_CP_OVER": 800}},
+    {"RELEASE_METHOD": "ADVANCED", "RELEASE_METHOD_ADVANCED": {}},
+    {"RELEASE_METHOD": "ADVANCED", "MIN_SIMILAR_POKEMON": 2, "RELEASE_METHOD_ADVANCED": {
+        "ALWAYS_RELEASE_BELOW_LEVEL": 10, "KEEP_CP_OVER": 700, "KEEP_IV_OVER": 90,
+        "BEST_IV": {"MIN_AMOUNT": 2, "MAX_AMOUNT": 4, "IGNORE_BELOW": 40, "KEEP_ADDITIONAL_SCALAR": 0.8},
+        "BEST_CP": {"MIN_AMOUNT": 1, "MAX_AMOUNT": 3, "KEEP_ADDITIONAL_SCALAR": 0.5}}},
+    {"RELEASE_METHOD": "DUPLICATES", "SCORE_METHOD": "FANCY", "KEEP_POKEMON_NAMES": ["EEVEE"], "MAX_SIMILAR_POKEMON": 5,
+     "RELEASE_METHOD_DUPLICATES": {"RELEASE_DUPLICATES_SCALAR": 0.9, "RELEASE_DUPLICATES_MAX_SCORE": 0.6}},
+    {"RELEASE_METHOD": "DUPLICATES", "SCORE_METHOD": "CP",
+     "RELEASE_METHOD_DUPLICATES": {"RELEASE_DUPLICATES_SCALAR": 1.0, "RELEASE_DUPLICATES_MAX_SCORE": 700}},
+]
+
+
+class TestReleasePolicy(unittest.TestCase):
+
+    def test_matches_per_object_rules(self):
+        releasing = 0
+        for cleanup in CLEANUP_CONFIGS:
+            api = PGoApi({"POKEMON_CLEANUP": cleanup})
+            for bag in (random_bag(), tied_bag(), tied_bag(40, seed=3), []):
+                expected, expected_kept = per_object_release(api, bag)
+                pokemons = PokemonCollection(bag, 22, api.SCORE_METHOD, api.SCORE_SETTINGS)
+                released = [pokemon.id for pokemon in api.release_policy.release_list(pokemons)]
+                self.assertEqual(released, expected, cleanup)
+                self.assertEqual(sorted(pokemon.id for pokemon in pokemons if pokemon.try_keep), expected_kept, cleanup)
+                releasing += bool(expected)
+        self.assertGreater(releasing, len(CLEANUP_CONFIGS))
+
+
+if __name__ == '__main__':
+    unittest.main()
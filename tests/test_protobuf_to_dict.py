@@ -0,0 +1,95 @@
+import base64
+import json
+import unittest
+
+from pgoapi.protobuf_to_dict import (LazyMessageDict, dict_to_protobuf,
+                                     protobuf_to_dict)
+from pgoapi.protos.POGOProtos.Networking.Envelopes_pb2 import ResponseEnvelope
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import \
+    GetMapObjectsResponse
+from pgoapi.utilities import json_default
+
+
+def mock_map_objects():
+    response = GetMapObjectsResponse()
+    response.status = 1
+    cell = response.map_cells.add()
+    cell.s2_cell_id = 9279742050779955200
+    cell.current_timestamp_ms = 1469600000000
+    fort = cell.forts.add()
+    fort.id = 'fort-1'
+    fort.latitude = 34.02
+    fort.longitude = -118.28
+    fort.enabled = True
+    fort.type = 1
+    fort.lure_info.active_pokemon_id = 16
+    cell.forts.add().id = 'fort-2'
+    cell.deleted_objects.append('fort-3')
+    return response
+
+
+class TestProtobufToDict(unittest.TestCase):
+
+    def test_nested_and_repeated_messages(self):
+        expected = {
+            'status': 1,
+            'map_cells': [{
+                's2_cell_id': 9279742050779955200,
+                'current_timestamp_ms': 1469600000000,
+                'forts': [
+                    {'id': 'fort-1', 'latitude': 34.02, 'longitude': -118.28, 'enabled': True, 'type': 1,
+                     'lure_info': {'active_pokemon_id': 16}},
+                    {'id': 'fort-2'},
+                ],
+                'deleted_objects': ['fort-3'],
+            }],
+        }
+        # converted twice, the second time through the cached conversion plans
+        self.assertEqual(protobuf_to_dict(mock_map_objects()), expected)
+        self.assertEqual(protobuf_to_dict(mock_map_objects()), expected)
+
+    def test_enum_labels(self):
+        response = protobuf_to_dict(mock_map_objects(), use_enum_labels=True)
+        self.assertEqual(response['status'], 'SUCCESS')
+        self.assertEqual(response['map_cells'][0]['forts'][0]['type'], 'CHECKPOINT')
+        self.assertEqual(response['map_cells'][0]['forts'][0]['lure_info']['active_pokemon_id'], 'PIDGEY')
+        self.assertEqual(protobuf_to_dict(mock_map_objects())['status'], 1)
+
+    def test_bytes_and_round_trip(self):
+        envelope = ResponseEnvelope()
+        envelope.status_code = 1
+        envelope.returns.append(b'\x08\x01')
+        envelope.returns.append(mock_map_objects().SerializeToString())
+        converted = protobuf_to_dict(envelope)
+        self.assertEqual(converted['returns'][0], base64.b64encode(b'\x08\x01'))
+        del converted['returns']
+        self.assertEqual(dict_to_protobuf(GetMapObjectsResponse, protobuf_to_dict(mock_map_objects())), mock_map_objects())
+        self.assertEqual(dict_to_protobuf(ResponseEnvelope, converted).status_code, 1)
+
+
+class TestLazyMessageDict(unittest.TestCase):
+
+    def test_matches_protobuf_to_dict(self):
+        view = LazyMessageDict(mock_map_objects())
+        self.assertEqual(view, protobuf_to_dict(mock_map_objects()))
+        self.assertEqual(view.to_dict(), protobuf_to_dict(mock_map_objects()))
+        self.assertEqual(sorted(view), ['map_cells', 'status'])
+        self.assertEqual(len(view), 2)
+
+    def test_converts_on_first_access(self):
+        view = LazyMessageDict(mock_map_objects())
+        self.assertEqual(view._values, {})
+        cell = view['map_cells'][0]
+        self.assertIsInstance(cell, LazyMessageDict)
+        self.assertNotIn('status', view._values)
+        self.assertEqual(cell['forts'][0]['lure_info'].get('active_pokemon_id'), 16)
+        self.assertIs(view['map_cells'][0], cell)
+        self.assertNotIn('deleted_objects', cell._values)
+
+    def test_read_only(self):
+        view = LazyMessageDict(mock_map_objects())
+        self.assertNotIn('missing', view)
+        self.assertEqual(view.get('missing', -1), -1)
+        with self.assertRaises(TypeError):
+            view['status'] = 2
+        self.assertEqual(json.loads(json.dumps(view, default=json_default)), json.loads(json.dumps(protobuf_to_dict(mock_map_objects()))))
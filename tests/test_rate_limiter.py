@@ -0,0 +1,86 @@
+import unittest
+
+from pgoapi.rate_limiter import RateLimiter, TokenBucket, is_throttled
+from pgoapi.transport import Transport
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=3, clock=clock)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        # queued requests are spaced exactly 1 / rate apart
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.5, 1.0, 1.5])
+        clock.now += 10
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0, 0, 0, 0.5])
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def limiter(self, **kwargs):
+        return RateLimiter(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_no_wait_within_budget(self):
+        limiter = self.limiter(rate=1, burst=2)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 1.0)
+        self.assertEqual(self.clock.slept, [1.0])
+
+    def test_shared_budget(self):
+        shared = TokenBucket(1, burst=1, clock=self.clock)
+        first = self.limiter(rate=10, burst=10, shared=shared)
+        second = self.limiter(rate=10, burst=10, shared=shared)
+        self.assertEqual(first.acquire(), 0)
+        self.assertEqual(second.acquire(), 1.0)
+
+    def test_adapts_to_throttling(self):
+        limiter = self.limiter(rate=2, burst=5, min_rate=0.5)
+        self.assertTrue(limiter.report(False))
+        self.assertEqual(limiter.rate, 1.0)
+        # the saved up burst is gone after a refusal
+        self.assertEqual(limiter.acquire(), 1.0)
+        self.assertTrue(limiter.report({'status_code': 102, 'responses': {}}))
+        self.assertTrue(limiter.report(None))
+        self.assertEqual(limiter.rate, 0.5)
+        self.assertEqual(limiter.throttled, 3)
+        for _ in range(3):
+            self.assertFalse(limiter.report({'status_code': 1, 'responses': {}}))
+        self.assertAlmostEqual(limiter.rate, 1.1)
+        for _ in range(20):
+            limiter.report({'status_code': 1, 'responses': {}})
+        self.assertEqual(limiter.rate, 2.0)
+
+    def test_is_throttled(self):
+        self.assertTrue(is_throttled(False))
+        self.assertTrue(is_throttled({'direction': 102}))
+        self.assertFalse(is_throttled({'status_code': 2, 'responses': {}}))
+
+    def test_from_config(self):
+        limiter = RateLimiter.from_config({"RATE_LIMIT": {"REQUESTS_PER_SECOND": 4, "BURST": 1}})
+        self.assertEqual((limiter.rate, limiter.bucket.burst, limiter.shared), (4.0, 1.0, None))
+        self.assertIsNone(RateLimiter.shared_from_config({}))
+        transport = Transport.from_config({"RATE_LIMIT": {"GLOBAL_REQUESTS_PER_SECOND": 5}})
+        self.assertEqual(transport.rate_limit.rate, 5.0)
+        transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pgoapi.capture import ResponseCapture
+from pgoapi.proto_registry import ProtoRegistry
+from pgoapi.protobuf_to_dict import LazyMessageDict
+from pgoapi.protos.POGOProtos.Networking.Envelopes_pb2 import ResponseEnvelope
+from pgoapi.protos.POGOProtos.Networking.Requests_pb2 import RequestType
+from pgoapi.protos.POGOProtos.Networking.Requests.Messages_pb2 import \
+    FortSearchMessage
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import (
+    FortSearchResponse, GetPlayerResponse)
+from pgoapi.rpc_api import RpcApi
+
+
+class MockHttpResponse(object):
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+
+def mock_server_response():
+    fort_search = FortSearchResponse()
+    fort_search.result = 1
+    fort_search.experience_awarded = 50
+    item = fort_search.items_awarded.add()
+    item.item_id = 1
+    item.item_count = 3
+
+    get_player = GetPlayerResponse()
+    get_player.success = True
+    get_player.player_data.username = 'trainer'
+
+    envelope = ResponseEnvelope()
+    envelope.status_code = 1
+    envelope.request_id = 8145806132888207460
+    envelope.api_url = 'pgorelease.nianticlabs.com/plfe/123'
+    envelope.returns.append(fort_search.SerializeToString())
+    envelope.returns.append(get_player.SerializeToString())
+    return MockHttpResponse(envelope.SerializeToString())
+
+
+mock_subrequests = [{RequestType.Value('FORT_SEARCH'): {'fort_id': 'abc'}}, RequestType.Value('GET_PLAYER')]
+
+
+class TestRpcApi(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_main_response(self):
+        response = RpcApi(None)._parse_main_response(mock_server_response(), mock_subrequests)
+        self.assertEqual(response['api_url'], 'pgorelease.nianticlabs.com/plfe/123')
+        self.assertNotIn('returns', response)
+        self.assertEqual(response['responses']['FORT_SEARCH']['result'], 1)
+        self.assertEqual(response['responses']['FORT_SEARCH']['items_awarded'], [{'item_id': 1, 'item_count': 3}])
+        self.assertEqual(response['responses']['GET_PLAYER']['player_data']['username'], 'trainer')
+
+    def test_parse_main_response_lazy(self):
+        rpc = RpcApi(None, response_mode=RpcApi.RESPONSE_MODE_LAZY)
+        response = rpc._parse_main_response(mock_server_response(), mock_subrequests)
+        expected = RpcApi(None)._parse_main_response(mock_server_response(), mock_subrequests)
+        self.assertIsInstance(response['responses']['FORT_SEARCH'], LazyMessageDict)
+        self.assertEqual(response, expected)
+        self.assertEqual(response['responses']['FORT_SEARCH'].get('result', -1), 1)
+
+    def test_parse_main_response_proto(self):
+        rpc = RpcApi(None, response_mode=RpcApi.RESPONSE_MODE_PROTO)
+        response = rpc._parse_main_response(mock_server_response(), mock_subrequests)
+        self.assertEqual(response['status_code'], 1)
+        self.assertNotIn('returns', response)
+        fort_search = response['responses']['FORT_SEARCH']
+        self.assertIsInstance(fort_search, FortSearchResponse)
+        self.assertEqual(fort_search.result, 1)
+        self.assertEqual(fort_search.items_awarded[0].item_count, 3)
+        self.assertEqual(response['responses']['GET_PLAYER'].player_data.username, 'trainer')
+
+    def test_capture_writes_decoded_responses(self):
+        path = os.path.join(self.tmpdir, 'capture.log')
+        rpc = RpcApi(None, capture=ResponseCapture(path, sample_rate=1.0))
+        rpc._parse_main_response(mock_server_response(), mock_subrequests)
+        with open(path) as f:
+            captured = f.read()
+        self.assertIn('---- FORT_SEARCH', captured)
+        self.assertIn('experience_awarded: 50', captured)
+        self.assertIn('username: "trainer"', captured)
+
+    def test_capture_disabled_by_sample_rate(self):
+        path = os.path.join(self.tmpdir, 'capture.log')
+        rpc = RpcApi(None, capture=ResponseCapture(path, sample_rate=0.0))
+        rpc._parse_main_response(mock_server_response(), mock_subrequests)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestProtoRegistry(unittest.TestCase):
+
+    def test_resolves_classes(self):
+        registry = ProtoRegistry()
+        fort_search = RequestType.Value('FORT_SEARCH')
+        self.assertIs(registry.get_message_class(fort_search), FortSearchMessage)
+        self.assertIs(registry.get_response_class(fort_search), FortSearchResponse)
+        self.assertEqual(registry.get_name(fort_search), 'FORT_SEARCH')
+
+    def test_missing_definition_is_cached(self):
+        registry = ProtoRegistry()
+        method_unset = RequestType.Value('METHOD_UNSET')
+        self.assertIsNone(registry.get_response_class(method_unset))
+        self.assertIn(method_unset, registry._responses)
+        self.assertIsNone(registry.get_response_class(method_unset))
+
+    def test_warm_up(self):
+        registry = ProtoRegistry().warm_up()
+        self.assertEqual(len(registry._messages), len(RequestType.values()))
+        self.assertEqual(len(registry._responses), len(RequestType.values()))
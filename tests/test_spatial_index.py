@@ -0,0 +1,119 @@
+import random
+import unittest
+
+from pgoapi import PGoApi
+from pgoapi.location import distance_in_meters
+from pgoapi.protos.POGOProtos.Networking.Responses_pb2 import \
+    GetMapObjectsResponse
+from pgoapi.spatial_index import SpatialIndex
+
+USC = (34.0205, -118.2856)
+
+
+def random_points(count, seed=7, spread=0.05):
+    rnd = random.Random(seed)
+    return [('fort-%i' % i, USC[0] + rnd.uniform(-spread, spread), USC[1] + rnd.uniform(-spread, spread)) for i in range(count)]
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.points = random_points(500)
+        self.index = SpatialIndex()
+        for obj_id, lat, lng in self.points:
+            self.index.insert(obj_id, lat, lng, obj_id)
+
+    def brute_force(self, lat, lng):
+        return sorted([(obj_id, distance_in_meters((lat, lng), (p_lat, p_lng))) for obj_id, p_lat, p_lng in self.points], key=lambda x: x[1])
+
+    def test_radius_matches_brute_force(self):
+        for lat, lng in [USC, (USC[0] + 0.04, USC[1] - 0.03), (USC[0] + 0.2, USC[1])]:
+            for radius in (50, 700, 3000):
+                expected = [(obj_id, d) for obj_id, d in self.brute_force(lat, lng) if d <= radius]
+                found = self.index.radius(lat, lng, radius, now_ms=0)
+                self.assertEqual([obj_id for obj_id, _ in found], [obj_id for obj_id, _ in expected])
+                for (_, distance), (_, vincenty) in zip(found, expected):
+                    self.assertAlmostEqual(distance, vincenty, places=3)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lng in [USC, (USC[0] - 0.049, USC[1] + 0.049), (USC[0] + 1.0, USC[1])]:
+            expected = self.brute_force(lat, lng)
+            for k in (1, 5, 50):
+                self.assertEqual([obj_id for obj_id, _ in self.index.nearest(lat, lng, k, now_ms=0)], [obj_id for obj_id, _ in expected[:k]])
+        self.assertEqual(len(self.index.nearest(USC[0], USC[1], 1000, now_ms=0)), len(self.points))
+        within = self.index.nearest(USC[0], USC[1], 1000, max_distance=500, now_ms=0)
+        self.assertEqual([obj_id for obj_id, _ in within], [obj_id for obj_id, d in self.brute_force(*USC) if d <= 500])
+
+    def test_predicate(self):
+        odd = self.index.radius(USC[0], USC[1], 2000, predicate=lambda obj_id: int(obj_id.split('-')[1]) % 2, now_ms=0)
+        self.assertTrue(odd)
+        self.assertTrue(all(int(obj_id.split('-')[1]) % 2 for obj_id, _ in odd))
+
+    def test_available_at(self):
+        obj_id, lat, lng = self.points[0]
+        self.index.set_available_at(obj_id, 1000)
+        self.assertNotIn(obj_id, [o for o, _ in self.index.radius(lat, lng, 10, now_ms=999)])
+        self.assertIn(obj_id, [o for o, _ in self.index.radius(lat, lng, 10, now_ms=999, include_unavailable=True)])
+        # the cooldown expired
+        self.assertIn(obj_id, [o for o, _ in self.index.radius(lat, lng, 10, now_ms=1001)])
+
+    def test_prune(self):
+        expected = set(obj_id for obj_id, _ in self.index.radius(USC[0], USC[1], 2000, now_ms=0))
+        self.assertEqual(self.index.prune(USC[0], USC[1], 2000), len(self.points) - len(expected))
+        self.assertEqual(set(obj_id for obj_id, _ in self.index.radius(USC[0], USC[1], float('inf'), now_ms=0)), expected)
+        self.assertEqual(self.index.prune(USC[0], USC[1], 2000), 0)
+
+    def test_replace_and_remove(self):
+        obj_id, lat, lng = self.points[0]
+        self.index.insert(obj_id, lat + 0.1, lng, 'moved')
+        self.assertEqual(len(self.index), len(self.points))
+        self.assertEqual(self.index.get(obj_id), 'moved')
+        self.assertNotIn('moved', [o for o, _ in self.index.radius(lat, lng, 10, now_ms=0)])
+        self.assertEqual(self.index.nearest(lat + 0.1, lng, now_ms=0)[0][0], 'moved')
+        self.index.remove(obj_id)
+        self.index.remove(obj_id)
+        self.assertNotIn(obj_id, self.index)
+        self.assertIsNone(self.index.get(obj_id))
+        self.assertEqual(len(self.index), len(self.points) - 1)
+        self.index.clear()
+        self.assertEqual(self.index.radius(USC[0], USC[1], 1000), [])
+        self.assertEqual(self.index.nearest(USC[0], USC[1], 3), [])
+
+
+class TestSpinnableForts(unittest.TestCase):
+
+    def map_objects(self, forts, deleted=()):
+        response = GetMapObjectsResponse()
+        response.status = 1
+        cell = response.map_cells.add()
+        for fort_id, lat_offset, cooldown in forts:
+            fort = cell.forts.add()
+            fort.id = fort_id
+            fort.type = 1
+            fort.enabled = True
+            fort.latitude = USC[0] + lat_offset
+            fort.longitude = USC[1]
+            fort.cooldown_complete_timestamp_ms = cooldown
+        cell.deleted_objects.extend(deleted)
+        return response
+
+    def test_spinnable_forts(self):
+        api = PGoApi({})
+        api.set_position(USC[0], USC[1], 0)
+        api._origPosF = api._posf
+        response = self.map_objects([('near', 0.001, 0), ('far', 0.002, 0), ('cooldown', 0.0015, 2 ** 62), ('away', 0.1, 0)])
+        response.map_cells[0].forts[0].lure_info.encounter_id = 42
+        api.index_map_objects(response)
+        # plain dicts of the used fields, nothing outside FORT_INDEX_RADIUS
+        self.assertEqual(api.fort_index.get('near'), {'id': 'near', 'type': 1, 'enabled': True, 'latitude': USC[0] + 0.001,
+                                                      'longitude': USC[1], 'lure_info': {'encounter_id': 42}})
+        self.assertNotIn('away', api.fort_index)
+        self.assertEqual([fort['id'] for fort, _ in api.spinnable_forts()], ['near', 'far'])
+        api.visited_forts['near'] = True
+        self.assertEqual([fort['id'] for fort, _ in api.spinnable_forts()], ['far'])
+        api.index_map_objects(self.map_objects([], deleted=['far']))
+        self.assertEqual(api.spinnable_forts(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
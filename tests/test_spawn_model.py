@@ -0,0 +1,63 @@
+import unittest
+
+from pgoapi.spawn_model import (APPEARANCE_DELAY_MS, DEFAULT_DURATION_MS,
+                                HOUR_MS, SpawnModel)
+from tests.map_objects import map_objects
+
+USC = (34.0205, -118.2856)
+HOUR_START_MS = 1469599200000  # a full hour
+MINUTE_MS = 60 * 1000
+
+
+class TestSpawnModel(unittest.TestCase):
+
+    def test_learns_despawn_time(self):
+        model = SpawnModel()
+        # seen at :20, despawns at :30 of every hour
+        model.observe(map_objects(catchable=[dict(spawn_point_id='a', expiration_timestamp_ms=HOUR_START_MS + 30 * MINUTE_MS, latitude=USC[0], longitude=USC[1])]), HOUR_START_MS + 20 * MINUTE_MS)
+        spawn_point = model.spawn_points['a']
+        self.assertEqual(spawn_point.despawn_ms_of_hour, 30 * MINUTE_MS)
+        self.assertEqual(spawn_point.duration_ms, DEFAULT_DURATION_MS)
+        # next hour, appearing at :15
+        self.assertEqual(spawn_point.next_appearance(HOUR_START_MS + 40 * MINUTE_MS), HOUR_START_MS + HOUR_MS + 15 * MINUTE_MS)
+        self.assertTrue(spawn_point.is_active(HOUR_START_MS + 2 * HOUR_MS + 29 * MINUTE_MS))
+        self.assertFalse(spawn_point.is_active(HOUR_START_MS + 2 * HOUR_MS + 31 * MINUTE_MS))
+        self.assertFalse(spawn_point.is_active(HOUR_START_MS + 2 * HOUR_MS + 14 * MINUTE_MS))
+
+    def test_learns_longer_spawns(self):
+        model = SpawnModel()
+        # a wild pokemon 25 minutes before it is hidden
+        model.observe(map_objects(wild=[dict(spawn_point_id='a', last_modified_timestamp_ms=HOUR_START_MS, time_till_hidden_ms=25 * MINUTE_MS,
+                                             latitude=USC[0], longitude=USC[1])]), HOUR_START_MS)
+        self.assertEqual(model.spawn_points['a'].duration_ms, 25 * MINUTE_MS)
+        self.assertEqual(model.spawn_points['a'].despawn_ms_of_hour, 25 * MINUTE_MS)
+        # unknown time_till_hidden_ms and missing spawn points are ignored
+        model.observe(map_objects(wild=[dict(spawn_point_id='b', last_modified_timestamp_ms=HOUR_START_MS, time_till_hidden_ms=-1)],
+                                  catchable=[dict(expiration_timestamp_ms=HOUR_START_MS)]), HOUR_START_MS)
+        self.assertEqual(len(model), 1)
+
+    def test_next_refresh(self):
+        model = SpawnModel()
+        now = HOUR_START_MS + 40 * MINUTE_MS
+        self.assertEqual(model.next_refresh(now, USC, 1000, 5000, 60000), now + 60000)
+        # despawns at :56, appears at :41
+        model.observe_pokemon('a', USC[0], USC[1], HOUR_START_MS + 56 * MINUTE_MS, HOUR_START_MS + 46 * MINUTE_MS)
+        self.assertEqual(model.next_refresh(now, USC, 1000, 5000, 60000), now + MINUTE_MS)
+        self.assertEqual(model.next_refresh(now + 30000, USC, 1000, 5000, 60000), now + MINUTE_MS + APPEARANCE_DELAY_MS)
+        self.assertEqual(model.next_refresh(now + MINUTE_MS, USC, 1000, 5000, 60000), now + MINUTE_MS + 5000)
+        # too far away to matter
+        self.assertEqual(model.next_refresh(now + 30000, (USC[0] + 0.1, USC[1]), 1000, 5000, 60000), now + 90000)
+
+    def test_upcoming_and_active(self):
+        model = SpawnModel()
+        for i in range(4):
+            model.observe_pokemon(str(i), USC[0] + i * 0.01, USC[1], HOUR_START_MS + (20 + i * 10) * MINUTE_MS, HOUR_START_MS + (15 + i * 10) * MINUTE_MS)
+        now = HOUR_START_MS + HOUR_MS + 10 * MINUTE_MS
+        self.assertEqual([(sp.spawn_point_id, t) for sp, t in model.upcoming(now, 30 * MINUTE_MS)],
+                         [('1', now + 5 * MINUTE_MS), ('2', now + 15 * MINUTE_MS), ('3', now + 25 * MINUTE_MS)])
+        self.assertEqual([sp.spawn_point_id for sp, _ in model.upcoming(now, 30 * MINUTE_MS, USC, 1500)], ['1'])
+        self.assertEqual([sp.spawn_point_id for sp in model.active(now)], ['0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import gevent
+
+from pgoapi.supervisor import Supervisor
+
+
+class MockApi(object):
+    runs = {}
+
+    def __init__(self, config, transport=None):
+        self.config = config
+        self.transport = transport
+        self._posf = (0, 0, 0)
+
+    def set_position(self, lat, lng, alt):
+        self.start_position = self._posf = (lat, lng, alt)
+
+    def login(self, provider, username, password):
+        return True
+
+    def main_loop(self):
+        runs = MockApi.runs[self.config["username"]] = MockApi.runs.get(self.config["username"], 0) + 1
+        self._posf = (runs, runs, 0)
+        if self.config.get("fail") and runs == 1:
+            raise ValueError("main loop failed")
+        gevent.sleep(60)
+
+
+def account(username, **kwargs):
+    config = {"username": username, "password": "password", "auth_service": "ptc"}
+    config.update(kwargs)
+    return config, (1.0, 2.0, 0.0)
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        MockApi.runs = {}
+        self.apis = []
+        self.supervisor = Supervisor([account("ok"), account("failing", fail=True)], setup_api=lambda api, config: self.apis.append(api),
+                                     start_delay=0, restart_delay=0, api_class=MockApi)
+
+    def tearDown(self):
+        self.supervisor.stop()
+
+    def test_failing_account_is_restarted_alone(self):
+        self.supervisor.start()
+        gevent.sleep(0.1)
+        self.assertEqual(MockApi.runs, {"ok": 1, "failing": 2})
+        status = dict((s['username'], s) for s in self.supervisor.status())
+        self.assertEqual(status["ok"]["restarts"], 0)
+        self.assertEqual(status["failing"]["restarts"], 1)
+        self.assertEqual(len(self.apis), 3)
+        # the new api continues from where the failed one was
+        self.assertEqual(self.apis[-1].start_position, (1, 1, 0))
+
+    def test_accounts_share_transport(self):
+        self.assertEqual(len(set(id(runner.transport) for runner in self.supervisor.runners)), 1)
+        self.assertEqual(self.supervisor.transport._adapter._pool_maxsize, 10)
+        transport = Supervisor._create_transport([{"NETWORK": {"POOL_MAXSIZE": 1}}] * 3)
+        self.assertEqual(transport._adapter._pool_maxsize, 3)
@@ -0,0 +1,46 @@
+import threading
+import unittest
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from pgoapi.transport import Transport
+
+
+class _RpcHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _RpcHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.endpoint = 'http://127.0.0.1:%i/rpc' % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused(self):
+        transport = Transport(pool_maxsize=1)
+        for _ in range(5):
+            self.assertEqual(transport.post(self.endpoint, b'request').status_code, 200)
+        transport.close()
+        self.assertEqual(transport.stats(), {'requests': 5, 'connections_opened': 1, 'connections_reused': 4})
+
+    def test_from_config(self):
+        transport = Transport.from_config({'NETWORK': {'POOL_MAXSIZE': 3}})
+        self.assertEqual(transport._adapter._pool_maxsize, 3)
+        self.assertEqual(transport.stats()['requests'], 0)
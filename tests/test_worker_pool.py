@@ -0,0 +1,68 @@
+import unittest
+
+from pgoapi.worker_pool import Worker, WorkerPool
+
+
+class MockProcess(object):
+    def __init__(self, pid):
+        self.pid = pid
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.exitcode is None
+
+
+class MockInbox(list):
+    def put(self, message):
+        self.append(message)
+
+
+class MockWorkerPool(WorkerPool):
+    def _spawn(self, accounts):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        self.workers[worker_id] = Worker(worker_id, MockProcess(1000 + worker_id), MockInbox(), list(accounts))
+        return self.workers[worker_id]
+
+
+def accounts(count):
+    return [({'username': 'user%i' % i}, (1.0, 2.0, 0.0)) for i in range(count)]
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_accounts_are_spread(self):
+        pool = MockWorkerPool(accounts(7), workers=3)
+        pool.start()
+        self.assertEqual([len(w.accounts) for w in pool.workers.values()], [3, 2, 2])
+        self.assertEqual(MockWorkerPool(accounts(2), workers=8).worker_count, 2)
+
+    def test_rebalance_after_worker_died(self):
+        pool = MockWorkerPool(accounts(7), workers=3)
+        pool.start()
+        pool.workers[0].process.exitcode = -9
+        pool.rebalance()
+        self.assertEqual(sorted(pool.workers), [1, 2])
+        self.assertEqual([len(w.accounts) for w in pool.workers.values()], [4, 3])
+        handed_over = [account[0]['username'] for w in pool.workers.values() for _, payload in w.inbox for account in payload]
+        self.assertEqual(sorted(handed_over), ['user0', 'user3', 'user6'])
+
+    def test_last_worker_died(self):
+        pool = MockWorkerPool(accounts(2), workers=1)
+        pool.start()
+        pool.workers[0].process.exitcode = 1
+        pool.rebalance()
+        self.assertEqual(list(pool.workers), [1])
+        self.assertEqual(len(pool.workers[1].accounts), 2)
+
+    def test_throughput(self):
+        pool = MockWorkerPool(accounts(2), workers=1)
+        pool.start()
+        worker = pool.workers[0]
+        account_status = [{'username': 'user0', 'restarts': 1, 'xp_hour': 1000.0}, {'username': 'user1', 'restarts': 0, 'xp_hour': 500.0}]
+        worker.update({'worker': 0, 'time': 100.0, 'requests': 10, 'accounts': account_status})
+        worker.update({'worker': 0, 'time': 130.0, 'requests': 40, 'accounts': account_status})
+        status = pool.status()[0]
+        self.assertEqual(status['requests_per_minute'], 60.0)
+        self.assertEqual(status['xp_hour'], 1500.0)
+        self.assertEqual(status['restarts'], 1)
@@ -12,6 +12,11 @@ from flask import Flask, flash, jsonify, redirect, render_template, url_for
 
 from pgoapi.poke_utils import pokemon_iv_percentage
 
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
 app = Flask(__name__, template_folder="templates")
 app.secret_key = ".t\x86\xcb3Lm\x0e\x8c:\x86\xe8FD\x13Z\x08\xe1\x04(\x01s\x9a\xae"
 app.debug = True
@@ -42,6 +47,9 @@ def get_api_rpc(username):
     desc_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".listeners")
     sock_port = 0
     with open(desc_file) as f:
+        if fcntl is not None:
+            # pokecli rewrites the file under an exclusive lock
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
         data = f.read()
         data = json.loads(data if len(data) > 0 else '{}')
         if username not in data: